@@ -1,110 +1,1107 @@
+import asyncio
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from feast import FeatureStore
 import mlflow.pyfunc
 import pandas as pd
 import os
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
-from fastapi.responses import Response
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import multiprocess
+from fastapi.responses import JSONResponse, Response
 import time
+import json
+from datetime import datetime, timezone
+from contextlib import contextmanager
+
+from caches import LRUTTLCache, RegistryWatcher, feature_vector_hash
+from micro_batch import MicroBatcher
+from model_registry import LoadedModel, ModelWatcher
+from prediction_log import PostgresLogSink, PredictionLogWriter
+from predict_utils import dedupe_user_ids, is_missing, missing_by_row
+from score_lookup import ScoreTable, load_score_table, score_table_signature
+from shadow import ShadowScorer
+from startup import StartupState
 
 app = FastAPI(title="StreamFlow Churn Prediction API")
 
 # --- Config ---
 REPO_PATH = "/repo"
 # TODO 1: complétez avec le nom de votre modèle
-MODEL_URI = "models:/streamflow_churn/Production"
+MODEL_NAME = "streamflow_churn"
+MODEL_STAGE = "Production"
+MODEL_URI = f"models:/{MODEL_NAME}/{MODEL_STAGE}"
+# Hot reload : intervalle de polling du Model Registry (0 = désactivé)
+MODEL_RELOAD_INTERVAL_SECONDS = float(os.getenv("MODEL_RELOAD_INTERVAL_SECONDS", "30"))
+# Taille maximale d'un appel /predict_batch (protège Feast et la mémoire de l'API)
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "1000"))
+# Mode d'inférence rapide (sans pandas) pour /predict, activé via FAST_INFERENCE=1
+FAST_INFERENCE = os.getenv("FAST_INFERENCE", "0") == "1"
+# Cache des features online (0 = désactivé). Invalidé à chaque matérialisation Feast.
+FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", "10000"))
+FEATURE_CACHE_TTL_SECONDS = float(os.getenv("FEATURE_CACHE_TTL_SECONDS", "3600"))
+FEAST_REGISTRY_PATH = os.getenv("FEAST_REGISTRY_PATH", os.path.join(REPO_PATH, "registry.db"))
+REGISTRY_CHECK_INTERVAL_SECONDS = float(os.getenv("REGISTRY_CHECK_INTERVAL_SECONDS", "5"))
+# Cache des prédictions (version du modèle, hash du vecteur de features) -> résultat (0 = désactivé)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+# Lecture des features online : "feast" (get_online_features) ou "direct" (pool psycopg async)
+ONLINE_READ_MODE = os.getenv("ONLINE_READ_MODE", "feast")
+ONLINE_POOL_MIN_SIZE = int(os.getenv("ONLINE_POOL_MIN_SIZE", "2"))
+ONLINE_POOL_MAX_SIZE = int(os.getenv("ONLINE_POOL_MAX_SIZE", "16"))
+# Micro-batching des /predict concurrents (MICRO_BATCH=1) : fenêtre max et taille max d'un batch
+MICRO_BATCH = os.getenv("MICRO_BATCH", "0") == "1"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+MICRO_BATCH_MAX_WAIT_MS = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "2"))
+# Démarrage : délai avant de retenter le chargement du store / du modèle (0 = pas de nouvel essai)
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "10"))
+# Mode lookup (SCORE_LOOKUP=1) : scores précalculés par le flow de scoring (table churn_scores),
+# chargés en mémoire pour la version Production ; live Feast + inférence seulement en cas de miss
+SCORE_LOOKUP = os.getenv("SCORE_LOOKUP", "0") == "1"
+SCORE_LOOKUP_AS_OF = os.getenv("SCORE_LOOKUP_AS_OF") or None  # défaut : as_of du snapshot courant
+SCORE_TABLE_REFRESH_SECONDS = float(os.getenv("SCORE_TABLE_REFRESH_SECONDS", "60"))
+# Shadow scoring : seconde version du registry scorée en arrière-plan sur le trafic réel.
+# Version explicite (SHADOW_MODEL_VERSION) ou dernière version d'un stage (SHADOW_MODEL_STAGE,
+# ex: "None" = dernier candidat enregistré par train_and_compare_flow, ou "Staging")
+SHADOW_MODEL_VERSION = os.getenv("SHADOW_MODEL_VERSION") or None
+SHADOW_MODEL_STAGE = os.getenv("SHADOW_MODEL_STAGE") or None
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
+# Journal des prédictions servies (PREDICTION_LOG=1) : ring buffer en mémoire vidé par COPY
+PREDICTION_LOG = os.getenv("PREDICTION_LOG", "0") == "1"
+PREDICTION_LOG_CAPACITY = int(os.getenv("PREDICTION_LOG_CAPACITY", "10000"))
+PREDICTION_LOG_BATCH_SIZE = int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "500"))
+PREDICTION_LOG_FLUSH_SECONDS = float(os.getenv("PREDICTION_LOG_FLUSH_SECONDS", "1"))
+# Chargement du modèle à l'import (gunicorn --preload, cf. gunicorn.conf.py) : une seule copie
+# partagée en copy-on-write par les workers au lieu d'une copie par worker
+PRELOAD_MODEL = os.getenv("PRELOAD_MODEL", "0") == "1"
+# Métriques multi-workers (gunicorn, cf. gunicorn.conf.py) : chaque worker écrit ses valeurs
+# dans PROMETHEUS_MULTIPROC_DIR et /metrics agrège tous les workers vivants
+MULTIPROCESS_METRICS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+FEATURES_REQUEST = [
+    "subs_profile_fv:months_active",
+    "subs_profile_fv:monthly_fee",
+    "subs_profile_fv:paperless_billing",
+    "subs_profile_fv:plan_stream_tv",
+    "subs_profile_fv:plan_stream_movies",
+    "subs_profile_fv:net_service",
+    "usage_agg_30d_fv:watch_hours_30d",
+    "usage_agg_30d_fv:avg_session_mins_7d",
+    "usage_agg_30d_fv:unique_devices_30d",
+    "usage_agg_30d_fv:skips_7d",
+    "usage_agg_30d_fv:rebuffer_events_7d",
+    "payments_agg_90d_fv:failed_payments_90d",
+    "support_agg_90d_fv:support_tickets_90d",
+    "support_agg_90d_fv:ticket_avg_resolution_hrs_90d",
+]
+# Noms de colonnes (sans le préfixe de la feature view), dans l'ordre d'entraînement
+FEATURE_NAMES = [f.split(":", 1)[1] for f in FEATURES_REQUEST]
+
+
+def unwrap_sklearn(pyfunc_model):
+    """Récupère le modèle sklearn sous-jacent au wrapper pyfunc (None si indisponible)."""
+    try:
+        return pyfunc_model.get_raw_model()
+    except Exception:
+        return getattr(getattr(pyfunc_model, "_model_impl", None), "sklearn_model", None)
+
+
+def build_fast_predictor(pyfunc_model, sklearn_model):
+    """
+    Construit le FastPredictor à partir du modèle et de l'artefact feature_schema.json
+    de son run MLflow. Retourne None (fallback sur la Pipeline) en cas d'échec.
+    """
+    try:
+        import mlflow.artifacts
+        from fast_path import FastPredictor
+
+        schema_path = mlflow.artifacts.download_artifacts(
+            run_id=pyfunc_model.metadata.run_id, artifact_path="feature_schema.json"
+        )
+        with open(schema_path) as f:
+            feature_schema = json.load(f)
+        return FastPredictor(sklearn_model, feature_schema)
+    except Exception as e:
+        print(f"Warning: fast inference disabled: {e}")
+        return None
+
+
+# Ligne synthétique (valeurs plausibles) pour chauffer un modèle avant de servir du trafic
+WARMUP_FEATURES = {
+    "months_active": 12,
+    "monthly_fee": 50.0,
+    "paperless_billing": True,
+    "plan_stream_tv": False,
+    "plan_stream_movies": False,
+    "net_service": "DSL",
+    "watch_hours_30d": 20.0,
+    "avg_session_mins_7d": 30.0,
+    "unique_devices_30d": 2,
+    "skips_7d": 3,
+    "rebuffer_events_7d": 1,
+    "failed_payments_90d": 0,
+    "support_tickets_90d": 0,
+    "ticket_avg_resolution_hrs_90d": 8.0,
+}
+
+
+def get_production_version():
+    """Version actuellement en stage Production dans le Model Registry (None si aucune)."""
+    from mlflow.tracking import MlflowClient
+
+    latest = MlflowClient().get_latest_versions(MODEL_NAME, stages=[MODEL_STAGE])
+    return latest[0].version if latest else None
+
+
+def warm_up(loaded: LoadedModel):
+    """Une prédiction synthétique : lazy imports, caches sklearn et pages mémoire du modèle."""
+    X = pd.DataFrame({name: [WARMUP_FEATURES[name]] for name in FEATURE_NAMES})
+    loaded.pyfunc.predict(X)
+    if loaded.sklearn is not None and hasattr(loaded.sklearn, "predict_proba"):
+        loaded.sklearn.predict_proba(X)
+    if loaded.fast is not None:
+        loaded.fast.predict_one(WARMUP_FEATURES)
+
+
+def load_model_version(version: str) -> LoadedModel:
+    """Charge et chauffe une version précise du modèle (hors chemin des requêtes)."""
+    pyfunc = mlflow.pyfunc.load_model(f"models:/{MODEL_NAME}/{version}")
+    sklearn_model = unwrap_sklearn(pyfunc)
+    fast = build_fast_predictor(pyfunc, sklearn_model) if FAST_INFERENCE and sklearn_model is not None else None
+    loaded = LoadedModel(version, pyfunc, sklearn_model, fast)
+    warm_up(loaded)
+    return loaded
+
+
+def load_production_model() -> LoadedModel:
+    version = get_production_version()
+    if version is None:
+        raise RuntimeError(f"No {MODEL_STAGE} version for {MODEL_NAME}")
+    return load_model_version(version)
+
+
+def load_store() -> FeatureStore:
+    return FeatureStore(repo_path=REPO_PATH)
+
+
+# Chargés par le pipeline de démarrage (cf. startup_pipeline), pas à l'import :
+# le serveur répond à /health pendant le chargement et /ready passe au vert une fois chaud.
+store = None
+current_model = None
+online_reader = None
+
+if PRELOAD_MODEL:
+    # Exécuté dans le master gunicorn avant le fork ; le store reste chargé par chaque worker
+    try:
+        current_model = load_production_model()
+    except Exception as e:
+        print(f"Warning: model preload failed, workers will load their own copy: {e}")
+
 
-try:
-    store = FeatureStore(repo_path=REPO_PATH)
-    model = mlflow.pyfunc.load_model(MODEL_URI)
-except Exception as e:
-    print(f"Warning: init failed: {e}")
-    store = None
-    model = None
+@app.on_event("shutdown")
+async def close_online_reader():
+    if online_reader is not None:
+        await online_reader.close()
 
 
 class UserPayload(BaseModel):
     user_id: str
 
 
+class BatchPayload(BaseModel):
+    user_ids: list[str]
+
+
 @app.get("/health")
 def health():
+    # Liveness uniquement : le process répond. La readiness est exposée par /ready.
     return {"status": "ok"}
 
 # TODO: Créez les métriques avec les noms suivants:
 # un Counter: "api_requests_total"
 # un Histogram: "api_request_latency_seconds"
-REQUEST_COUNT = Counter("api_requests_total", "Total number of API requests")
-REQUEST_LATENCY = Histogram("api_request_latency_seconds", "Latency of API requests in seconds")
+# Buckets orientés "serving à la milliseconde" (les buckets par défaut commencent à 5 ms)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.0075, 0.01, 0.015, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+REQUEST_COUNT = Counter(
+    "api_requests_total", "Total number of API requests", ["endpoint", "outcome", "model_version"]
+)
+REQUEST_LATENCY = Histogram(
+    "api_request_latency_seconds", "Latency of API requests in seconds", ["endpoint", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "api_stage_latency_seconds",
+    "Latency of each request stage (feature_fetch, frame_build, null_check, inference, serialization)",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+FEATURE_CACHE_HITS = Counter("api_feature_cache_hits_total", "Online feature cache hits")
+FEATURE_CACHE_MISSES = Counter("api_feature_cache_misses_total", "Online feature cache misses")
+FEATURE_CACHE_EVICTIONS = Counter("api_feature_cache_evictions_total", "Online feature cache evictions (LRU or TTL)")
+FEATURE_CACHE_INVALIDATIONS = Counter(
+    "api_feature_cache_invalidations_total", "Full cache invalidations after a Feast materialization"
+)
+MICRO_BATCH_SIZE = Histogram(
+    "api_micro_batch_size", "Number of /predict requests coalesced per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+MICRO_BATCH_QUEUE_WAIT = Histogram(
+    "api_micro_batch_queue_wait_seconds", "Time a /predict request waits before its micro-batch is dispatched",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+PREDICTION_CACHE_HITS = Counter("api_prediction_cache_hits_total", "Prediction cache hits (inference skipped)")
+PREDICTION_CACHE_MISSES = Counter("api_prediction_cache_misses_total", "Prediction cache misses")
+PREDICTION_CACHE_EVICTIONS = Counter("api_prediction_cache_evictions_total", "Prediction cache evictions")
+
+prediction_cache = (
+    LRUTTLCache(PREDICTION_CACHE_SIZE, on_evict=PREDICTION_CACHE_EVICTIONS.inc)
+    if PREDICTION_CACHE_SIZE > 0
+    else None
+)
+
+
+def cached_prediction(model: LoadedModel, values: dict, need_proba: bool = False):
+    """
+    Retourne (clé, (label, proba) ou None). Clé None si le cache est désactivé.
+    need_proba : une entrée sans proba (venue de /predict en pyfunc) est inutilisable,
+    donc comptée et traitée comme un miss (l'appelant rescore et la remplace).
+    """
+    if prediction_cache is None:
+        return None, None
+    key = (model.version, feature_vector_hash(values, FEATURE_NAMES))
+    hit, value = prediction_cache.get(key)
+    if hit and need_proba and value[1] is None:
+        hit, value = False, None
+    (PREDICTION_CACHE_HITS if hit else PREDICTION_CACHE_MISSES).inc()
+    return key, value
+
+
+def store_prediction(key, label: int, proba):
+    if key is not None:
+        prediction_cache.put(key, (label, proba))
+
+
+MODEL_INFO = Gauge(
+    "api_model_info", "Model version currently served (1 = active)", ["version"], multiprocess_mode="livemax"
+)
+MODEL_RELOADS = Counter("api_model_reloads_total", "Hot model reload attempts", ["outcome"])
+
+
+def swap_model(loaded: LoadedModel):
+    """Publie un modèle déjà chargé et chauffé : une seule affectation, donc atomique."""
+    global current_model
+    previous = current_model
+    current_model = loaded
+    # Les prédictions de l'ancienne version ne seront plus jamais relues : on libère la mémoire
+    if prediction_cache is not None:
+        PREDICTION_CACHE_EVICTIONS.inc(prediction_cache.clear())
+    if previous is not None:
+        MODEL_INFO.labels(version=previous.version).set(0)
+    MODEL_INFO.labels(version=loaded.version).set(1)
+    MODEL_RELOADS.labels(outcome="swapped").inc()
+    print(f"Model swapped: {MODEL_NAME} v{previous.version if previous else None} -> v{loaded.version}")
+
+
+def on_reload_error(e: Exception):
+    MODEL_RELOADS.labels(outcome="error").inc()
+    print(f"Warning: model reload failed: {e}")
+
+
+# La version courante est renseignée par le pipeline de démarrage, qui démarre le watcher
+model_watcher = (
+    ModelWatcher(
+        get_production_version,
+        load_model_version,
+        swap_model,
+        interval_seconds=MODEL_RELOAD_INTERVAL_SECONDS,
+        on_error=on_reload_error,
+    )
+    if MODEL_RELOAD_INTERVAL_SECONDS > 0
+    else None
+)
+
+
+@app.on_event("shutdown")
+def stop_model_watcher():
+    if model_watcher is not None:
+        model_watcher.stop()
+
+
+SCORE_LOOKUPS = Counter(
+    "api_score_lookups_total", "Precomputed score lookups (hit / miss / version_mismatch)", ["result"]
+)
+SCORE_LOOKUP_LATENCY = Histogram(
+    "api_score_lookup_latency_seconds", "Latency of a precomputed score lookup",
+    buckets=(0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.001),
+)
+SCORE_TABLE_ROWS = Gauge("api_score_table_rows", "Precomputed scores loaded in memory", multiprocess_mode="livemax")
+
+score_table = None
+
+
+def pg_connect():
+    """Connexion psycopg à la base applicative (scores précalculés, journal des prédictions)."""
+    import psycopg
+    from psycopg.conninfo import make_conninfo
+
+    return psycopg.connect(make_conninfo(
+        "",
+        user=os.getenv("POSTGRES_USER", "streamflow"),
+        password=os.getenv("POSTGRES_PASSWORD", "streamflow"),
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "streamflow"),
+    ))
+
+
+def current_score_signature():
+    """Scores du snapshot courant pour la version servie ; None sans modèle ni snapshot."""
+    model = current_model
+    if model is None:
+        return None
+    with pg_connect() as conn:
+        return score_table_signature(conn, model.version, SCORE_LOOKUP_AS_OF)
+
+
+def fetch_score_table(signature: str) -> ScoreTable:
+    with pg_connect() as conn:
+        return load_score_table(conn, signature)
+
+
+def publish_score_table(table: ScoreTable):
+    global score_table
+    score_table = table
+    SCORE_TABLE_ROWS.set(len(table))
+    print(f"Score table loaded: {len(table)} scores for v{table.model_version} as_of={table.as_of}")
+
+
+def on_score_table_error(e: Exception):
+    print(f"Warning: score table refresh failed: {e}")
+
+
+# Même mécanique de polling que pour le modèle : la table est rechargée quand un run du flow
+# de scoring ajoute des scores, ou quand la version Production change
+score_table_watcher = (
+    ModelWatcher(
+        current_score_signature,
+        fetch_score_table,
+        publish_score_table,
+        interval_seconds=SCORE_TABLE_REFRESH_SECONDS,
+        on_error=on_score_table_error,
+    )
+    if SCORE_LOOKUP
+    else None
+)
+
+
+def refresh_score_table():
+    # Optimisation seulement : sans scores (table absente, base injoignable), on sert en live
+    try:
+        score_table_watcher.check_once()
+    except Exception as e:
+        on_score_table_error(e)
+
+
+def lookup_score(user_id: str, model: LoadedModel) -> dict | None:
+    """Réponse à partir du score précalculé, ou None (miss, version différente, mode désactivé)."""
+    if score_table_watcher is None:
+        return None
+    table = score_table
+    t0 = time.perf_counter()
+    result, score = table.lookup(user_id, model.version) if table is not None else ("miss", None)
+    SCORE_LOOKUP_LATENCY.observe(time.perf_counter() - t0)
+    SCORE_LOOKUPS.labels(result=result).inc()
+    if score is None:
+        return None
+    return {
+        "user_id": user_id,
+        # Même règle que RandomForestClassifier.predict (argmax des probas, classe 0 en cas d'égalité)
+        "prediction": int(score > 0.5),
+        "model_version": model.version,
+        "churn_proba": score,
+        "source": "precomputed",
+    }
+
+
+@app.on_event("shutdown")
+def stop_score_table_watcher():
+    if score_table_watcher is not None:
+        score_table_watcher.stop()
+
+
+SHADOW_PREDICTIONS = Counter(
+    "api_shadow_predictions_total", "Shadow predictions compared to the served prediction", ["agreement"]
+)
+SHADOW_LATENCY = Histogram(
+    "api_shadow_inference_latency_seconds", "Shadow model inference latency per batch",
+    buckets=LATENCY_BUCKETS,
+)
+SHADOW_DROPPED = Counter("api_shadow_dropped_total", "Shadow items dropped because the queue was full")
+SHADOW_ERRORS = Counter("api_shadow_errors_total", "Shadow batches that failed to score")
+SHADOW_MODEL_INFO = Gauge(
+    "api_shadow_model_info", "Shadow model version (1 = active)", ["version"], multiprocess_mode="livemax"
+)
+
+shadow_model = None
+
+
+def resolve_shadow_version():
+    if SHADOW_MODEL_VERSION is not None:
+        return SHADOW_MODEL_VERSION
+    from mlflow.tracking import MlflowClient
+
+    latest = MlflowClient().get_latest_versions(MODEL_NAME, stages=[SHADOW_MODEL_STAGE])
+    return max((mv.version for mv in latest), key=int) if latest else None
+
+
+def load_shadow_model():
+    """Optionnel : en cas d'échec (ou même version que Production), pas de shadow scoring."""
+    global shadow_model
+    try:
+        version = resolve_shadow_version()
+        if version is None or str(version) == current_model.version:
+            print(f"Shadow scoring disabled: no distinct shadow version ({version})")
+            return
+        shadow_model = load_model_version(str(version))
+        SHADOW_MODEL_INFO.labels(version=shadow_model.version).set(1)
+    except Exception as e:
+        print(f"Warning: shadow model load failed: {e}")
+
+
+def score_shadow_batch(items: list) -> list[int]:
+    # Items : (vecteur de features, prédiction servie) ; un seul appel modèle par lot
+    X = pd.DataFrame([values for values, _ in items], columns=FEATURE_NAMES)
+    return [int(p) for p in shadow_model.pyfunc.predict(X)]
+
+
+def observe_shadow_batch(items: list, predictions: list[int], seconds: float):
+    SHADOW_LATENCY.observe(seconds)
+    agree = sum(1 for (_, served), shadow in zip(items, predictions) if served == shadow)
+    SHADOW_PREDICTIONS.labels(agreement="agree").inc(agree)
+    SHADOW_PREDICTIONS.labels(agreement="disagree").inc(len(items) - agree)
+    if MULTIPROCESS_METRICS:
+        SHADOW_QUEUE_DEPTH.set(shadow_scorer.qsize())
+
+
+def on_shadow_error(e: Exception):
+    SHADOW_ERRORS.inc()
+    print(f"Warning: shadow scoring failed: {e}")
+
+
+shadow_scorer = (
+    ShadowScorer(
+        score_shadow_batch,
+        maxsize=SHADOW_QUEUE_SIZE,
+        on_batch=observe_shadow_batch,
+        on_drop=SHADOW_DROPPED.inc,
+        on_error=on_shadow_error,
+    )
+    if SHADOW_MODEL_VERSION or SHADOW_MODEL_STAGE
+    else None
+)
+SHADOW_QUEUE_DEPTH = Gauge("api_shadow_queue_depth", "Items waiting for shadow scoring", multiprocess_mode="livesum")
+# set_function n'est pas exporté en multiprocess : valeur écrite à chaque dépôt et batch
+if shadow_scorer is not None and not MULTIPROCESS_METRICS:
+    SHADOW_QUEUE_DEPTH.set_function(shadow_scorer.qsize)
+
+
+def shadow_submit(values: dict, prediction: int):
+    """Dépôt non bloquant : aucune latence ajoutée à la réponse principale."""
+    if shadow_model is not None:
+        shadow_scorer.submit((values, prediction))
+        if MULTIPROCESS_METRICS:
+            SHADOW_QUEUE_DEPTH.set(shadow_scorer.qsize())
+
+
+@app.on_event("shutdown")
+def stop_shadow_scorer():
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+
+
+PREDICTION_LOG_WRITTEN = Counter("api_prediction_log_written_total", "Prediction log records written to Postgres")
+PREDICTION_LOG_DROPPED = Counter(
+    "api_prediction_log_dropped_total", "Prediction log records dropped (buffer_full / write_error)", ["reason"]
+)
+PREDICTION_LOG_FLUSH_LATENCY = Histogram(
+    "api_prediction_log_flush_seconds", "Duration of one COPY batch into prediction_log",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+PREDICTION_LOG_PENDING = Gauge(
+    "api_prediction_log_pending", "Prediction log records waiting in the ring buffer", multiprocess_mode="livesum"
+)
+
+
+def observe_log_flush(n: int, seconds: float):
+    PREDICTION_LOG_WRITTEN.inc(n)
+    PREDICTION_LOG_FLUSH_LATENCY.observe(seconds)
+    if MULTIPROCESS_METRICS:
+        PREDICTION_LOG_PENDING.set(len(prediction_log))
+
+
+def on_log_error(e: Exception, n: int):
+    PREDICTION_LOG_DROPPED.labels(reason="write_error").inc(n)
+    print(f"Warning: prediction log write failed ({n} records dropped): {e}")
+
+
+prediction_log = (
+    PredictionLogWriter(
+        PostgresLogSink(pg_connect),
+        capacity=PREDICTION_LOG_CAPACITY,
+        batch_size=PREDICTION_LOG_BATCH_SIZE,
+        flush_interval=PREDICTION_LOG_FLUSH_SECONDS,
+        on_drop=PREDICTION_LOG_DROPPED.labels(reason="buffer_full").inc,
+        on_flush=observe_log_flush,
+        on_error=on_log_error,
+    )
+    if PREDICTION_LOG
+    else None
+)
+if prediction_log is not None and not MULTIPROCESS_METRICS:
+    PREDICTION_LOG_PENDING.set_function(prediction_log.__len__)
+
+
+def log_prediction(endpoint: str, result: dict, latency_s: float):
+    """Un record par prédiction servie ; les réponses en erreur ne sont pas journalisées."""
+    if prediction_log is None:
+        return
+    logged_at = datetime.now(timezone.utc)
+    latency_ms = latency_s * 1000
+    for r in result.get("results", [result]):
+        if "prediction" in r:
+            prediction_log.log((
+                logged_at, endpoint, r["user_id"], r.get("features_used"), r["prediction"],
+                r.get("churn_proba"), r["model_version"], latency_ms,
+            ))
+
+
+@app.on_event("startup")
+def start_prediction_log():
+    if prediction_log is not None:
+        prediction_log.start()
+
+
+@app.on_event("shutdown")
+def stop_prediction_log():
+    if prediction_log is not None:
+        prediction_log.stop()
+
+
+# Clé du cache : (user_id, liste de features) -> les features ne changent qu'à la matérialisation
+FEATURES_KEY = tuple(FEATURES_REQUEST)
+if FEATURE_CACHE_SIZE > 0:
+    feature_cache = LRUTTLCache(
+        FEATURE_CACHE_SIZE, FEATURE_CACHE_TTL_SECONDS, on_evict=FEATURE_CACHE_EVICTIONS.inc
+    )
+    registry_watcher = RegistryWatcher(FEAST_REGISTRY_PATH, REGISTRY_CHECK_INTERVAL_SECONDS)
+else:
+    feature_cache = None
+    registry_watcher = None
+
+
+def _feast_fetch(user_ids: list[str]) -> dict:
+    return store.get_online_features(
+        features=FEATURES_REQUEST,
+        entity_rows=[{"user_id": uid} for uid in user_ids],
+    ).to_dict()
+
+
+def _cache_lookup(user_ids: list[str]):
+    """Retourne (rows déjà en cache, user_ids à demander au store)."""
+    if registry_watcher.changed():
+        feature_cache.clear()
+        FEATURE_CACHE_INVALIDATIONS.inc()
+
+    rows = {}
+    to_fetch = []
+    for uid in user_ids:
+        hit, row = feature_cache.get((uid, FEATURES_KEY))
+        if hit:
+            rows[uid] = row
+        else:
+            to_fetch.append(uid)
+    FEATURE_CACHE_HITS.inc(len(user_ids) - len(to_fetch))
+    FEATURE_CACHE_MISSES.inc(len(to_fetch))
+    return rows, to_fetch
+
+
+def _cache_fill(rows: dict, to_fetch: list[str], fetched: dict):
+    for i, uid in enumerate(to_fetch):
+        row = {name: values[i] for name, values in fetched.items()}
+        rows[uid] = row
+        # On ne fige pas un user incomplet : il peut être matérialisé entre-temps
+        if not any(is_missing(row.get(name)) for name in FEATURE_NAMES):
+            feature_cache.put((uid, FEATURES_KEY), row)
+
+
+def _assemble(user_ids: list[str], rows: dict) -> dict:
+    columns = ["user_id"] + FEATURE_NAMES
+    return {col: [rows[uid].get(col) for uid in user_ids] for col in columns}
+
+
+def fetch_online_features(user_ids: list[str]) -> dict:
+    """
+    Équivalent de store.get_online_features(...).to_dict() pour FEATURES_REQUEST,
+    mais seuls les users absents du cache sont demandés à Feast (en un seul appel).
+    """
+    if feature_cache is None:
+        return _feast_fetch(user_ids)
+    rows, to_fetch = _cache_lookup(user_ids)
+    if to_fetch:
+        _cache_fill(rows, to_fetch, _feast_fetch(to_fetch))
+    return _assemble(user_ids, rows)
+
+
+async def fetch_online_features_async(user_ids: list[str]) -> dict:
+    """Variante async de fetch_online_features : lecture directe des tables online (pool psycopg)."""
+    if feature_cache is None:
+        return await online_reader.fetch(user_ids)
+    rows, to_fetch = _cache_lookup(user_ids)
+    if to_fetch:
+        _cache_fill(rows, to_fetch, await online_reader.fetch(to_fetch))
+    return _assemble(user_ids, rows)
+
+NOT_INITIALIZED_ERROR = "Model or feature store not initialized"
+
+
+@contextmanager
+def stage(name: str):
+    """Chronomètre une étape du chemin de requête (api_stage_latency_seconds{stage=...})."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(stage=name).observe(time.perf_counter() - t0)
+
+
+def request_outcome(result: dict) -> str:
+    if "missing_features" in result:
+        return "missing_features"
+    if result.get("error") == NOT_INITIALIZED_ERROR:
+        return "not_initialized"
+    if "error" in result:
+        return "rejected"
+    return "ok"
+
+
+def _json_default(value):
+    # Scalaires numpy/pandas éventuels -> types Python natifs
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def finish(endpoint: str, result: dict, start_time: float, model: LoadedModel | None) -> Response:
+    """
+    Sérialise la réponse (étape "serialization") puis compte la requête par outcome
+    et version du modèle. Toutes les issues sont observées, y compris les erreurs.
+    """
+    with stage("serialization"):
+        response = Response(json.dumps(result, default=_json_default), media_type="application/json")
+    outcome = request_outcome(result)
+    model_version = result.get("model_version") or (model.version if model is not None else "none")
+    REQUEST_COUNT.labels(endpoint=endpoint, outcome=outcome, model_version=model_version).inc()
+    # TODO: observe latency in seconds (end - start)
+    latency = time.time() - start_time
+    REQUEST_LATENCY.labels(endpoint=endpoint, outcome=outcome).observe(latency)
+    log_prediction(endpoint, result, latency)
+    return response
+
+
+async def process_micro_batch(user_ids: list[str]) -> list[dict]:
+    """Un fetch de features et une inférence vectorisée pour tout le micro-batch."""
+    model = current_model  # une seule version pour tout le batch, même si un swap survient
+    unique_ids = dedupe_user_ids(user_ids)
+    with stage("feature_fetch"):
+        if online_reader is not None:
+            feature_dict = await fetch_online_features_async(unique_ids)
+        else:
+            feature_dict = await run_in_threadpool(fetch_online_features, unique_ids)
+    results = await run_in_threadpool(score_batch, unique_ids, feature_dict, model, True)
+    by_user = dict(zip(unique_ids, results))
+    return [by_user[uid] for uid in user_ids]
+
+
+def observe_micro_batch(size: int, queue_waits: list[float]):
+    MICRO_BATCH_SIZE.observe(size)
+    for wait in queue_waits:
+        MICRO_BATCH_QUEUE_WAIT.observe(wait)
+
+
+micro_batcher = (
+    MicroBatcher(
+        process_micro_batch,
+        max_batch_size=MICRO_BATCH_MAX_SIZE,
+        max_wait_ms=MICRO_BATCH_MAX_WAIT_MS,
+        on_batch=observe_micro_batch,
+    )
+    if MICRO_BATCH
+    else None
+)
+
+
+@app.on_event("startup")
+async def start_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_micro_batcher():
+    if micro_batcher is not None:
+        await micro_batcher.stop()
+
+
+STARTUP_PHASE_SECONDS = Gauge(
+    "api_startup_phase_seconds",
+    "Duration of each startup phase (store, model, online_reader, warmup, time_to_ready)",
+    ["phase"],
+    multiprocess_mode="livemax",
+)
+# Multi-workers : prête quand tous les workers vivants le sont
+API_READY = Gauge("api_ready", "1 once the model and feature store are loaded and warm", multiprocess_mode="livemin")
+
+startup_state = StartupState(
+    on_phase=lambda phase, seconds: STARTUP_PHASE_SECONDS.labels(phase=phase).set(seconds)
+)
+startup_task = None
+
+
+async def warm_up_request_path():
+    """
+    Requête synthétique de bout en bout avant le trafic réel : premier appel Feast
+    (chargement du registry, connexion à l'online store) et sérialisation JSON.
+    Ni les caches ni les métriques de requêtes ne sont touchés.
+    """
+    if online_reader is not None:
+        feature_dict = await online_reader.fetch(["__warmup__"])
+    else:
+        feature_dict = await run_in_threadpool(_feast_fetch, ["__warmup__"])
+    json.dumps({"user_id": "__warmup__", "features_used": feature_dict}, default=_json_default)
+
+
+async def startup_pipeline():
+    """
+    Store Feast et modèle chargés en parallèle, lecteur online ouvert, warmup synthétique,
+    puis /ready passe au vert. En cas d'échec, nouvel essai toutes les STARTUP_RETRY_SECONDS
+    (seuls les composants manquants sont rechargés).
+    """
+    global store, current_model, online_reader
+    while True:
+        try:
+            phases = {}
+            if store is None:
+                phases["store"] = load_store
+            if current_model is None:
+                phases["model"] = load_production_model  # warm_up du modèle inclus
+            try:
+                await startup_state.run_parallel(phases)
+            finally:
+                # Composants chargés conservés même si l'autre phase a échoué : pas rechargés au nouvel essai
+                store = startup_state.results.get("store", store)
+                current_model = startup_state.results.get("model", current_model)
+            MODEL_INFO.labels(version=current_model.version).set(1)
+
+            if ONLINE_READ_MODE == "direct" and online_reader is None:
+                from online_reader import AsyncOnlineReader
+
+                reader = AsyncOnlineReader.from_store(
+                    store, FEATURES_REQUEST, min_size=ONLINE_POOL_MIN_SIZE, max_size=ONLINE_POOL_MAX_SIZE
+                )
+                await startup_state.run_async_phase("online_reader", reader.open())
+                online_reader = reader
+
+            if score_table_watcher is not None and score_table is None:
+                await startup_state.run_phase("score_table", refresh_score_table)
+
+            if shadow_scorer is not None and shadow_model is None:
+                await startup_state.run_phase("shadow_model", load_shadow_model)
+
+            await startup_state.run_async_phase("warmup", warm_up_request_path())
+            break
+        except Exception as e:
+            startup_state.mark_failed(e)
+            print(f"Warning: init failed: {e}")
+            if STARTUP_RETRY_SECONDS <= 0:
+                return
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+
+    if model_watcher is not None:
+        model_watcher.current_version = current_model.version
+        model_watcher.start()
+    if score_table_watcher is not None:
+        score_table_watcher.start()
+    if shadow_scorer is not None:
+        shadow_scorer.start()
+    startup_state.mark_ready()
+    API_READY.set(1)
+    print(f"API ready: {startup_state.status()['phases']}")
+
+
+@app.on_event("startup")
+async def start_startup_pipeline():
+    # En tâche de fond : le serveur accepte les connexions (liveness) pendant le chargement
+    global startup_task
+    startup_task = asyncio.create_task(startup_pipeline())
+
+
+@app.on_event("shutdown")
+async def stop_startup_pipeline():
+    if startup_task is not None and not startup_task.done():
+        startup_task.cancel()
+
+
+@app.get("/ready")
+def ready():
+    """Readiness : 200 seulement une fois le store et le modèle chargés et chauds, 503 sinon."""
+    return JSONResponse(startup_state.status(), status_code=200 if startup_state.ready else 503)
+
 
 # TODO 2: Mettre une requête POST
 @app.post("/predict")
-def predict(payload: UserPayload):
-    # TODO: prendre le temps au départ avec time
+async def predict(payload: UserPayload):
+    if online_reader is None and micro_batcher is None and score_table_watcher is None:
+        # Mode "feast" : tout le traitement (sync) tourne dans le threadpool, comme avant
+        return await run_in_threadpool(predict_sync, payload)
+
     start_time = time.time()
+    model = current_model
+    if store is None or model is None:
+        return finish("predict", {"error": NOT_INITIALIZED_ERROR}, start_time, model)
 
-    # TODO: incrementiez le request counter
-    REQUEST_COUNT.inc()
+    # Mode lookup : score précalculé servi directement dans la boucle, sans threadpool
+    precomputed = lookup_score(payload.user_id, model)
+    if precomputed is not None:
+        return finish("predict", precomputed, start_time, model)
 
+    if micro_batcher is not None:
+        # Mode micro-batch : la requête est regroupée avec les /predict concurrents
+        result = await micro_batcher.submit(payload.user_id)
+        return finish("predict", result, start_time, model)
+
+    if online_reader is None:
+        return await run_in_threadpool(predict_live, payload.user_id, start_time, model)
+
+    # Mode "direct" : lecture async des tables online, seule l'inférence passe par le threadpool
+    with stage("feature_fetch"):
+        feature_dict = await fetch_online_features_async([payload.user_id])
+    result = await run_in_threadpool(score_user, payload.user_id, feature_dict, model)
+    return finish("predict", result, start_time, model)
+
+
+def predict_sync(payload: UserPayload):
+    # TODO: prendre le temps au départ avec time
+    start_time = time.time()
+
+    # Référence lue une seule fois : un hot-swap pendant la requête n'a pas d'effet sur elle
+    model = current_model
     if store is None or model is None:
-        return {"error": "Model or feature store not initialized"}
-
-    # TODO (optionel) à adapter si besoin
-    features_request = [
-            "subs_profile_fv:months_active",
-            "subs_profile_fv:monthly_fee",
-            "subs_profile_fv:paperless_billing",
-            "subs_profile_fv:plan_stream_tv",
-            "subs_profile_fv:plan_stream_movies",
-            "subs_profile_fv:net_service",
-            "usage_agg_30d_fv:watch_hours_30d",
-            "usage_agg_30d_fv:avg_session_mins_7d",
-            "usage_agg_30d_fv:unique_devices_30d",
-            "usage_agg_30d_fv:skips_7d",
-            "usage_agg_30d_fv:rebuffer_events_7d",
-            "payments_agg_90d_fv:failed_payments_90d",
-            "support_agg_90d_fv:support_tickets_90d",
-            "support_agg_90d_fv:ticket_avg_resolution_hrs_90d",
-        ]
+        return finish("predict", {"error": NOT_INITIALIZED_ERROR}, start_time, model)
+    return predict_live(payload.user_id, start_time, model)
 
 
+def predict_live(user_id: str, start_time: float, model: LoadedModel):
     # TODO 3 : Récupérer les features online
-    feature_dict = store.get_online_features(
-            features=features_request,
-            entity_rows=[{"user_id": payload.user_id}],
-        ).to_dict()
+    # (via le cache de features si activé, cf. fetch_online_features)
+    with stage("feature_fetch"):
+        feature_dict = fetch_online_features([user_id])
+
+    result = score_user(user_id, feature_dict, model)
+    return finish("predict", result, start_time, model)
+
 
-    X = pd.DataFrame({k: [v[0]] for k, v in feature_dict.items()})
+def score_user(user_id: str, feature_dict: dict, model: LoadedModel) -> dict:
+    """Inférence pour un user à partir de sa réponse Feast (format to_dict)."""
+    if model.fast is not None:
+        return predict_fast(user_id, feature_dict, model)
+
+    with stage("frame_build"):
+        X = pd.DataFrame({k: [v[0]] for k, v in feature_dict.items()})
 
     # Gestion des features manquantes
-    if X.isnull().any().any():
-            missing = X.columns[X.isnull().any()].tolist()
-            return {
-                "error": f"Missing features for user_id={payload.user_id}",
-                "missing_features": missing,
-            }
+    with stage("null_check"):
+        has_missing = X.isnull().any().any()
+    if has_missing:
+        missing = X.columns[X.isnull().any()].tolist()
+        return {
+            "error": f"Missing features for user_id={user_id}",
+            "missing_features": missing,
+        }
 
     # Nettoyage minimal (évite bugs de types)
     X = X.drop(columns=["user_id"], errors="ignore")
 
-    # TODO 4: appeler le modèle et produire la réponse JSON (prediction + proba optionnelle)
-    # Astuce : la plupart des modèles MLflow “pyfunc” utilisent model.predict(X)
-    # (on ne suppose pas predict_proba ici)
-    y_pred = model.predict(X)
-
-    # TODO: observe latency in seconds (end - start)
-    REQUEST_LATENCY.observe(time.time() - start_time)
+    # Features identiques + même version de modèle => même prédiction, on saute l'inférence
+    values = {k: v[0] for k, v in feature_dict.items()}
+    key, cached = cached_prediction(model, values)
+    if cached is not None:
+        prediction = cached[0]
+    else:
+        # TODO 4: appeler le modèle et produire la réponse JSON (prediction + proba optionnelle)
+        # Astuce : la plupart des modèles MLflow “pyfunc” utilisent model.predict(X)
+        # (on ne suppose pas predict_proba ici)
+        with stage("inference"):
+            y_pred = model.pyfunc.predict(X)
+        prediction = int(y_pred[0])
+        store_prediction(key, prediction, None)
+    shadow_submit(values, prediction)
 
     # TODO 5 : Retourner la prédiction
     return {
-        "user_id": payload.user_id,
-        "prediction": int(y_pred[0]),
+        "user_id": user_id,
+        "prediction": prediction,
+        "model_version": model.version,
         "features_used": X.to_dict(orient="records")[0],
     }
 
 
+def predict_fast(user_id: str, feature_dict: dict, model: LoadedModel) -> dict:
+    """Variante de /predict sans DataFrame : réponse Feast -> ligne NumPy -> forêt."""
+    with stage("null_check"):
+        values = {name: feature_dict[name][0] for name in model.fast.feature_names}
+        missing = [name for name, v in values.items() if is_missing(v)]
+    if missing:
+        return {
+            "error": f"Missing features for user_id={user_id}",
+            "missing_features": missing,
+        }
+
+    key, cached = cached_prediction(model, values)
+    if cached is not None:
+        y_pred = cached[0]
+    else:
+        with stage("frame_build"):
+            row = model.fast.build_row(values)
+        with stage("inference"):
+            proba = model.fast.predict_proba_row(row)
+        y_pred = int(model.fast.classes[proba.argmax()])
+        store_prediction(key, y_pred, float(proba[-1]))
+    shadow_submit(values, y_pred)
+
+    return {
+        "user_id": user_id,
+        "prediction": y_pred,
+        "model_version": model.version,
+        "features_used": {name: values[name] for name in FEATURE_NAMES if name in values},
+    }
+
+
+def predict_labels_and_proba(X: pd.DataFrame, model: LoadedModel):
+    """
+    Un seul passage dans la forêt pour tout le batch : predict_proba puis argmax
+    (équivalent à predict pour un RandomForest). Si le modèle n'expose pas
+    predict_proba, on retombe sur model.predict et la proba vaut None.
+    """
+    if model.sklearn is not None and hasattr(model.sklearn, "predict_proba"):
+        proba = model.sklearn.predict_proba(X)
+        labels = model.sklearn.classes_[proba.argmax(axis=1)]
+        return labels, proba[:, 1]
+    return model.pyfunc.predict(X), None
+
+
+def score_batch(user_ids: list[str], feature_dict: dict, model: LoadedModel,
+                with_features: bool = False) -> list[dict]:
+    """
+    Score vectorisé d'un batch à partir de la réponse Feast (format to_dict).
+    Les users incomplets sont signalés individuellement, sans faire échouer le batch.
+    with_features=True produit des réponses au format /predict (features_used).
+    """
+    with stage("null_check"):
+        missing = missing_by_row(feature_dict, FEATURE_NAMES, len(user_ids))
+    complete_idx = [i for i, m in enumerate(missing) if not m]
+
+    # Les vecteurs déjà scorés par cette version du modèle sortent du cache
+    predictions = {}  # index -> (label, proba)
+    keys = {}
+    rows = {i: {name: feature_dict[name][i] for name in FEATURE_NAMES} for i in complete_idx}
+    # Une entrée venue de /predict (pyfunc) n'a pas de proba : on rescore si /predict_batch en a besoin
+    need_proba = not with_features and model.sklearn is not None
+    for i in complete_idx:
+        keys[i], cached = cached_prediction(model, rows[i], need_proba)
+        if cached is not None:
+            predictions[i] = cached
+    to_score = [i for i in complete_idx if i not in predictions]
+
+    if to_score:
+        with stage("frame_build"):
+            X = pd.DataFrame(
+                {name: [feature_dict[name][i] for i in to_score] for name in FEATURE_NAMES}
+            )
+        # Un seul appel modèle vectorisé
+        with stage("inference"):
+            labels, proba = predict_labels_and_proba(X, model)
+        for j, i in enumerate(to_score):
+            predictions[i] = (int(labels[j]), None if proba is None else float(proba[j]))
+            store_prediction(keys[i], *predictions[i])
+
+    results = [
+        {
+            "user_id": uid,
+            "error": f"Missing features for user_id={uid}",
+            "missing_features": m,
+        }
+        for uid, m in zip(user_ids, missing)
+    ]
+    for i in complete_idx:
+        label, proba = predictions[i]
+        shadow_submit(rows[i], label)
+        result = {"user_id": user_ids[i], "prediction": label, "model_version": model.version}
+        if with_features:
+            result["features_used"] = rows[i]
+        else:
+            result["churn_proba"] = proba
+        results[i] = result
+    return results
+
+
+@app.post("/predict_batch")
+def predict_batch(payload: BatchPayload):
+    start_time = time.time()
+
+    model = current_model
+    if store is None or model is None:
+        return finish("predict_batch", {"error": NOT_INITIALIZED_ERROR}, start_time, model)
+
+    user_ids = dedupe_user_ids(payload.user_ids)
+    if len(user_ids) > MAX_BATCH_SIZE:
+        result = {"error": f"Batch too large: {len(user_ids)} user_ids (max {MAX_BATCH_SIZE})"}
+        return finish("predict_batch", result, start_time, model)
+    if not user_ids:
+        result = {"results": [], "n_scored": 0, "n_missing": 0, "model_version": model.version}
+        return finish("predict_batch", result, start_time, model)
+
+    # Scores précalculés d'abord (mode lookup) ; seuls les autres users passent par Feast + modèle
+    precomputed = {uid: lookup_score(uid, model) for uid in user_ids}
+    to_score = [uid for uid in user_ids if precomputed[uid] is None]
+
+    scored = {}
+    if to_score:
+        # Un seul appel Feast pour tout le batch (limité aux users absents du cache)
+        with stage("feature_fetch"):
+            feature_dict = fetch_online_features(to_score)
+        scored = dict(zip(to_score, score_batch(to_score, feature_dict, model)))
+
+    results = [precomputed.get(uid) or scored[uid] for uid in user_ids]
+    n_scored = sum(1 for r in results if "prediction" in r)
+
+    result = {
+        "results": results,
+        "n_scored": n_scored,
+        "n_missing": len(user_ids) - n_scored,
+        "model_version": model.version,
+    }
+    return finish("predict_batch", result, start_time, model)
+
+
 @app.get("/metrics")
 def metrics():
     # TODO: returnez une Response avec generate_latest() et CONTENT_TYPE_LATEST comme type de media
+    if MULTIPROCESS_METRICS:
+        # Registre dédié à la requête : agrège les fichiers de tous les workers
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUTTLCache:
+    """
+    Cache borné en mémoire : éviction LRU quand maxsize est atteint,
+    et expiration des entrées plus vieilles que ttl_seconds (None = pas d'expiration).
+    Thread-safe (les endpoints sync tournent dans le threadpool de FastAPI).
+    on_evict(n) est appelé à chaque éviction (LRU ou expiration), ex: Counter.inc.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float | None = None, clock=time.monotonic, on_evict=None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.on_evict = on_evict
+        self._data = OrderedDict()  # key -> (inserted_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Retourne (True, valeur) si présent et non expiré, sinon (False, None)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                inserted_at, value = entry
+                if self.ttl_seconds is None or self.clock() - inserted_at < self.ttl_seconds:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+                self._evicted(1)
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value) -> int:
+        """Insère une entrée et retourne le nombre d'entrées évincées."""
+        if self.maxsize <= 0:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._data[key] = (self.clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            if evicted:
+                self._evicted(evicted)
+        return evicted
+
+    def _evicted(self, n: int):
+        self.evictions += n
+        if self.on_evict is not None:
+            self.on_evict(n)
+
+    def clear(self) -> int:
+        """Vide le cache et retourne le nombre d'entrées supprimées."""
+        with self._lock:
+            n = len(self._data)
+            self._data.clear()
+            return n
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RegistryWatcher:
+    """
+    Détecte une nouvelle matérialisation Feast en surveillant la date de modification
+    du registry (feast materialize met à jour le registry à chaque run).
+    Le stat() est limité à un appel toutes les check_interval secondes.
+    """
+
+    def __init__(self, registry_path: str, check_interval: float = 5.0, clock=time.monotonic):
+        self.registry_path = registry_path
+        self.check_interval = check_interval
+        self.clock = clock
+        self._last_check = None
+        self._last_mtime = self._mtime()
+        self._lock = threading.Lock()
+
+    def _mtime(self):
+        try:
+            return os.stat(self.registry_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def changed(self) -> bool:
+        """True si le registry a été modifié depuis le dernier appel ayant retourné True."""
+        now = self.clock()
+        with self._lock:
+            if self._last_check is not None and now - self._last_check < self.check_interval:
+                return False
+            self._last_check = now
+            mtime = self._mtime()
+            if mtime == self._last_mtime:
+                return False
+            self._last_mtime = mtime
+            return True
+
+
+def feature_vector_hash(values: dict, feature_names: list[str]) -> str:
+    """
+    Empreinte stable d'un vecteur de features (ordre fixé par feature_names).
+    repr() distingue les types (True vs 1) et conserve la précision des floats.
+    """
+    payload = repr(tuple((name, values.get(name)) for name in feature_names))
+    return hashlib.blake2b(payload.encode("utf8"), digest_size=16).hexdigest()
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+def _is_passthrough(transformer) -> bool:
+    # Selon la version de sklearn, "passthrough" est conservé tel quel ou remplacé
+    # après fit par un FunctionTransformer identité (func=None).
+    if isinstance(transformer, str):
+        return transformer == "passthrough"
+    return type(transformer).__name__ == "FunctionTransformer" and transformer.func is None
+
+
+class FastPredictor:
+    """
+    Chemin d'inférence sans pandas pour un seul utilisateur.
+
+    On "compile" une fois la Pipeline sklearn entraînée (ColumnTransformer + RandomForest) :
+    - l'ordre des colonnes vient de l'artefact feature_schema.json du run MLflow ;
+    - le one-hot du ColumnTransformer devient une table de lookup {valeur -> index} ;
+    - les colonnes numériques "passthrough" deviennent de simples positions.
+
+    À chaque requête, on remplit une ligne NumPy float32 et on interroge directement
+    les arbres de la forêt (pas de DataFrame, pas de dispatch joblib pour 1 ligne).
+    """
+
+    def __init__(self, pipeline, feature_schema: dict):
+        prep = pipeline.named_steps["prep"]
+        clf = pipeline.named_steps["clf"]
+
+        cat_cols = list(feature_schema["categorical_cols"])
+        num_cols = list(feature_schema["numeric_cols"])
+
+        # Positions de sortie du ColumnTransformer, dans l'ordre des transformers ajustés
+        self.cat_lookup = {}   # col -> {catégorie: index de sortie}
+        self.num_index = {}    # col -> index de sortie
+        offset = 0
+        for name, transformer, columns in prep.transformers_:
+            columns = list(columns)
+            if isinstance(transformer, str) and transformer == "drop" or not columns:
+                continue
+            if name == "cat":
+                if columns != cat_cols:
+                    raise ValueError(f"feature_schema.json ne correspond pas au one-hot ajusté: {columns}")
+                if getattr(transformer, "drop_idx_", None) is not None or getattr(transformer, "_infrequent_enabled", False):
+                    raise ValueError("OneHotEncoder avec drop/infrequent non supporté par le chemin rapide")
+                for col, categories in zip(columns, transformer.categories_):
+                    self.cat_lookup[col] = {
+                        cat: offset + j for j, cat in enumerate(categories) if cat == cat  # ignore NaN
+                    }
+                    offset += len(categories)
+            elif name == "num" and _is_passthrough(transformer):
+                if columns != num_cols:
+                    raise ValueError(f"feature_schema.json ne correspond pas au passthrough ajusté: {columns}")
+                for col in columns:
+                    self.num_index[col] = offset
+                    offset += 1
+            else:
+                raise ValueError(f"Transformer non supporté par le chemin rapide: {name}")
+
+        if offset != clf.n_features_in_:
+            raise ValueError(f"{offset} colonnes construites, la forêt en attend {clf.n_features_in_}")
+
+        self.n_features = offset
+        self.feature_names = cat_cols + num_cols
+        self.classes = clf.classes_
+        # Structures Cython des arbres : on évite la validation d'entrée de chaque estimateur
+        self.trees = [est.tree_ for est in clf.estimators_]
+
+    def build_row(self, values: dict) -> np.ndarray:
+        """Remplit une ligne (1, n_features) float32 à partir d'un dict feature -> valeur."""
+        row = np.zeros((1, self.n_features), dtype=np.float32)
+        for col, lookup in self.cat_lookup.items():
+            idx = lookup.get(values[col])
+            if idx is not None:  # catégorie inconnue -> que des zéros (handle_unknown="ignore")
+                row[0, idx] = 1.0
+        for col, idx in self.num_index.items():
+            row[0, idx] = float(values[col])
+        return row
+
+    def predict_proba_row(self, row: np.ndarray) -> np.ndarray:
+        """Moyenne des probas des arbres, comme RandomForestClassifier.predict_proba."""
+        proba = np.zeros(len(self.classes), dtype=np.float64)
+        for tree in self.trees:
+            value = tree.predict(row)[0]
+            proba += value / value.sum()  # même normalisation que DecisionTreeClassifier.predict_proba
+        proba /= len(self.trees)
+        return proba
+
+    def predict_one(self, values: dict) -> tuple[int, float]:
+        """Retourne (prédiction, proba de la classe positive) pour un utilisateur."""
+        proba = self.predict_proba_row(self.build_row(values))
+        return int(self.classes[proba.argmax()]), float(proba[-1])
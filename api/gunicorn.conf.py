@@ -0,0 +1,44 @@
+# Service multi-workers avec une seule copie du modèle en mémoire :
+#   PRELOAD_MODEL=1 gunicorn -c gunicorn.conf.py app:app
+#
+# preload_app importe app.py dans le master avant le fork : avec PRELOAD_MODEL=1,
+# la forêt (tableaux de noeuds NumPy des 300 arbres) est chargée une fois puis partagée
+# en copy-on-write par tous les workers. Le FeatureStore, le pool online et le watcher
+# du modèle restent propres à chaque worker (connexions et threads ne survivent pas au fork).
+#
+# Métriques : mode multiprocess de prometheus_client. Chaque worker écrit ses compteurs
+# dans PROMETHEUS_MULTIPROC_DIR (vidé au démarrage du master, avant l'import de app.py)
+# et /metrics agrège tous les workers, quel que soit celui qui sert le scrape.
+import gc
+import glob
+import os
+
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+for stale in glob.glob(os.path.join(PROMETHEUS_MULTIPROC_DIR, "*.db")):
+    os.remove(stale)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+
+def when_ready(server):
+    # Appelé dans le master après le preload, avant le premier fork : les objets déjà
+    # créés passent dans la génération permanente du GC. Les collectes des workers ne
+    # réécrivent plus leurs en-têtes, donc ne dupliquent pas les pages partagées.
+    gc.freeze()
+    # Le master ne sert aucune requête : ses gauges "live*" (écrites au preload, ex. api_ready=0)
+    # ne doivent pas entrer dans l'agrégation des workers
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(os.getpid())
+
+
+def child_exit(server, worker):
+    # Les gauges "live*" d'un worker arrêté (ou recyclé) ne sont plus agrégées
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
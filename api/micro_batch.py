@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes /predict concurrentes en micro-batchs.
+
+    - process_batch(items) est une coroutine qui reçoit la liste des items d'un batch
+      et retourne la liste des résultats, dans le même ordre.
+    - Fenêtre adaptative : si aucun batch n'est en cours de traitement (API au repos),
+      la requête part immédiatement, sans attendre (pas de régression de latence à vide).
+      Sous charge, on collecte jusqu'à max_batch_size items ou max_wait_ms.
+    - on_batch(size, queue_waits) est appelé à chaque dispatch (métriques).
+    """
+
+    def __init__(self, process_batch, max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 max_in_flight: int = 4, on_batch=None):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_in_flight = max_in_flight
+        self.on_batch = on_batch
+        self._queue = None
+        self._worker = None
+        self._in_flight = 0
+        self._slots = None
+        self._tasks = set()
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def submit(self, item):
+        """Ajoute un item à la file et attend son résultat."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, time.perf_counter(), future))
+        return await future
+
+    async def _collect(self) -> list:
+        batch = [await self._queue.get()]
+
+        # Au repos : on part tout de suite avec ce qui est déjà dans la file
+        idle = self._in_flight == 0
+        deadline = time.perf_counter() + (0.0 if idle else self.max_wait)
+
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            await self._slots.acquire()
+            try:
+                batch = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            self._in_flight += 1
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch: list):
+        now = time.perf_counter()
+        if self.on_batch is not None:
+            self.on_batch(len(batch), [now - enqueued for _, enqueued, _ in batch])
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
@@ -0,0 +1,66 @@
+import threading
+
+
+class LoadedModel:
+    """
+    Tout ce qui dépend d'une version du modèle, remplacé d'un bloc lors d'un hot-swap :
+    un handler lit la référence une seule fois et travaille sur une version cohérente.
+    """
+
+    def __init__(self, version: str, pyfunc, sklearn=None, fast=None):
+        self.version = str(version)
+        self.pyfunc = pyfunc
+        self.sklearn = sklearn
+        self.fast = fast
+
+
+class ModelWatcher:
+    """
+    Surveille le Model Registry MLflow et recharge le modèle quand la version
+    en Production change, hors du chemin des requêtes (thread en arrière-plan).
+
+    - get_version() -> version Production courante (str) ou None ;
+    - load(version) -> LoadedModel déjà chauffé (warmup inclus) ;
+    - on_swap(loaded) publie le nouveau modèle (simple affectation = swap atomique).
+    """
+
+    def __init__(self, get_version, load, on_swap, current_version=None,
+                 interval_seconds: float = 30.0, on_error=None):
+        self.get_version = get_version
+        self.load = load
+        self.on_swap = on_swap
+        self.current_version = None if current_version is None else str(current_version)
+        self.interval_seconds = interval_seconds
+        self.on_error = on_error
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_once(self) -> bool:
+        """Recharge si la version Production a changé. Retourne True si un swap a eu lieu."""
+        version = self.get_version()
+        if version is None or str(version) == self.current_version:
+            return False
+        loaded = self.load(str(version))
+        self.on_swap(loaded)
+        self.current_version = str(version)
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.check_once()
+            except Exception as e:
+                # On garde le modèle courant ; nouvelle tentative au prochain tour
+                if self.on_error is not None:
+                    self.on_error(e)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,137 @@
+import asyncio
+import struct
+
+# ValueType.STRING dans l'encodage des clés d'entité Feast (feast.value_type.ValueType)
+VALUE_TYPE_STRING = 2
+
+
+def serialize_user_key(user_id: str, key_version: int = 2) -> bytes:
+    """
+    Sérialise la clé d'entité {"user_id": <str>} comme Feast
+    (feast.infra.key_encoding_utils.serialize_entity_key), pour les versions 2 et 3.
+    C'est la valeur stockée dans la colonne entity_key des tables online Postgres.
+    """
+    join_key = "user_id"
+    value = user_id.encode("utf8")
+    out = []
+    if key_version > 2:
+        out.append(struct.pack("<I", 1))  # nombre de join keys
+    out.append(struct.pack("<I", VALUE_TYPE_STRING))
+    if key_version > 2:
+        out.append(struct.pack("<I", len(join_key)))
+    out.append(join_key.encode("utf8"))
+    out.append(struct.pack("<I", VALUE_TYPE_STRING))
+    out.append(struct.pack("<I", len(value)))
+    out.append(value)
+    return b"".join(out)
+
+
+def decode_value(value_bin: bytes):
+    """Désérialise la colonne value (un ValueProto Feast) en valeur Python, comme to_dict()."""
+    from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+    from feast.type_map import feast_value_type_to_python_type
+
+    proto = ValueProto()
+    proto.ParseFromString(bytes(value_bin))
+    return feast_value_type_to_python_type(proto)
+
+
+def group_features_by_view(features: list[str]) -> dict[str, list[str]]:
+    """["fv:f1", "fv:f2", "fv2:f3"] -> {"fv": ["f1", "f2"], "fv2": ["f3"]} (ordre conservé)."""
+    views = {}
+    for ref in features:
+        view, name = ref.split(":", 1)
+        views.setdefault(view, []).append(name)
+    return views
+
+
+class AsyncOnlineReader:
+    """
+    Lecture directe des tables online Feast (online store Postgres) via un pool psycopg async
+    partagé, sans passer par FeatureStore.get_online_features.
+
+    Chaque feature view est stockée dans une table "{project}_{feature_view}" au format
+    (entity_key BYTEA, feature_name TEXT, value BYTEA, event_ts, ...). Les vues sont lues
+    en parallèle, chacune sur sa propre connexion du pool.
+    """
+
+    def __init__(self, conninfo: str, project: str, features: list[str], key_version: int = 2,
+                 db_schema: str = "public", min_size: int = 1, max_size: int = 10):
+        from psycopg_pool import AsyncConnectionPool
+
+        self.project = project
+        self.features = features
+        self.views = group_features_by_view(features)
+        self.key_version = key_version
+        self.db_schema = db_schema
+        self.pool = AsyncConnectionPool(
+            conninfo=conninfo,
+            min_size=min_size,
+            max_size=max_size,
+            open=False,
+            kwargs={"autocommit": True},
+        )
+
+    @classmethod
+    def from_store(cls, store, features: list[str], min_size: int = 1, max_size: int = 10):
+        """Construit le lecteur à partir de la config online_store du feature_store.yaml."""
+        from psycopg.conninfo import make_conninfo
+
+        cfg = store.config.online_store
+        conninfo = make_conninfo(
+            "",
+            user=cfg.user,
+            password=cfg.password,
+            host=cfg.host,
+            port=int(cfg.port),
+            dbname=cfg.database,
+        )
+        return cls(
+            conninfo,
+            project=store.config.project,
+            features=features,
+            key_version=store.config.entity_key_serialization_version,
+            db_schema=cfg.db_schema or "public",
+            min_size=min_size,
+            max_size=max_size,
+        )
+
+    async def open(self):
+        await self.pool.open()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def _read_view(self, view: str, feature_names: list[str], keys: list[bytes]) -> dict:
+        """Retourne {entity_key: {feature_name: valeur}} pour une feature view."""
+        from psycopg import sql
+
+        query = sql.SQL(
+            "SELECT entity_key, feature_name, value FROM {} "
+            "WHERE entity_key = ANY(%s) AND feature_name = ANY(%s)"
+        ).format(sql.Identifier(self.db_schema, f"{self.project}_{view}"))
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(query, (keys, feature_names))
+            rows = await cur.fetchall()
+
+        out = {}
+        for entity_key, feature_name, value in rows:
+            out.setdefault(bytes(entity_key), {})[feature_name] = decode_value(value)
+        return out
+
+    async def fetch(self, user_ids: list[str]) -> dict:
+        """
+        Même format que get_online_features(...).to_dict() :
+        {"user_id": [...], feature: [valeur ou None, ...]}.
+        """
+        keys = [serialize_user_key(uid, self.key_version) for uid in user_ids]
+        per_view = await asyncio.gather(
+            *(self._read_view(view, names, keys) for view, names in self.views.items())
+        )
+
+        result = {"user_id": list(user_ids)}
+        for (view, names), values in zip(self.views.items(), per_view):
+            for name in names:
+                result[name] = [values.get(key, {}).get(name) for key in keys]
+        return result
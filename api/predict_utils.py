@@ -0,0 +1,31 @@
+import math
+
+
+def dedupe_user_ids(user_ids: list[str]) -> list[str]:
+    """
+    Supprime les doublons en conservant l'ordre d'arrivée :
+    un même user_id n'est récupéré et scoré qu'une seule fois par batch.
+    """
+    return list(dict.fromkeys(user_ids))
+
+
+def is_missing(value) -> bool:
+    """Une feature est manquante si Feast renvoie None (ou NaN côté float)."""
+    if value is None:
+        return True
+    return isinstance(value, float) and math.isnan(value)
+
+
+def missing_by_row(feature_dict: dict, feature_names: list[str], n_rows: int) -> list[list[str]]:
+    """
+    Pour chaque ligne d'une réponse Feast (dict colonne -> liste de valeurs),
+    retourne la liste des features manquantes. Une liste vide = ligne complète.
+    Une colonne absente de la réponse est considérée manquante pour toutes les lignes.
+    """
+    missing = [[] for _ in range(n_rows)]
+    for name in feature_names:
+        values = feature_dict.get(name)
+        for i in range(n_rows):
+            if values is None or is_missing(values[i]):
+                missing[i].append(name)
+    return missing
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from collections import deque
+
+# Colonnes de la table prediction_log (cf. db/init/001_schema.sql), dans l'ordre des records
+LOG_COLUMNS = ("logged_at", "endpoint", "user_id", "features", "prediction", "churn_proba",
+               "model_version", "latency_ms")
+
+PREDICTION_LOG_DDL = """
+CREATE TABLE IF NOT EXISTS prediction_log (
+  logged_at TIMESTAMPTZ,
+  endpoint TEXT,
+  user_id TEXT,
+  features JSONB,
+  prediction INT,
+  churn_proba DOUBLE PRECISION,
+  model_version TEXT,
+  latency_ms DOUBLE PRECISION
+);
+CREATE INDEX IF NOT EXISTS prediction_log_logged_at_idx ON prediction_log (logged_at);
+"""
+
+
+class PredictionLogWriter:
+    """
+    Journal des prédictions sans impact sur le chemin des requêtes.
+
+    - log(record) ajoute au ring buffer en O(1) sous un verrou court ; buffer plein :
+      le plus ancien record est écrasé et compté (on_drop(n)), la requête n'attend jamais ;
+    - un thread vide le buffer par lots de batch_size (dès qu'un lot est plein, au plus
+      tard toutes les flush_interval secondes) via write_batch(records) ;
+    - un lot dont l'écriture échoue est abandonné : on_error(e, n) (pas de retry infini
+      qui ferait grossir la mémoire) ; on_flush(n, seconds) après chaque lot écrit.
+    """
+
+    def __init__(self, write_batch, capacity: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, on_drop=None, on_flush=None, on_error=None):
+        self.write_batch = write_batch
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_drop = on_drop
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def log(self, record) -> bool:
+        """Retourne False si un record plus ancien a dû être écrasé."""
+        with self._lock:
+            full = len(self._buffer) >= self.capacity
+            if full:
+                self._buffer.popleft()
+            self._buffer.append(record)
+            pending = len(self._buffer)
+        if full and self.on_drop is not None:
+            self.on_drop(1)
+        if pending >= self.batch_size:
+            self._wakeup.set()
+        return not full
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _drain(self) -> list:
+        with self._lock:
+            n = min(len(self._buffer), self.batch_size)
+            return [self._buffer.popleft() for _ in range(n)]
+
+    def flush_once(self) -> int:
+        """Écrit un lot. Retourne le nombre de records écrits (0 si buffer vide ou échec)."""
+        batch = self._drain()
+        if not batch:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            self.write_batch(batch)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e, len(batch))
+            return 0
+        if self.on_flush is not None:
+            self.on_flush(len(batch), time.perf_counter() - t0)
+        return len(batch)
+
+    def _flush_backlog(self):
+        while self.flush_once() == self.batch_size:
+            pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_backlog()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Arrête le thread puis écrit ce qui reste dans le buffer (au mieux)."""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._flush_backlog()
+        self.flush_once()
+
+
+class PostgresLogSink:
+    """write_batch pour PredictionLogWriter : COPY dans prediction_log, connexion gardée ouverte."""
+
+    def __init__(self, connect):
+        self.connect = connect
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self.connect()
+            self._conn.execute(PREDICTION_LOG_DDL)
+            self._conn.commit()
+        return self._conn
+
+    def __call__(self, records: list):
+        conn = self._connection()
+        try:
+            with conn.cursor().copy(f"COPY prediction_log ({', '.join(LOG_COLUMNS)}) FROM STDIN") as copy:
+                for record in records:
+                    features = record[3]
+                    features = None if features is None else json.dumps(features, default=str)
+                    copy.write_row((*record[:3], features, *record[4:]))
+            conn.commit()
+        except Exception:
+            # Connexion potentiellement cassée : on repartira d'une nouvelle au prochain lot
+            conn.close()
+            self._conn = None
+            raise
@@ -0,0 +1,62 @@
+class ScoreTable:
+    """
+    Scores précalculés par le flow de scoring (table churn_scores) pour une version
+    du modèle et un as_of, chargés en mémoire : lookup en temps constant par user_id.
+    """
+
+    def __init__(self, model_version: str, as_of: str, scores: dict[str, float]):
+        self.model_version = str(model_version)
+        self.as_of = str(as_of)
+        self.scores = scores
+
+    def lookup(self, user_id: str, model_version: str) -> tuple[str, float | None]:
+        """Retourne ("hit", score), ("miss", None) ou ("version_mismatch", None)."""
+        if str(model_version) != self.model_version:
+            return "version_mismatch", None
+        score = self.scores.get(user_id)
+        if score is None:
+            return "miss", None
+        return "hit", score
+
+    def __len__(self):
+        return len(self.scores)
+
+
+def score_table_signature(conn, model_version: str, as_of: str | None = None) -> str | None:
+    """
+    Empreinte des scores disponibles pour une version : "version|as_of|nb_lignes|dernier scored_at".
+    Sans as_of explicite, on attend les scores du snapshot courant (dernier as_of de
+    subscriptions_profile_snapshots, celui que score_flow parcourt) : si le flow de scoring
+    n'a pas encore tourné sur ce snapshot, nb_lignes vaut 0 et la table chargée est vide
+    (tous les lookups sont des miss, servis en live) plutôt que les scores d'un mois périmé.
+    Retourne None si aucun snapshot n'existe.
+    """
+    row = conn.execute(
+        """
+        WITH snapshot AS (
+            SELECT COALESCE(%(as_of)s::date,
+                            (SELECT max(as_of) FROM subscriptions_profile_snapshots)) AS as_of
+        )
+        SELECT s.as_of, count(c.user_id), max(c.scored_at)
+        FROM snapshot s
+        LEFT JOIN churn_scores c ON c.as_of = s.as_of AND c.model_version = %(version)s
+        GROUP BY s.as_of
+        """,
+        {"version": str(model_version), "as_of": as_of},
+    ).fetchone()
+    if row is None or row[0] is None:
+        return None
+    as_of_value, n_rows, last_scored_at = row
+    return f"{model_version}|{as_of_value.isoformat()}|{n_rows}|{last_scored_at}"
+
+
+def load_score_table(conn, signature: str) -> ScoreTable:
+    """Charge les scores désignés par une signature de score_table_signature."""
+    model_version, as_of, n_rows = signature.split("|")[:3]
+    if n_rows == "0":
+        return ScoreTable(model_version, as_of, {})
+    cur = conn.execute(
+        "SELECT user_id, score FROM churn_scores WHERE model_version = %s AND as_of = %s",
+        (model_version, as_of),
+    )
+    return ScoreTable(model_version, as_of, {user_id: float(score) for user_id, score in cur})
@@ -0,0 +1,80 @@
+import queue
+import threading
+import time
+
+
+class ShadowScorer:
+    """
+    Scoring "shadow" hors du chemin des requêtes : les handlers déposent leurs items
+    (features + prédiction servie) dans une file bornée, un thread les score par lots.
+
+    - submit(item) ne bloque jamais : si la file est pleine, l'item est abandonné
+      (on_drop()) plutôt que de ralentir la réponse principale ;
+    - score_batch(items) -> liste de prédictions shadow, dans le même ordre ;
+    - on_batch(items, predictions, seconds) reçoit chaque lot scoré (métriques) ;
+    - on_error(e) est appelé si le scoring d'un lot échoue (le lot est perdu).
+    """
+
+    def __init__(self, score_batch, maxsize: int = 1000, max_batch_size: int = 64,
+                 on_batch=None, on_drop=None, on_error=None):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.on_batch = on_batch
+        self.on_drop = on_drop
+        self.on_error = on_error
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, item) -> bool:
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.on_drop is not None:
+                self.on_drop()
+            return False
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get(timeout=0.5)]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run_once(self) -> int:
+        """Score un lot (attend au plus 0,5 s le premier item). Retourne la taille du lot."""
+        try:
+            batch = self._collect()
+        except queue.Empty:
+            return 0
+        t0 = time.perf_counter()
+        try:
+            predictions = self.score_batch(batch)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return len(batch)
+        if self.on_batch is not None:
+            self.on_batch(batch, predictions, time.perf_counter() - t0)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
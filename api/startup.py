@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+
+class StartupState:
+    """
+    État du démarrage de l'API : phases chronométrées, readiness et dernière erreur.
+
+    - run_phase(name, fn, *args) exécute fn dans un thread (les chargements Feast/MLflow
+      sont bloquants) et mesure sa durée ;
+    - run_parallel({name: fn}) lance plusieurs phases en même temps et retourne
+      {name: résultat} ; la première erreur est relevée une fois toutes les phases finies,
+      les résultats des phases réussies restant disponibles dans results (nouvel essai
+      limité aux phases en échec) ;
+    - on_phase(name, seconds) est appelé à la fin de chaque phase réussie (métriques).
+    """
+
+    def __init__(self, on_phase=None, clock=time.perf_counter):
+        self.on_phase = on_phase
+        self.clock = clock
+        self.started_at = clock()
+        self.timings = {}
+        self.results = {}
+        self.ready = False
+        self.error = None
+
+    async def run_phase(self, name: str, fn, *args):
+        t0 = self.clock()
+        result = await asyncio.to_thread(fn, *args)
+        self._record(name, self.clock() - t0)
+        return result
+
+    async def run_async_phase(self, name: str, coro):
+        t0 = self.clock()
+        result = await coro
+        self._record(name, self.clock() - t0)
+        return result
+
+    async def run_parallel(self, phases: dict) -> dict:
+        names = list(phases)
+        results = await asyncio.gather(
+            *(self.run_phase(name, phases[name]) for name in names), return_exceptions=True
+        )
+        errors = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                errors.append(result)
+            else:
+                self.results[name] = result
+        if errors:
+            raise errors[0]
+        return dict(zip(names, results))
+
+    def _record(self, name: str, seconds: float):
+        self.timings[name] = seconds
+        if self.on_phase is not None:
+            self.on_phase(name, seconds)
+
+    def mark_ready(self):
+        """Fin du démarrage : enregistre le temps total depuis la création de l'état."""
+        self._record("time_to_ready", self.clock() - self.started_at)
+        self.error = None
+        self.ready = True
+
+    def mark_failed(self, error: Exception):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def status(self) -> dict:
+        return {
+            "status": "ready" if self.ready else ("failed" if self.error else "starting"),
+            "error": self.error,
+            "phases": {name: round(seconds, 4) for name, seconds in self.timings.items()},
+        }
@@ -0,0 +1,361 @@
+"""
+Test de charge de /predict en boucle ouverte : les requêtes partent à des instants
+planifiés (débit --rps constant ou arrivées de Poisson), indépendamment des réponses.
+La latence est mesurée depuis l'instant planifié : si tous les workers (--concurrency)
+sont occupés, l'attente côté client est comptée (pas d'omission coordonnée).
+
+Les user_ids sont rejoués depuis data/seeds/*/users.csv. Résultat en JSON :
+p50/p95/p99/max, débit obtenu, taux d'erreurs HTTP et de réponses en erreur
+(ex: features manquantes).
+
+Exemples :
+    # Contre une API déployée
+    python benchmarks/api_load.py --url http://localhost:8000 --rps 200 --duration 30
+
+    # En local, Feast et modèle simulés (features des seeds, forêt entraînée sur les labels) :
+    # permet de comparer deux versions de api/app.py d'un run à l'autre
+    FAST_INFERENCE=1 python benchmarks/api_load.py --local --rps 300 --duration 20 --output fast.json
+
+Le client (threads + http.client) plafonne vers ~1-2k req/s par process : au-delà,
+lancer plusieurs instances.
+"""
+import argparse
+import csv
+import glob
+import http.client
+import json
+import math
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_USERS_GLOB = str(ROOT / "data" / "seeds" / "*" / "users.csv")
+
+
+# ----------------------------
+# Agrégation des résultats (pure, testée)
+# ----------------------------
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    """Percentile "nearest rank" d'une liste déjà triée (q entre 0 et 100)."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(results: list[tuple[float, int, bool]], duration_s: float, n_planned: int | None = None) -> dict:
+    """
+    results : (latence en s, statut HTTP ou 0 si erreur réseau, réponse en erreur applicative).
+    Seules les requêtes HTTP 200 entrent dans les percentiles de latence.
+    """
+    n = len(results)
+    ok_latencies = sorted(lat for lat, status, _ in results if status == 200)
+    status_counts = {}
+    for _, status, _ in results:
+        key = str(status) if status else "network_error"
+        status_counts[key] = status_counts.get(key, 0) + 1
+    n_errors = n - len(ok_latencies)
+    n_app_errors = sum(1 for _, status, app_error in results if status == 200 and app_error)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "requests": n,
+        "planned": n if n_planned is None else n_planned,
+        "duration_s": round(duration_s, 3),
+        "throughput_rps": round(n / duration_s, 1) if duration_s > 0 else None,
+        "errors": n_errors,
+        "error_rate": round(n_errors / n, 4) if n else None,
+        "app_errors": n_app_errors,
+        "app_error_rate": round(n_app_errors / n, 4) if n else None,
+        "status_counts": status_counts,
+        "latency_ms": {
+            "p50": ms(percentile(ok_latencies, 50)),
+            "p95": ms(percentile(ok_latencies, 95)),
+            "p99": ms(percentile(ok_latencies, 99)),
+            "max": ms(ok_latencies[-1] if ok_latencies else None),
+            "mean": ms(sum(ok_latencies) / len(ok_latencies) if ok_latencies else None),
+        },
+    }
+
+
+def arrival_offsets(rps: float, duration_s: float, arrival: str = "uniform", seed: int = 0) -> list[float]:
+    """Instants de départ (en s depuis le début du run)."""
+    if arrival == "uniform":
+        return [i / rps for i in range(int(rps * duration_s))]
+    rng = random.Random(seed)
+    offsets, t = [], 0.0
+    while True:
+        t += rng.expovariate(rps)
+        if t >= duration_s:
+            return offsets
+        offsets.append(t)
+
+
+# ----------------------------
+# Générateur de charge
+# ----------------------------
+def load_user_ids(pattern: str = DEFAULT_USERS_GLOB) -> list[str]:
+    user_ids = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, newline="") as f:
+            user_ids.extend(row["user_id"] for row in csv.DictReader(f))
+    if not user_ids:
+        raise RuntimeError(f"No user_id found in {pattern}")
+    return user_ids
+
+
+def _worker(host: str, port: int, path: str, jobs: queue.Queue, out: list, lock: threading.Lock, timeout: float):
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        scheduled_at, user_id = job
+        body = json.dumps({"user_id": user_id})
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            payload = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            payload, status = b"", 0
+        latency = time.perf_counter() - scheduled_at
+        with lock:
+            out.append((latency, status, b'"error"' in payload))
+    conn.close()
+
+
+def run_load(base_url: str, user_ids: list[str], rps: float, duration_s: float, concurrency: int,
+             arrival: str = "uniform", timeout: float = 10.0, seed: int = 0, path: str = "/predict") -> dict:
+    url = urlsplit(base_url)
+    offsets = arrival_offsets(rps, duration_s, arrival, seed)
+    rng = random.Random(seed)
+
+    jobs = queue.Queue()
+    results, lock = [], threading.Lock()
+    workers = [
+        threading.Thread(target=_worker, args=(url.hostname, url.port or 80, path, jobs, results, lock, timeout),
+                         daemon=True)
+        for _ in range(concurrency)
+    ]
+    for w in workers:
+        w.start()
+
+    t0 = time.perf_counter()
+    for offset in offsets:
+        scheduled_at = t0 + offset
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        jobs.put((scheduled_at, rng.choice(user_ids)))
+    for _ in workers:
+        jobs.put(None)
+    for w in workers:
+        w.join()
+    duration = time.perf_counter() - t0
+
+    summary = summarize(results, duration, n_planned=len(offsets))
+    summary["config"] = {
+        "url": base_url + path,
+        "rps": rps,
+        "duration_s": duration_s,
+        "concurrency": concurrency,
+        "arrival": arrival,
+        "n_user_ids": len(user_ids),
+    }
+    return summary
+
+
+# ----------------------------
+# Mode local : API in-process avec Feast et modèle simulés
+# ----------------------------
+def _read_seed_features(seed_dir: Path, feature_names: list[str]):
+    import pandas as pd
+
+    tables = ["subscriptions", "usage_agg_30d", "payments_agg_90d", "support_agg_90d"]
+    df = pd.read_csv(seed_dir / "users.csv", usecols=["user_id"])
+    for table in tables:
+        df = df.merge(pd.read_csv(seed_dir / f"{table}.csv"), on="user_id", how="left")
+    labels = pd.read_csv(seed_dir / "labels.csv")
+    df = df.merge(labels, on="user_id", how="left")
+    return df[["user_id"] + feature_names + ["churn_label"]]
+
+
+class SeedFeatureStore:
+    """Remplace FeatureStore : réponses get_online_features servies depuis les CSV de seeds."""
+
+    def __init__(self, rows: dict[str, dict], latency_ms: float = 0.0):
+        self.rows = rows
+        self.latency_ms = latency_ms
+
+    def get_online_features(self, features, entity_rows):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)  # aller-retour simulé vers l'online store
+        user_ids = [e["user_id"] for e in entity_rows]
+        out = {"user_id": user_ids}
+        for ref in features:
+            name = ref.split(":", 1)[1]
+            out[name] = [self.rows.get(uid, {}).get(name) for uid in user_ids]
+        return _OnlineResponse(out)
+
+
+class _OnlineResponse:
+    def __init__(self, data: dict):
+        self.data = data
+
+    def to_dict(self):
+        return self.data
+
+
+class _LocalPyfunc:
+    """Interface minimale du pyfunc MLflow utilisée par l'API."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    def predict(self, X):
+        return self.pipeline.predict(X)
+
+    def get_raw_model(self):
+        return self.pipeline
+
+
+def build_local_backend(app_module, seed_dir: Path, n_estimators: int, feast_latency_ms: float):
+    """Entraîne une forêt (même Pipeline que train_and_compare_flow) et branche les stubs sur l'API."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    names = app_module.FEATURE_NAMES
+    df = _read_seed_features(seed_dir, names)
+    train = df.dropna()
+    cat_cols = [c for c in names if train[c].dtype == "object"]
+    num_cols = [c for c in names if c not in cat_cols]
+    pipe = Pipeline(steps=[
+        ("prep", ColumnTransformer(
+            [("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_cols),
+             ("num", "passthrough", num_cols)],
+            remainder="drop",
+        )),
+        ("clf", RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=42,
+                                       class_weight="balanced", max_features="sqrt")),
+    ])
+    pipe.fit(train[names], train["churn_label"].astype(int))
+
+    fast = None
+    if app_module.FAST_INFERENCE:
+        from fast_path import FastPredictor
+
+        fast = FastPredictor(pipe, {"categorical_cols": cat_cols, "numeric_cols": num_cols})
+
+    def load_model_version(version):
+        loaded = app_module.LoadedModel(version, _LocalPyfunc(pipe), pipe, fast)
+        app_module.warm_up(loaded)
+        return loaded
+
+    rows = {r["user_id"]: r for r in df[["user_id"] + names].to_dict(orient="records")}
+    store = SeedFeatureStore(rows, latency_ms=feast_latency_ms)
+    app_module.load_store = lambda: store
+    app_module.load_model_version = load_model_version
+    app_module.load_production_model = lambda: load_model_version("local")
+
+
+def serve_local(args):
+    """Process enfant : API + backends simulés (le GIL n'est pas partagé avec le générateur de charge)."""
+    # Pas de MLflow / Postgres en local : hot reload, lecture directe et lookup désactivés
+    os.environ["MODEL_RELOAD_INTERVAL_SECONDS"] = "0"
+    os.environ["ONLINE_READ_MODE"] = "feast"
+    os.environ["SCORE_LOOKUP"] = "0"
+    sys.path.insert(0, str(ROOT / "api"))
+    import uvicorn
+    import app as app_module
+
+    build_local_backend(app_module, Path(args.seed_dir), args.n_estimators, args.feast_latency_ms)
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+def start_local_api(args) -> tuple[str, subprocess.Popen]:
+    cmd = [sys.executable, __file__, "--serve-local", "--port", str(args.port), "--seed-dir", args.seed_dir,
+           "--n-estimators", str(args.n_estimators), "--feast-latency-ms", str(args.feast_latency_ms)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 300
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Local API exited with code {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", args.port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return f"http://127.0.0.1:{args.port}", proc
+        except OSError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise TimeoutError("Local API not ready")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--rps", type=float, default=50.0)
+    parser.add_argument("--duration", type=float, default=30.0, help="durée de la phase de mesure (s)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requêtes simultanées max")
+    parser.add_argument("--arrival", choices=["uniform", "poisson"], default="uniform")
+    parser.add_argument("--warmup", type=float, default=2.0, help="secondes de charge non mesurées")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", default=DEFAULT_USERS_GLOB, help="glob des users.csv à rejouer")
+    parser.add_argument("--output", help="fichier JSON de sortie (défaut : stdout)")
+    local = parser.add_argument_group("mode local")
+    local.add_argument("--local", action="store_true", help="API locale (sous-process), Feast et modèle simulés")
+    local.add_argument("--serve-local", action="store_true", help=argparse.SUPPRESS)
+    local.add_argument("--port", type=int, default=8799)
+    local.add_argument("--seed-dir", default=str(ROOT / "data" / "seeds" / "month_000"))
+    local.add_argument("--n-estimators", type=int, default=300)
+    local.add_argument("--feast-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.serve_local:
+        serve_local(args)
+        return
+
+    user_ids = load_user_ids(args.users)
+    proc = None
+    if args.local:
+        base_url, proc = start_local_api(args)
+    else:
+        base_url = args.url.rstrip("/")
+
+    try:
+        if args.warmup > 0:
+            run_load(base_url, user_ids, args.rps, args.warmup, args.concurrency, args.arrival,
+                     args.timeout, args.seed + 1)
+        summary = run_load(base_url, user_ids, args.rps, args.duration, args.concurrency, args.arrival,
+                           args.timeout, args.seed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+    summary["config"]["local"] = args.local
+
+    out = json.dumps(summary, indent=2)
+    if args.output:
+        Path(args.output).write_text(out)
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Débit de l'upsert d'ingestion (services/prefect/ingest_flow.py) selon le chargement
+de la table de staging : COPY FROM STDIN ("copy") contre INSERTs pandas ("to_sql"), et COPY
+par chunks de --chunk-size lignes ("chunked", INGEST_CHUNK_SIZE) avec le pic mémoire.
+
+Les CSV de seeds sont répliqués --scale fois (user_id suffixés "-b<k>") dans un
+répertoire temporaire, puis chaque table est upsertée avec chaque moteur, dans
+l'ordre des FK (users d'abord). Chaque table est chargée deux fois par moteur :
+"insert" (lignes nouvelles) puis "update" (toutes en conflit). Les lignes de
+benchmark sont supprimées à la fin.
+
+Usage (environnement de services/prefect/requirements.txt, Postgres joignable
+avec le schéma de db/init/001_schema.sql, variables POSTGRES_*) :
+    python benchmarks/ingest_load.py --seed-dir data/seeds/month_000 --scale 10
+    python benchmarks/ingest_load.py --scale 100 --engines copy chunked --chunk-size 50000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "services" / "prefect"))
+
+import ingest_flow  # noqa: E402
+from ingest_utils import traced_peak_memory  # noqa: E402
+
+# Ordre des FK : users avant les tables qui la référencent
+TABLES = ["users", "subscriptions", "usage_agg_30d", "payments_agg_90d", "support_agg_90d", "labels"]
+SUFFIX = "-b"
+
+
+def scale_seeds(seed_dir: Path, out_dir: Path, scale: int):
+    for table in TABLES:
+        df = pd.read_csv(seed_dir / f"{table}.csv", dtype={"user_id": str})
+        copies = []
+        for k in range(scale):
+            part = df.copy()
+            part["user_id"] = part["user_id"] + f"{SUFFIX}{k}"
+            copies.append(part)
+        pd.concat(copies, ignore_index=True).to_csv(out_dir / f"{table}.csv", index=False)
+
+
+def cleanup():
+    with ingest_flow.engine().begin() as conn:
+        for table in reversed(TABLES):
+            conn.exec_driver_sql(f"DELETE FROM {table} WHERE user_id LIKE '%%{SUFFIX}%%'")
+
+
+def run_engine(load_engine: str, data_dir: Path, chunk_size: int) -> list[dict]:
+    if load_engine == "chunked":
+        ingest_flow.INGEST_LOAD_ENGINE, ingest_flow.INGEST_CHUNK_SIZE = "copy", chunk_size
+    else:
+        ingest_flow.INGEST_LOAD_ENGINE, ingest_flow.INGEST_CHUNK_SIZE = load_engine, 0
+    results = []
+    for phase in ("insert", "update"):
+        for table in TABLES:
+            csv_path = data_dir / f"{table}.csv"
+            n_rows = sum(1 for _ in open(csv_path)) - 1
+            t0 = time.perf_counter()
+            with traced_peak_memory() as memory:
+                ingest_flow.upsert_csv.fn(table, str(csv_path), ["user_id"])
+            elapsed = time.perf_counter() - t0
+            results.append({
+                "engine": load_engine, "phase": phase, "table": table, "rows": n_rows,
+                "seconds": round(elapsed, 3), "rows_per_s": round(n_rows / elapsed),
+                "peak_mb": memory["peak_mb"],
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-dir", default="data/seeds/month_000")
+    parser.add_argument("--scale", type=int, default=10, help="nombre de copies des seeds")
+    parser.add_argument("--engines", nargs="+", default=["to_sql", "copy"],
+                        help="to_sql, copy et/ou chunked")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="lignes par chunk (moteur chunked)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        scale_seeds(Path(args.seed_dir), data_dir, args.scale)
+        results = []
+        try:
+            for load_engine in args.engines:
+                cleanup()
+                results += run_engine(load_engine, data_dir, args.chunk_size)
+        finally:
+            cleanup()
+
+    for row in results:
+        print(json.dumps(row))
+    totals = {}
+    for row in results:
+        key = (row["engine"], row["phase"])
+        rows, seconds = totals.get(key, (0, 0.0))
+        totals[key] = (rows + row["rows"], seconds + row["seconds"])
+    for (load_engine, phase), (rows, seconds) in totals.items():
+        print(json.dumps({"engine": load_engine, "phase": phase, "table": "ALL", "rows": rows,
+                          "seconds": round(seconds, 3), "rows_per_s": round(rows / seconds)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Coût de lecture des dépôts mensuels : parse des CSV par pandas (+ conversions de
+ingest_flow.convert_seed_types) contre lecture de la landing zone Parquet
+(services/prefect/landing_zone.py) en mémoire mappée.
+
+Pour chaque table (seeds répliqués --scale fois) :
+- csv_pandas_s : pd.read_csv + conversions (chemin actuel de upsert_csv) ;
+- csv_copy_buffer_s : idem + sérialisation CSV pour COPY ;
+- landing_convert_s : conversion CSV -> Parquet typé (payée une fois par mois) ;
+- parquet_arrow_s : lecture Arrow en mémoire mappée ;
+- parquet_pandas_s : lecture Arrow + to_pandas (analyse ad hoc) ;
+- parquet_copy_buffer_s : record batches -> buffers CSV pour COPY (chemin INGEST_SOURCE=parquet).
+Chaque mesure est la médiane de --repeat exécutions.
+
+Usage (environnement de services/prefect/requirements.txt) :
+    python benchmarks/landing_parse.py --seed-dir data/seeds/month_000 --scale 20
+"""
+import argparse
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "services" / "prefect"))
+
+from ingest_flow import read_seed_csv  # noqa: E402
+from ingest_load import TABLES, scale_seeds  # noqa: E402
+from landing_zone import iter_csv_batches, land_csv, read_landing  # noqa: E402
+
+MONTH = "2024-01"
+
+
+def timed(fn, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+    return round(statistics.median(durations), 4)
+
+
+def csv_copy_buffer(csv_path: Path):
+    df = read_seed_csv(str(csv_path))
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+
+
+def parquet_copy_buffer(parquet_path: str):
+    for _ in iter_csv_batches(parquet_path):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-dir", default="data/seeds/month_000")
+    parser.add_argument("--scale", type=int, default=20, help="nombre de copies des seeds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir, landing_dir = Path(tmp) / "csv", Path(tmp) / "landing"
+        data_dir.mkdir()
+        scale_seeds(Path(args.seed_dir), data_dir, args.scale)
+
+        totals = {}
+        for table in TABLES:
+            csv_path = data_dir / f"{table}.csv"
+            row = {"table": table, "rows": len(pd.read_csv(csv_path, usecols=[0]))}
+            row["csv_pandas_s"] = timed(lambda: read_seed_csv(str(csv_path)), args.repeat)
+            row["csv_copy_buffer_s"] = timed(lambda: csv_copy_buffer(csv_path), args.repeat)
+            row["landing_convert_s"] = timed(
+                lambda: land_csv(str(csv_path), str(landing_dir), table, MONTH, overwrite=True), args.repeat
+            )
+            parquet_path = land_csv(str(csv_path), str(landing_dir), table, MONTH)
+            row["parquet_arrow_s"] = timed(lambda: read_landing(str(landing_dir), table, MONTH), args.repeat)
+            row["parquet_pandas_s"] = timed(
+                lambda: read_landing(str(landing_dir), table, MONTH).to_pandas(), args.repeat
+            )
+            row["parquet_copy_buffer_s"] = timed(lambda: parquet_copy_buffer(parquet_path), args.repeat)
+            row["csv_mb"] = round(csv_path.stat().st_size / 2**20, 2)
+            row["parquet_mb"] = round(Path(parquet_path).stat().st_size / 2**20, 2)
+            print(json.dumps(row))
+            for key, value in row.items():
+                if key != "table":
+                    totals[key] = round(totals.get(key, 0) + value, 4)
+
+    totals["parse_speedup_pandas"] = round(totals["csv_pandas_s"] / totals["parquet_pandas_s"], 1)
+    totals["parse_speedup_copy"] = round(totals["csv_copy_buffer_s"] / totals["parquet_copy_buffer_s"], 1)
+    print(json.dumps({"table": "ALL", **totals}))
+
+
+if __name__ == "__main__":
+    main()
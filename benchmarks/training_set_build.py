@@ -0,0 +1,77 @@
+"""
+Temps de construction du jeu d'entraînement (train_and_compare_flow.build_training_df)
+selon la source des features :
+- views : 4 feature views, 4 jointures point-in-time (chemin historique) ;
+- wide  : feature service churn_training_wide sur le snapshot large
+          user_features_wide_snapshots, une seule jointure.
+
+Vérifie aussi que les deux chemins renvoient les mêmes lignes (à l'ordre près).
+Chaque mesure est la médiane de --repeat constructions.
+
+Prérequis : snapshots stampés par ingest_month_flow (WIDE_SNAPSHOT=1) et `feast apply`
+exécuté dans le repo Feast (feature_services.py enregistré dans registry.db).
+
+Usage (environnement de services/prefect/requirements.txt) :
+    python benchmarks/training_set_build.py --as-of 2024-01-31 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "services" / "prefect"))
+
+import train_and_compare_flow as tcf  # noqa: E402
+
+
+def build(source: str, as_of: str) -> tuple[float, pd.DataFrame]:
+    tcf.TRAINING_FEATURE_SOURCE = source
+    t0 = time.perf_counter()
+    df = tcf.build_training_df(as_of)
+    return time.perf_counter() - t0, df
+
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values("user_id").reset_index(drop=True)[sorted(df.columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--as-of", default="2024-01-31")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sources", nargs="+", default=["views", "wide"])
+    args = parser.parse_args()
+
+    frames, summary = {}, {}
+    for source in args.sources:
+        # Première construction hors mesure (registry, connexions)
+        _, frames[source] = build(source, args.as_of)
+        durations = [build(source, args.as_of)[0] for _ in range(args.repeat)]
+        summary[source] = {
+            "source": source,
+            "rows": len(frames[source]),
+            "median_s": round(statistics.median(durations), 3),
+            "min_s": round(min(durations), 3),
+        }
+        print(json.dumps(summary[source]))
+
+    if {"views", "wide"} <= set(frames):
+        try:
+            pd.testing.assert_frame_equal(
+                canonical(frames["views"]), canonical(frames["wide"]), check_dtype=False, check_exact=False
+            )
+            same = True
+        except AssertionError:
+            same = False
+        print(json.dumps({
+            "speedup": round(summary["views"]["median_s"] / summary["wide"]["median_s"], 2),
+            "same_rows": same,
+        }))
+
+
+if __name__ == "__main__":
+    main()
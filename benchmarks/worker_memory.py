@@ -0,0 +1,128 @@
+"""
+Mémoire par worker de l'API selon le nombre de workers gunicorn, avec et sans
+partage du modèle (PRELOAD_MODEL=1 + preload_app, cf. api/gunicorn.conf.py).
+
+Pour chaque (mode, nombre de workers) : démarrage de gunicorn, attente de /ready,
+quelques requêtes /predict pour toucher le modèle, puis lecture de
+/proc/<pid>/smaps_rollup (Linux) de chaque worker :
+- RSS : pages résidentes, les pages partagées comptées dans chaque worker ;
+- PSS : pages partagées divisées entre les process qui les mappent (coût réel).
+
+Usage (environnement de api/requirements.txt, MLflow et Feast joignables) :
+    python benchmarks/worker_memory.py --workers 1 2 4 8 --user-id 7590-VHVEG
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parents[1] / "api"
+
+
+def read_smaps_rollup(pid: int) -> dict:
+    """{"rss_mb", "pss_mb", "shared_mb"} d'un process (valeurs de smaps_rollup, en Mo)."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    shared = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "shared_mb": round(shared / 1024, 1),
+    }
+
+
+def child_pids(pid: int) -> list[int]:
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            children.extend(int(c) for c in f.read().split())
+    return children
+
+
+def http(method: str, url: str, payload: dict | None = None) -> int:
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def wait_ready(base_url: str, workers: int, timeout: float) -> None:
+    """/ready tombe sur un worker au hasard : on exige une série de 200 consécutifs."""
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"API not ready after {timeout}s")
+        streak = streak + 1 if http("GET", f"{base_url}/ready") == 200 else 0
+        if streak == 0:
+            time.sleep(0.5)
+
+
+def measure(workers: int, preload: bool, args) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}",
+               PRELOAD_MODEL="1" if preload else "0")
+    # Sans PRELOAD_MODEL, le modèle est chargé par le pipeline de démarrage de chaque worker
+    cmd = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    proc = subprocess.Popen(cmd, cwd=API_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        t0 = time.perf_counter()
+        wait_ready(base_url, workers, args.timeout)
+        ready_s = time.perf_counter() - t0
+        for _ in range(args.requests):
+            http("POST", f"{base_url}/predict", {"user_id": args.user_id})
+        time.sleep(1.0)
+
+        per_worker = [read_smaps_rollup(pid) for pid in child_pids(proc.pid)]
+        master = read_smaps_rollup(proc.pid)
+        total_pss = master["pss_mb"] + sum(w["pss_mb"] for w in per_worker)
+        return {
+            "mode": "preload" if preload else "per_worker",
+            "workers": workers,
+            "ready_s": round(ready_s, 2),
+            "master": master,
+            "rss_per_worker_mb": round(sum(w["rss_mb"] for w in per_worker) / len(per_worker), 1),
+            "pss_per_worker_mb": round(sum(w["pss_mb"] for w in per_worker) / len(per_worker), 1),
+            "shared_per_worker_mb": round(sum(w["shared_mb"] for w in per_worker) / len(per_worker), 1),
+            "total_pss_mb": round(total_pss, 1),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", choices=["preload", "per_worker"], default=["per_worker", "preload"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--user-id", default="7590-VHVEG", help="user_id présent dans l'online store")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--output", help="fichier JSON de sortie (défaut : stdout)")
+    args = parser.parse_args()
+
+    results = [measure(n, mode == "preload", args) for mode in args.modes for n in args.workers]
+    out = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(out)
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
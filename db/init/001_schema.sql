@@ -52,4 +52,44 @@ CREATE TABLE IF NOT EXISTS labels (
   user_id TEXT REFERENCES users(user_id),
   churn_label BOOLEAN,
   PRIMARY KEY (user_id)
-);
\ No newline at end of file
+);
+
+-- Scores de churn calculés hors ligne par services/prefect/score_flow.py
+CREATE TABLE IF NOT EXISTS churn_scores (
+  user_id TEXT,
+  as_of DATE,
+  model_version TEXT,
+  score DOUBLE PRECISION,
+  scored_at TIMESTAMPTZ DEFAULT now(),
+  PRIMARY KEY (user_id, as_of, model_version)
+);
+-- Chargement des scores d'une version par l'API (mode SCORE_LOOKUP)
+CREATE INDEX IF NOT EXISTS churn_scores_version_as_of_idx ON churn_scores (model_version, as_of);
+
+-- Journal des prédictions servies par l'API (PREDICTION_LOG=1), écrit par lots via COPY
+CREATE TABLE IF NOT EXISTS prediction_log (
+  logged_at TIMESTAMPTZ,
+  endpoint TEXT,
+  user_id TEXT,
+  features JSONB,
+  prediction INT,
+  churn_proba DOUBLE PRECISION,
+  model_version TEXT,
+  latency_ms DOUBLE PRECISION
+);
+CREATE INDEX IF NOT EXISTS prediction_log_logged_at_idx ON prediction_log (logged_at);
+
+-- État de l'ingestion delta (INGEST_MODE=delta, services/prefect/ingest_flow.py) :
+-- hash de chaque ligne chargée et sha256 du dernier CSV ingéré par table
+CREATE TABLE IF NOT EXISTS ingest_row_hashes (
+  table_name TEXT,
+  pk TEXT,
+  row_hash TEXT,
+  PRIMARY KEY (table_name, pk)
+);
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+  table_name TEXT PRIMARY KEY,
+  file_sha256 TEXT,
+  n_rows BIGINT,
+  ingested_at TIMESTAMPTZ DEFAULT now()
+);
@@ -0,0 +1,69 @@
+from feast import Field, FeatureService, FeatureView
+from feast.infra.offline_stores.contrib.postgres_offline_store.postgres_source import PostgreSQLSource
+from feast.types import Float32, Int64, Bool, String
+from entities import user
+
+# Source large : vue matérialisée user_features_wide_snapshots (les 4 tables de snapshots
+# jointes au grain (user_id, as_of)), créée et rafraîchie par snapshot_month (ingest_flow).
+# Une seule jointure point-in-time au lieu de quatre pour get_historical_features.
+# Après ajout/modification de ce fichier : `feast apply` pour mettre à jour registry.db.
+user_features_wide_source = PostgreSQLSource(
+    name="user_features_wide_source",
+    query="""
+        SELECT
+            user_id,
+            as_of,
+            months_active,
+            monthly_fee,
+            paperless_billing,
+            plan_stream_tv,
+            plan_stream_movies,
+            net_service,
+            watch_hours_30d,
+            avg_session_mins_7d,
+            unique_devices_30d,
+            skips_7d,
+            rebuffer_events_7d,
+            failed_payments_90d,
+            support_tickets_90d,
+            ticket_avg_resolution_hrs_90d
+        FROM user_features_wide_snapshots
+    """,
+    timestamp_field="as_of",
+)
+
+# Hors ligne uniquement : l'online store reste alimenté par les 4 feature views.
+# user_id déclaré dans le schéma : `feast apply` n'interroge pas la source pour en inférer
+# le type (la vue matérialisée n'existe pas avant la première ingestion, ni si WIDE_SNAPSHOT=0)
+user_features_wide_fv = FeatureView(
+    name="user_features_wide_fv",
+    entities=[user],
+    ttl=None,
+    schema=[
+        Field(name="user_id", dtype=String),
+        Field(name="months_active", dtype=Int64),
+        Field(name="monthly_fee", dtype=Float32),
+        Field(name="paperless_billing", dtype=Bool),
+        Field(name="plan_stream_tv", dtype=Bool),
+        Field(name="plan_stream_movies", dtype=Bool),
+        Field(name="net_service", dtype=String),
+        Field(name="watch_hours_30d", dtype=Float32),
+        Field(name="avg_session_mins_7d", dtype=Float32),
+        Field(name="unique_devices_30d", dtype=Int64),
+        Field(name="skips_7d", dtype=Int64),
+        Field(name="rebuffer_events_7d", dtype=Int64),
+        Field(name="failed_payments_90d", dtype=Int64),
+        Field(name="support_tickets_90d", dtype=Int64),
+        Field(name="ticket_avg_resolution_hrs_90d", dtype=Float32),
+    ],
+    source=user_features_wide_source,
+    online=False,
+    tags={"owner": "mlops-course"},
+)
+
+# Jeu de features d'entraînement du modèle de churn (mêmes 14 features que FEATURES)
+churn_training_wide = FeatureService(
+    name="churn_training_wide",
+    features=[user_features_wide_fv],
+    tags={"owner": "mlops-course"},
+)
@@ -1,19 +1,14 @@
 import os
 import pandas as pd
-from sqlalchemy import create_engine
+from db import get_engine as get_shared_engine, log_pool_stats
 from feast import FeatureStore
 
 AS_OF = "2024-01-31"
 FEAST_REPO = "/repo"
 
 def get_engine():
-    uri = (
-        f"postgresql+psycopg2://{os.getenv('POSTGRES_USER','streamflow')}:"
-        f"{os.getenv('POSTGRES_PASSWORD','streamflow')}@"
-        f"{os.getenv('POSTGRES_HOST','postgres')}:5432/"
-        f"{os.getenv('POSTGRES_DB','streamflow')}"
-    )
-    return create_engine(uri)
+    """Engine partagé (pool "build_training_dataset", cf. db.py)."""
+    return get_shared_engine("build_training_dataset")
 
 def build_entity_df(engine, as_of: str) -> pd.DataFrame:
     q = """
@@ -68,6 +63,7 @@ def main():
     os.makedirs("/data/processed", exist_ok=True)
     df.to_csv("/data/processed/training_df.csv", index=False)
     print(f"[OK] Wrote /data/processed/training_df.csv with {len(df)} rows")
+    log_pool_stats("build_training_dataset")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
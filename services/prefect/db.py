@@ -0,0 +1,184 @@
+"""
+Engine SQLAlchemy partagé par les flows Prefect : un pool de connexions par nom
+(un par flow), créé une seule fois par process et configuré par les mêmes
+variables d'environnement POSTGRES_*.
+
+Taille des pools : DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT (secondes),
+surchargeables par pool avec le suffixe du nom, ex. DB_POOL_SIZE_INGEST=6.
+Métriques : attente au checkout et connexions en cours d'utilisation par pool,
+via pool_stats() / log_pool_stats() et, si prometheus_client est installé, en
+métriques Prometheus servies sur DB_METRICS_PORT (http://<worker>:<port>/metrics,
+serveur démarré avec le premier pool du process ; non servies si la variable est absente).
+"""
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+try:
+    from prometheus_client import Gauge, Histogram, start_http_server
+except ImportError:  # dépendance optionnelle
+    Gauge = Histogram = start_http_server = None
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_POOL_TIMEOUT = 30.0
+
+if Histogram is not None:
+    POOL_CHECKOUT_WAIT = Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Attente pour obtenir une connexion du pool",
+        ["pool"],
+        buckets=[0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30],
+    )
+    POOL_IN_USE = Gauge("db_pool_in_use", "Connexions du pool en cours d'utilisation", ["pool"])
+    POOL_SIZE = Gauge("db_pool_size", "Taille du pool (hors overflow)", ["pool"])
+
+
+def database_url() -> str:
+    return (
+        f"postgresql+psycopg2://{os.getenv('POSTGRES_USER', 'streamflow')}:"
+        f"{os.getenv('POSTGRES_PASSWORD', 'streamflow')}@"
+        f"{os.getenv('POSTGRES_HOST', 'postgres')}:{os.getenv('POSTGRES_PORT', '5432')}/"
+        f"{os.getenv('POSTGRES_DB', 'streamflow')}"
+    )
+
+
+def pool_settings(pool_name: str, env=None, pool_size: int | None = None,
+                  max_overflow: int | None = None) -> dict:
+    """
+    Paramètres du pool pool_name. Priorité : DB_<PARAM>_<POOL_NAME>, puis les valeurs
+    passées par le flow, puis DB_<PARAM>, puis les valeurs par défaut.
+    """
+    env = os.environ if env is None else env
+    suffix = pool_name.upper()
+
+    def setting(param, flow_value, default, cast):
+        value = env.get(f"DB_{param}_{suffix}")
+        if value is not None:
+            return cast(value)
+        if flow_value is not None:
+            return flow_value
+        return cast(env.get(f"DB_{param}", default))
+
+    return {
+        "pool_size": setting("POOL_SIZE", pool_size, DEFAULT_POOL_SIZE, int),
+        "max_overflow": setting("MAX_OVERFLOW", max_overflow, DEFAULT_MAX_OVERFLOW, int),
+        "timeout": setting("POOL_TIMEOUT", None, DEFAULT_POOL_TIMEOUT, float),
+    }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente de chaque checkout (file pleine -> attente de _do_get)."""
+
+    def __init__(self, creator, pool_name: str = "default", **kw):
+        super().__init__(creator, **kw)
+        self.pool_name = pool_name
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        conn = super()._do_get()
+        waited = time.perf_counter() - t0
+        with self._stats_lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        if Histogram is not None:
+            POOL_CHECKOUT_WAIT.labels(self.pool_name).observe(waited)
+        return conn
+
+    def recreate(self):
+        # Conserve le nom du pool quand SQLAlchemy recrée le pool (ex. après dispose)
+        pool = super().recreate()
+        pool.pool_name = self.pool_name
+        return pool
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+_metrics_port = None
+
+
+def start_metrics_server(env=None) -> int | None:
+    """
+    Sert les métriques des pools (registre prometheus_client par défaut) sur DB_METRICS_PORT,
+    une seule fois par process. Retourne le port, ou None si non configuré ou sans prometheus_client.
+    """
+    global _metrics_port
+    env = os.environ if env is None else env
+    port = env.get("DB_METRICS_PORT")
+    if _metrics_port is None and port and start_http_server is not None:
+        try:
+            start_http_server(int(port))
+        except OSError as e:
+            # Port déjà pris (autre flow run en cours) : métriques non servies, le flow continue
+            print(f"[DB] Warning: pool metrics not served on :{port}: {e}")
+            return None
+        _metrics_port = int(port)
+        print(f"[DB] pool metrics served on :{_metrics_port}/metrics")
+    return _metrics_port
+
+
+def get_engine(pool_name: str = "default", pool_size: int | None = None, max_overflow: int | None = None,
+               url: str | None = None):
+    """
+    Engine partagé du pool pool_name (créé au premier appel, puis réutilisé).
+    pool_size/max_overflow : dimensionnement voulu par le flow, surchargeable par l'env.
+    """
+    with _engines_lock:
+        engine = _engines.get(pool_name)
+        if engine is None:
+            settings = pool_settings(pool_name, pool_size=pool_size, max_overflow=max_overflow)
+            engine = create_engine(
+                url or database_url(),
+                poolclass=TimedQueuePool,
+                pool_name=pool_name,
+                pool_size=settings["pool_size"],
+                max_overflow=settings["max_overflow"],
+                pool_timeout=settings["timeout"],
+                pool_pre_ping=True,
+            )
+            if Gauge is not None:
+                POOL_IN_USE.labels(pool_name).set_function(lambda: engine.pool.checkedout())
+                POOL_SIZE.labels(pool_name).set(settings["pool_size"])
+            _engines[pool_name] = engine
+            start_metrics_server()
+        return engine
+
+
+def pool_stats(pool_name: str = "default") -> dict:
+    """Connexions en cours d'utilisation et attente cumulée au checkout d'un pool."""
+    pool = _engines[pool_name].pool
+    return {
+        "pool": pool_name,
+        "size": pool.size(),
+        "in_use": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": pool.checkouts,
+        "wait_seconds_total": round(pool.wait_seconds_total, 4),
+        "wait_seconds_max": round(pool.wait_seconds_max, 4),
+    }
+
+
+def log_pool_stats(pool_name: str = "default"):
+    """Affiche l'usage du pool en fin de flow (rien si le flow n'a pas ouvert ce pool)."""
+    if pool_name not in _engines:
+        return
+    stats = pool_stats(pool_name)
+    print(f"[DB] pool {pool_name}: size={stats['size']} in_use={stats['in_use']} overflow={stats['overflow']} "
+          f"checkouts={stats['checkouts']} wait_total={stats['wait_seconds_total']}s "
+          f"wait_max={stats['wait_seconds_max']}s")
+
+
+def dispose_engines():
+    """Ferme tous les pools (fin de process, ou après un fork)."""
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
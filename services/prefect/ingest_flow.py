@@ -1,38 +1,136 @@
+import io
 import os
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
 import pandas as pd
-from sqlalchemy import create_engine, text
 from prefect import flow, task
-
-# Configuration de la base PostgreSQL (via .env)
-PG = {
-    "user": os.getenv("POSTGRES_USER", "streamflow"),
-    "pwd":  os.getenv("POSTGRES_PASSWORD", "streamflow"),
-    "db":   os.getenv("POSTGRES_DB", "streamflow"),
-    "host": os.getenv("POSTGRES_HOST", "postgres"),
-    "port": os.getenv("POSTGRES_PORT", "5432"),
-}
+from prefect.task_runners import ThreadPoolTaskRunner
+from feast import FeatureStore
+
+from db import get_engine, log_pool_stats
+from ingest_utils import (
+    CLEAR_INGEST_STATE_SQL,
+    FEATURE_VIEW_SNAPSHOTS,
+    INGEST_STATE_DDL,
+    TARGET_TYPES_SQL,
+    chunk_bounds,
+    chunk_staging_ddl,
+    copy_sql,
+    delta_merge_sql,
+    delta_staging_sql,
+    detach_partition_sql,
+    file_sha256,
+    materialization_sql,
+    merge_sql,
+    month_partition_bounds,
+    month_partition_ddl,
+    month_partition_name,
+    partitioned_table_ddl,
+    staging_ddl,
+    store_row_hashes_sql,
+)
+from landing_zone import iter_csv_batches, land_csv, landed_source_sha256, landing_columns, month_of
+from validation_utils import COLUMNS_SQL, aggregate_sql, evaluate, expectations_for, first_failure
+
+# Base PostgreSQL : engine partagé configuré par les variables POSTGRES_* (cf. db.py)
 
 # Valeurs par défaut pour ce TP (vous pouvez les surcharger avec des variables d'environnement)
 AS_OF = os.getenv("AS_OF", "2024-01-31")               # frontière du mois
 SEED_DIR = os.getenv("SEED_DIR", "/data/seeds/month_000")
+# Chargement de la table de staging : "copy" (COPY FROM STDIN) ou "to_sql" (ancien chemin, INSERTs pandas)
+INGEST_LOAD_ENGINE = os.getenv("INGEST_LOAD_ENGINE", "copy")
+# "full" : upsert de toutes les lignes (et remise à zéro de l'état delta de la table) ;
+# "delta" : seules les lignes nouvelles/modifiées (hash par ligne dans ingest_row_hashes),
+# CSV inchangé ignoré (sha256 dans ingest_manifest)
+INGEST_MODE = os.getenv("INGEST_MODE", "full")
+# Lecture des CSV par chunks de N lignes (mémoire bornée, un COPY par chunk) ; 0 = fichier entier
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "0"))
+# Source des chargements : "csv" (parse des CSV de seeds) ou "parquet" (landing zone :
+# chaque CSV converti une fois en Parquet typé sous LANDING_DIR/<table>/month=YYYY-MM/)
+INGEST_SOURCE = os.getenv("INGEST_SOURCE", "csv")
+LANDING_DIR = os.getenv("LANDING_DIR", "/data/landing")
+# Moteur de validation : "sql" (agrégats calculés dans Postgres, table entière)
+# ou "ge" (Great Expectations sur un échantillon de 50 000 lignes)
+VALIDATION_ENGINE = os.getenv("VALIDATION_ENGINE", "sql")
+# Matérialisation incrémentale des feature views dans l'online store Feast après les snapshots
+# (opt-in : nécessite le repo Feast et l'online store joignables depuis le worker)
+MATERIALIZE_ONLINE = os.getenv("MATERIALIZE_ONLINE", "0") == "1"
+MATERIALIZE_CHUNK_SIZE = int(os.getenv("MATERIALIZE_CHUNK_SIZE", "10000"))
+FEAST_REPO = os.getenv("FEAST_REPO", "/repo")
+# Tâches d'ingestion exécutées en parallèle (chargements et validations)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "6"))
+
+# users est chargée en premier : les autres tables la référencent (REFERENCES users(user_id))
+PARENT_TABLE = "users"
+DEPENDENT_TABLES = ["subscriptions", "usage_agg_30d", "payments_agg_90d", "support_agg_90d", "labels"]
+# Tables validées par GE dès la fin de leur chargement
+VALIDATED_TABLES = {"users", "subscriptions", "usage_agg_30d"}
+
+# Tables de snapshots (partitionnées par mois sur as_of) : colonnes et types
+SNAPSHOT_TABLES = {
+    "subscriptions_profile_snapshots": [
+        ("user_id", "TEXT"),
+        ("as_of", "DATE"),
+        ("months_active", "INT"),
+        ("monthly_fee", "NUMERIC"),
+        ("paperless_billing", "BOOLEAN"),
+        ("plan_stream_tv", "BOOLEAN"),
+        ("plan_stream_movies", "BOOLEAN"),
+        ("net_service", "TEXT"),
+    ],
+    "usage_agg_30d_snapshots": [
+        ("user_id", "TEXT"),
+        ("as_of", "DATE"),
+        ("watch_hours_30d", "NUMERIC"),
+        ("avg_session_mins_7d", "NUMERIC"),
+        ("unique_devices_30d", "INT"),
+        ("skips_7d", "INT"),
+        ("rebuffer_events_7d", "INT"),
+    ],
+    "payments_agg_90d_snapshots": [
+        ("user_id", "TEXT"),
+        ("as_of", "DATE"),
+        ("failed_payments_90d", "INT"),
+    ],
+    "support_agg_90d_snapshots": [
+        ("user_id", "TEXT"),
+        ("as_of", "DATE"),
+        ("support_tickets_90d", "INT"),
+        ("ticket_avg_resolution_hrs_90d", "NUMERIC"),
+    ],
+}
 
+# Snapshot large : les 4 tables de snapshots jointes au grain (user_id, as_of), source
+# d'une seule feature view Feast (user_features_wide_fv, cf. feast_repo/repo/feature_services.py).
+# Rafraîchi par snapshot_month ; base = subscriptions_profile_snapshots (table de l'entity_df).
+WIDE_SNAPSHOT = os.getenv("WIDE_SNAPSHOT", "1") == "1"
+WIDE_SNAPSHOT_VIEW = "user_features_wide_snapshots"
+WIDE_SNAPSHOT_DDL = f"""
+CREATE MATERIALIZED VIEW IF NOT EXISTS {WIDE_SNAPSHOT_VIEW} AS
+SELECT s.user_id, s.as_of,
+       s.months_active, s.monthly_fee, s.paperless_billing,
+       s.plan_stream_tv, s.plan_stream_movies, s.net_service,
+       u.watch_hours_30d, u.avg_session_mins_7d, u.unique_devices_30d,
+       u.skips_7d, u.rebuffer_events_7d,
+       p.failed_payments_90d,
+       t.support_tickets_90d, t.ticket_avg_resolution_hrs_90d
+FROM subscriptions_profile_snapshots s
+LEFT JOIN usage_agg_30d_snapshots u USING (user_id, as_of)
+LEFT JOIN payments_agg_90d_snapshots p USING (user_id, as_of)
+LEFT JOIN support_agg_90d_snapshots t USING (user_id, as_of);
+-- Index unique requis par REFRESH ... CONCURRENTLY (lectures non bloquées pendant le refresh)
+CREATE UNIQUE INDEX IF NOT EXISTS {WIDE_SNAPSHOT_VIEW}_pk ON {WIDE_SNAPSHOT_VIEW} (user_id, as_of);
+CREATE INDEX IF NOT EXISTS {WIDE_SNAPSHOT_VIEW}_as_of_idx ON {WIDE_SNAPSHOT_VIEW} (as_of);
+"""
 
-def engine():
-    """Crée un engine SQLAlchemy pour PostgreSQL."""
-    uri = f"postgresql+psycopg2://{PG['user']}:{PG['pwd']}@{PG['host']}:{PG['port']}/{PG['db']}"
-    return create_engine(uri)
 
+def engine():
+    """Engine SQLAlchemy partagé du flow d'ingestion (pool "ingest", une connexion par tâche parallèle)."""
+    return get_engine("ingest", pool_size=INGEST_WORKERS)
 
-@task
-def upsert_csv(table: str, csv_path: str, pk_cols: list[str]):
-    """
-    Charge un CSV dans une table Postgres en utilisant une stratégie d'upsert.
-    1) Création d'une table temporaire
-    2) Insert dans la table temporaire
-    3) INSERT ... SELECT ... FROM temp ON CONFLICT (...) DO UPDATE ...
-    """
-    df = pd.read_csv(csv_path)
 
+def convert_seed_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Conversions de types des CSV de seeds (dates, booléens), sur un fichier ou un chunk."""
     # Conversion de certains types si nécessaire (ex: dates, booléens)
     if "signup_date" in df.columns:
         df["signup_date"] = pd.to_datetime(df["signup_date"], errors="coerce")
@@ -47,35 +145,199 @@ def upsert_csv(table: str, csv_path: str, pk_cols: list[str]):
     for col in bool_cols:
         if col in df.columns:
             df[col] = df[col].astype("boolean")
+    return df
 
-    eng = engine()
-    with eng.begin() as conn:
-        tmp = f"tmp_{table}"
 
-        # On recrée une table temporaire avec le même schéma que le DataFrame
-        conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
-        df.head(0).to_sql(tmp, conn, if_exists="replace", index=False)
-        df.to_sql(tmp, conn, if_exists="append", index=False)
+def read_seed_csv(csv_path: str) -> pd.DataFrame:
+    """Lit un CSV de seeds et applique les conversions de types (dates, booléens)."""
+    return convert_seed_types(pd.read_csv(csv_path))
 
-        cols = list(df.columns)
-        collist = ", ".join(cols)
-        pk = ", ".join(pk_cols)
 
-        # TODO: construire la partie "SET col = EXCLUDED.col" pour toutes les colonnes non PK
-        # Exemple : "col1 = EXCLUDED.col1, col2 = EXCLUDED.col2, ..."
-        updates = ", ".join(
-            [f"{col} = EXCLUDED.{col}" for col in cols if col not in pk_cols]
-        )
+def load_staging_to_sql(conn, tmp: str, df: pd.DataFrame):
+    """Ancien chemin : table temporaire créée et remplie par pandas (INSERTs ligne à ligne)."""
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    df.head(0).to_sql(tmp, conn, if_exists="replace", index=False)
+    df.to_sql(tmp, conn, if_exists="append", index=False)
+
 
-        sql = text(f"""
-            INSERT INTO {table} ({collist})
-            SELECT {collist} FROM {tmp}
-            ON CONFLICT ({pk}) DO UPDATE SET {updates}
-        """)
-        conn.execute(sql)
+def load_staging_copy(conn, tmp: str, df: pd.DataFrame):
+    """
+    Table TEMP typée comme le ferait to_sql, remplie en un seul COPY FROM STDIN (format CSV).
+    Les conversions pandas restent faites en amont : NaN/NA/NaT deviennent des champs vides = NULL.
+    """
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    conn.exec_driver_sql(staging_ddl(tmp, dict(df.dtypes)))
+    buf = io.StringIO()
+    df.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    # Curseur psycopg2 de la connexion SQLAlchemy : même transaction que le merge
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(copy_sql(tmp, list(df.columns)), buf)
+
+
+def load_staging_chunks(conn, table: str, tmp: str, csv_path: str,
+                        chunksize: int) -> tuple[list[str], int, int]:
+    """
+    Lecture du CSV par chunks de chunksize lignes, conversions par chunk et un COPY par chunk :
+    seul un chunk est en mémoire. La staging est typée d'après la table cible (les dtypes
+    pandas peuvent varier d'un chunk à l'autre). Retourne (colonnes, nombre de lignes,
+    plus gros chunk en mémoire en octets : DataFrame + buffer CSV du COPY).
+    """
+    col_types = dict(conn.exec_driver_sql(TARGET_TYPES_SQL, {"table": table}).fetchall())
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    cols, n_rows, max_chunk_bytes = None, 0, 0
+    with conn.connection.cursor() as cur:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = convert_seed_types(chunk)
+            if cols is None:
+                cols = list(chunk.columns)
+                conn.exec_driver_sql(chunk_staging_ddl(tmp, cols, col_types))
+            buf = io.StringIO()
+            chunk.to_csv(buf, index=False, header=False)
+            # Borne propre à la tâche (tracemalloc, global au process, compterait les autres tâches)
+            max_chunk_bytes = max(max_chunk_bytes, int(chunk.memory_usage(deep=True).sum()) + buf.tell())
+            buf.seek(0)
+            cur.copy_expert(copy_sql(tmp, cols), buf)
+            n_rows += len(chunk)
+    if cols is None:
+        # CSV sans ligne de données : staging vide avec les colonnes de l'en-tête
+        cols = list(pd.read_csv(csv_path, nrows=0).columns)
+        conn.exec_driver_sql(chunk_staging_ddl(tmp, cols, col_types))
+    return cols, n_rows, max_chunk_bytes
+
+
+def load_staging_parquet(conn, table: str, tmp: str, parquet_path: str) -> tuple[list[str], int]:
+    """
+    Staging remplie depuis la landing zone : record batches lus en mémoire mappée,
+    un COPY par batch, sans parse ni conversion pandas. Retourne (colonnes, nombre de lignes).
+    """
+    col_types = dict(conn.exec_driver_sql(TARGET_TYPES_SQL, {"table": table}).fetchall())
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
+    cols, n_rows = None, 0
+    with conn.connection.cursor() as cur:
+        for batch_cols, buf, batch_rows in iter_csv_batches(parquet_path):
+            if cols is None:
+                cols = batch_cols
+                conn.exec_driver_sql(chunk_staging_ddl(tmp, cols, col_types))
+            cur.copy_expert(copy_sql(tmp, cols), buf)
+            n_rows += batch_rows
+    if cols is None:
+        # CSV sans ligne de données (Parquet sans batch) : staging vide avec les colonnes du schéma
+        cols = landing_columns(parquet_path)
+        conn.exec_driver_sql(chunk_staging_ddl(tmp, cols, col_types))
+    return cols, n_rows
+
+
+@task
+def land_seed_csv(table: str, csv_path: str, as_of: str) -> str:
+    """Convertit le CSV du mois en Parquet typé dans la landing zone (à nouveau s'il a changé)."""
+    t0 = time.perf_counter()
+    path = land_csv(csv_path, LANDING_DIR, table, month_of(as_of))
+    print(f"[LANDING] {table}: {path} ready in {time.perf_counter() - t0:.2f}s")
+    return path
+
+
+def merge_delta(conn, table: str, tmp: str, cols: list[str], pk_cols: list[str]) -> dict:
+    """Merge des lignes dont le hash a changé depuis la dernière ingestion ; retourne les compteurs."""
+    col_types = dict(conn.exec_driver_sql(TARGET_TYPES_SQL, {"table": table}).fetchall())
+    delta = f"{tmp}_delta"
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {delta}")
+    conn.exec_driver_sql(delta_staging_sql(table, tmp, delta, cols, pk_cols, col_types))
+    inserted, updated = conn.exec_driver_sql(delta_merge_sql(table, delta, cols, pk_cols)).one()
+    conn.exec_driver_sql(store_row_hashes_sql(table, delta))
+    total = conn.exec_driver_sql(f"SELECT count(*) FROM {delta}").scalar_one()
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {delta}")
+    return {"inserted": inserted, "updated": updated, "unchanged": total - inserted - updated}
+
+
+def ensure_ingest_state():
+    """
+    Tables d'état de l'ingestion delta, pour une base créée avant 001_schema.sql : DDL exécuté
+    une seule fois avant le DAG (des CREATE TABLE IF NOT EXISTS concurrents peuvent échouer
+    sur pg_type).
+    """
+    with engine().begin() as conn:
+        conn.exec_driver_sql(INGEST_STATE_DDL)
+
+
+@task
+def upsert_csv(table: str, csv_path: str, pk_cols: list[str], parquet_path: str | None = None):
+    """
+    Charge un CSV dans une table Postgres en utilisant une stratégie d'upsert.
+    1) Création d'une table temporaire
+    2) Chargement de la table temporaire (COPY, ou INSERTs to_sql si INGEST_LOAD_ENGINE=to_sql ;
+       depuis le Parquet de la landing zone si parquet_path est fourni)
+    3) INSERT ... SELECT ... FROM temp ON CONFLICT (...) DO UPDATE ...
+       (INGEST_MODE=delta : uniquement les lignes nouvelles ou modifiées)
+    """
+    t0 = time.perf_counter()
+    delta_mode = INGEST_MODE == "delta"
+
+    eng = engine()
+    if delta_mode:
+        # Empreinte des données effectivement chargées : celle du CSV converti pour un Parquet
+        file_hash = landed_source_sha256(parquet_path) if parquet_path is not None else file_sha256(csv_path)
+        with eng.begin() as conn:
+            last_hash = conn.exec_driver_sql(
+                "SELECT file_sha256 FROM ingest_manifest WHERE table_name = %(table)s", {"table": table}
+            ).scalar_one_or_none()
+        if last_hash == file_hash:
+            print(f"[INGEST] {table}: {csv_path} unchanged since last ingestion (sha256 {file_hash[:12]}), skipped")
+            return f"skipped {table} (unchanged file)"
+
+    chunked = parquet_path is None and INGEST_CHUNK_SIZE > 0
+    max_chunk_bytes = None
+    with eng.begin() as conn:
+        tmp = f"tmp_{table}"
+
+        if parquet_path is not None:
+            cols, n_rows = load_staging_parquet(conn, table, tmp, parquet_path)
+        elif chunked:
+            cols, n_rows, max_chunk_bytes = load_staging_chunks(conn, table, tmp, csv_path, INGEST_CHUNK_SIZE)
+        else:
+            df = read_seed_csv(csv_path)
+            cols, n_rows = list(df.columns), len(df)
+            if INGEST_LOAD_ENGINE == "to_sql":
+                load_staging_to_sql(conn, tmp, df)
+            else:
+                load_staging_copy(conn, tmp, df)
+            del df
+
+        if delta_mode:
+            counts = merge_delta(conn, table, tmp, cols, pk_cols)
+            conn.exec_driver_sql(
+                """
+                INSERT INTO ingest_manifest (table_name, file_sha256, n_rows, ingested_at)
+                VALUES (%(table)s, %(sha)s, %(n)s, now())
+                ON CONFLICT (table_name) DO UPDATE
+                SET file_sha256 = EXCLUDED.file_sha256, n_rows = EXCLUDED.n_rows, ingested_at = now()
+                """,
+                {"table": table, "sha": file_hash, "n": n_rows},
+            )
+        else:
+            # Merge ensembliste : "SET col = EXCLUDED.col" pour toutes les colonnes non PK
+            conn.exec_driver_sql(merge_sql(table, tmp, cols, pk_cols))
+            conn.exec_driver_sql(CLEAR_INGEST_STATE_SQL, {"table": table})
+            counts = None
         conn.exec_driver_sql(f"DROP TABLE IF EXISTS {tmp}")
 
-    return f"upserted {len(df)} rows into {table}"
+    elapsed = time.perf_counter() - t0
+    rate = n_rows / elapsed if elapsed > 0 else float("inf")
+    if parquet_path is not None:
+        load_engine = "copy from parquet"
+    elif chunked:
+        load_engine = f"copy, chunks of {INGEST_CHUNK_SIZE}"
+    else:
+        load_engine = INGEST_LOAD_ENGINE
+    peak = (f", max chunk in memory {max_chunk_bytes / 2**20:.1f} MB (dataframe + CSV buffer)"
+            if max_chunk_bytes is not None else "")
+    print(f"[INGEST] {table}: {n_rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s, engine={load_engine}{peak})")
+    if counts is not None:
+        print(f"[INGEST] {table}: inserted={counts['inserted']} updated={counts['updated']} "
+              f"unchanged={counts['unchanged']}")
+        return (f"upserted {counts['inserted'] + counts['updated']} rows into {table} "
+                f"(inserted={counts['inserted']}, updated={counts['updated']}, unchanged={counts['unchanged']})")
+    return f"upserted {n_rows} rows into {table} ({rate:.0f} rows/s)"
 
 @task
 def validate_with_ge(table: str):
@@ -93,44 +355,9 @@ def validate_with_ge(table: str):
 
     gdf = ge.from_pandas(df)
 
-    # ---- Expectations spécifiques à chaque table ----
-    if table == "users":
-        gdf.expect_table_columns_to_match_set([
-            "user_id","signup_date","user_gender","user_is_senior","has_family","has_dependents"
-        ])
-        gdf.expect_column_values_to_not_be_null("user_id")
-
-    elif table == "subscriptions":
-        gdf.expect_table_columns_to_match_set([
-            "user_id", "months_active", "plan_stream_tv", "plan_stream_movies",
-            "contract_type", "paperless_billing", "monthly_fee", "total_paid",
-            "net_service", "add_on_security", "add_on_backup",
-            "add_on_device_protect", "add_on_support"
-        ])
-        gdf.expect_column_values_to_not_be_null("user_id")
-        gdf.expect_column_values_to_be_between("months_active", min_value=0)
-        gdf.expect_column_values_to_be_between("monthly_fee", min_value=0)
-
-    elif table == "usage_agg_30d":
-        # À compléter : expectations pour usage_agg_30d
-        # TODO: vérifier que les colonnes correspondent exactement à l'ensemble attendu
-        # TODO: ajouter quelques bornes raisonnables (par ex. >= 0) sur 1–2 colonnes numériques
-        gdf.expect_table_columns_to_match_set([
-            "user_id",
-            "watch_hours_30d",
-            "avg_session_mins_7d",
-            "unique_devices_30d",
-            "skips_7d",
-            "rebuffer_events_7d",
-        ])
-
-        gdf.expect_column_values_to_not_be_null("user_id")
-        gdf.expect_column_values_to_be_between("watch_hours_30d", min_value=0)
-        gdf.expect_column_values_to_be_between("avg_session_mins_7d", min_value=0)
-
-    else:
-        # Table non reconnue : check minimal
-        gdf.expect_column_values_to_not_be_null("user_id")
+    # ---- Expectations spécifiques à chaque table (cf. validation_utils.EXPECTATIONS) ----
+    for exp_type, kwargs in expectations_for(table):
+        getattr(gdf, exp_type)(**kwargs)
 
     result = gdf.validate()
 
@@ -145,53 +372,77 @@ def validate_with_ge(table: str):
 
     return f"GE passed for {table}"
 
+def validate_with_sql(table: str):
+    """
+    Mêmes expectations que validate_with_ge, évaluées dans Postgres sur toute la table :
+    jeu de colonnes via information_schema, expectations ligne à ligne en une requête
+    d'agrégats (un seul scan). Même rapport d'échec que validate_with_ge.
+    """
+    expectations = expectations_for(table)
+    sql = aggregate_sql(table, expectations)
+    with engine().begin() as conn:
+        columns = [row[0] for row in conn.exec_driver_sql(COLUMNS_SQL, {"table": table})]
+        counts = list(conn.exec_driver_sql(sql).one()) if sql else [0]
+    n_rows, unexpected = counts[0], counts[1:]
+
+    results = evaluate(expectations, columns, unexpected)
+    for result in results:
+        if not result["success"]:
+            print(f"[VALIDATION] {table}: {result['expectation_type']} failed "
+                  f"(unexpected={result['unexpected_count']} / {n_rows} rows)")
+    exp_type = first_failure(results)
+    if exp_type is not None:
+        raise AssertionError(f"GE validation failed for {table}: {exp_type}")
+
+    return f"GE passed for {table} ({n_rows} rows checked in SQL)"
+
+
+@task
+def validate_table(table: str):
+    """Valide une table avec le moteur VALIDATION_ENGINE (sql par défaut, ou ge)."""
+    if VALIDATION_ENGINE == "ge":
+        return validate_with_ge.fn(table)
+    return validate_with_sql(table)
+
+
+def ensure_partitioned_snapshot_table(conn, table: str, columns: list[tuple[str, str]]):
+    """
+    Crée la table de snapshots partitionnée si besoin. Une table existante non
+    partitionnée (schéma d'origine) est migrée : renommée, ses données recopiées
+    dans les partitions mensuelles de la nouvelle table, puis supprimée.
+    """
+    relkind = conn.exec_driver_sql(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(%(table)s)", {"table": table}
+    ).scalar_one_or_none()
+    if relkind != "r":
+        conn.exec_driver_sql(partitioned_table_ddl(table, columns))
+        return
+
+    legacy = f"{table}_unpartitioned"
+    # La vue matérialisée large dépend des tables de snapshots : recréée ensuite par snapshot_month
+    conn.exec_driver_sql(f"DROP MATERIALIZED VIEW IF EXISTS {WIDE_SNAPSHOT_VIEW}")
+    conn.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {legacy}")
+    # Les noms d'index sont uniques par schéma : libère le nom de la PK pour la nouvelle table
+    conn.exec_driver_sql(f"ALTER INDEX IF EXISTS {table}_pkey RENAME TO {legacy}_pkey")
+    conn.exec_driver_sql(partitioned_table_ddl(table, columns))
+    months = conn.exec_driver_sql(f"SELECT DISTINCT date_trunc('month', as_of)::date FROM {legacy}").scalars().all()
+    for month in months:
+        conn.exec_driver_sql(month_partition_ddl(table, month.isoformat()))
+    collist = ", ".join(name for name, _ in columns)
+    conn.exec_driver_sql(f"INSERT INTO {table} ({collist}) SELECT {collist} FROM {legacy}")
+    conn.exec_driver_sql(f"DROP TABLE {legacy}")
+    print(f"[SNAPSHOT] {table}: migrated to monthly partitions on as_of")
+
+
 @task
 def snapshot_month(as_of: str):
     """
     Crée (si besoin) les tables de snapshots et insère les données
     pour la date as_of donnée. Utilise une stratégie idempotente
     (ON CONFLICT DO NOTHING).
+    Les tables sont partitionnées par mois sur as_of : la partition du mois est
+    créée si besoin, les anciennes tables non partitionnées sont migrées.
     """
-    ddl = """
-    CREATE TABLE IF NOT EXISTS subscriptions_profile_snapshots (
-      user_id TEXT,
-      as_of DATE,
-      months_active INT,
-      monthly_fee NUMERIC,
-      paperless_billing BOOLEAN,
-      plan_stream_tv BOOLEAN,
-      plan_stream_movies BOOLEAN,
-      net_service TEXT,
-      PRIMARY KEY (user_id, as_of)
-    );
-
-    CREATE TABLE IF NOT EXISTS usage_agg_30d_snapshots (
-      user_id TEXT,
-      as_of DATE,
-      watch_hours_30d NUMERIC,
-      avg_session_mins_7d NUMERIC,
-      unique_devices_30d INT,
-      skips_7d INT,
-      rebuffer_events_7d INT,
-      PRIMARY KEY (user_id, as_of)
-    );
-
-    CREATE TABLE IF NOT EXISTS payments_agg_90d_snapshots (
-      user_id TEXT,
-      as_of DATE,
-      failed_payments_90d INT,
-      PRIMARY KEY (user_id, as_of)
-    );
-
-    CREATE TABLE IF NOT EXISTS support_agg_90d_snapshots (
-      user_id TEXT,
-      as_of DATE,
-      support_tickets_90d INT,
-      ticket_avg_resolution_hrs_90d NUMERIC,
-      PRIMARY KEY (user_id, as_of)
-    );
-    """
-
     sqls = [
         f"""
         INSERT INTO subscriptions_profile_snapshots
@@ -229,32 +480,168 @@ def snapshot_month(as_of: str):
     ]
 
     with engine().begin() as conn:
-        # Création des tables de snapshots si nécessaire
-        conn.exec_driver_sql(ddl)
+        # Création des tables de snapshots et de la partition du mois si nécessaire
+        for table, columns in SNAPSHOT_TABLES.items():
+            ensure_partitioned_snapshot_table(conn, table, columns)
+            conn.exec_driver_sql(month_partition_ddl(table, as_of))
         # Insertion des données pour as_of
         for sql in sqls:
             conn.exec_driver_sql(sql)
 
+        # Snapshot large (créé et rempli au premier passage, rafraîchi ensuite)
+        if WIDE_SNAPSHOT:
+            created = conn.exec_driver_sql(
+                "SELECT to_regclass(%(view)s)", {"view": WIDE_SNAPSHOT_VIEW}
+            ).scalar_one() is None
+            conn.exec_driver_sql(WIDE_SNAPSHOT_DDL)
+            if not created:
+                conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {WIDE_SNAPSHOT_VIEW}")
+
     return f"snapshots stamped for {as_of}"
 
-@flow(name="ingest_month")
+@task
+def materialize_view(view_name: str, as_of: str) -> dict:
+    """
+    Matérialisation incrémentale d'une feature view : snapshots dont as_of est postérieur
+    à la dernière matérialisation (fv.most_recent_end_time) et au plus as_of, dernière
+    ligne par user_id, écrite dans l'online store par lots de MATERIALIZE_CHUNK_SIZE.
+    L'intervalle matérialisé est enregistré ensuite, en série (record_materializations).
+    """
+    t0 = time.perf_counter()
+    store = FeatureStore(repo_path=FEAST_REPO)
+    fv = store.get_feature_view(view_name)
+    start = fv.most_recent_end_time or datetime(1970, 1, 1, tzinfo=timezone.utc)
+    # Fin exclue : lendemain de as_of à minuit UTC
+    end = datetime.combine(date.fromisoformat(as_of) + timedelta(days=1), dt_time.min, tzinfo=timezone.utc)
+
+    features = {field.name: field.dtype.name for field in fv.features}
+    sql = materialization_sql(FEATURE_VIEW_SNAPSHOTS[view_name], features)
+    with engine().connect() as conn:
+        result = conn.exec_driver_sql(sql, {"start": start.date(), "end": end.date()})
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    df["as_of"] = pd.to_datetime(df["as_of"], utc=True)
+    read_s = time.perf_counter() - t0
+
+    for lo, hi in chunk_bounds(len(df), MATERIALIZE_CHUNK_SIZE):
+        store.write_to_online_store(view_name, df.iloc[lo:hi])
+
+    elapsed = time.perf_counter() - t0
+    stats = {
+        "view": view_name,
+        "start": start,
+        "end": end,
+        "rows": len(df),
+        "read_s": round(read_s, 3),
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(len(df) / elapsed) if elapsed > 0 else None,
+    }
+    print(f"[MATERIALIZE] {view_name}: {stats['rows']} rows [{start.date()}, {end.date()}[ "
+          f"in {stats['seconds']}s (read {stats['read_s']}s, {stats['rows_per_s']} rows/s)")
+    return stats
+
+
+@task
+def record_materializations(results: list[dict]) -> list[dict]:
+    """
+    Enregistre dans le registry l'intervalle matérialisé de chaque view (en série :
+    le registry fichier n'accepte pas d'écritures concurrentes).
+    """
+    store = FeatureStore(repo_path=FEAST_REPO)
+    for stats in results:
+        fv = store.get_feature_view(stats["view"])
+        store.registry.apply_materialization(fv, store.project, stats["start"], stats["end"])
+    total_rows = sum(stats["rows"] for stats in results)
+    print(f"[MATERIALIZE] {len(results)} views, {total_rows} rows written to the online store")
+    return results
+
+
+@task
+def detach_snapshot_month(as_of: str, drop: bool = False):
+    """
+    Détache des tables de snapshots la partition du mois de as_of (opération sur le
+    catalogue, sans réécriture) : la table détachée reste interrogeable/archivable,
+    ou est supprimée si drop=True. Le snapshot large est ensuite rafraîchi pour ne plus
+    servir les lignes du mois détaché.
+    """
+    with engine().begin() as conn:
+        detached = False
+        for table in SNAPSHOT_TABLES:
+            partition = month_partition_name(table, as_of)
+            attached = conn.exec_driver_sql(
+                "SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass(%(p)s) AND inhparent = to_regclass(%(t)s)",
+                {"p": partition, "t": table},
+            ).first()
+            if attached is None:
+                continue
+            conn.exec_driver_sql(detach_partition_sql(table, as_of))
+            if drop:
+                conn.exec_driver_sql(f"DROP TABLE {partition}")
+            detached = True
+
+        wide_exists = conn.exec_driver_sql(
+            "SELECT to_regclass(%(view)s)", {"view": WIDE_SNAPSHOT_VIEW}
+        ).scalar_one() is not None
+        if detached and wide_exists:
+            conn.exec_driver_sql(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {WIDE_SNAPSHOT_VIEW}")
+
+    month = month_partition_bounds(as_of)[0]
+    return f"snapshots for month {month} {'dropped' if drop else 'detached'}"
+
+@flow(name="ingest_month", task_runner=ThreadPoolTaskRunner(max_workers=INGEST_WORKERS))
 def ingest_month_flow(seed_dir: str = SEED_DIR, as_of: str = AS_OF):
+    """
+    DAG d'ingestion : users d'abord (FK), puis les 5 tables dépendantes en parallèle ;
+    chaque validation GE démarre dès la fin du chargement de sa table ; les snapshots
+    attendent la fin de tous les chargements et validations.
+    """
+    t0 = time.perf_counter()
+    ensure_ingest_state()
+
+    # Landing zone (INGEST_SOURCE=parquet) : conversions en parallèle, chaque chargement
+    # attend le Parquet de sa table (future passée en paramètre)
+    landings = {}
+    if INGEST_SOURCE == "parquet":
+        for table in [PARENT_TABLE] + DEPENDENT_TABLES:
+            landings[table] = land_seed_csv.submit(table, f"{seed_dir}/{table}.csv", as_of)
+
     # Upsert des tables de base
-    upsert_csv("users",            f"{seed_dir}/users.csv",            ["user_id"])
-    upsert_csv("subscriptions",    f"{seed_dir}/subscriptions.csv",    ["user_id"])
-    upsert_csv("usage_agg_30d",    f"{seed_dir}/usage_agg_30d.csv",    ["user_id"])
-    upsert_csv("payments_agg_90d", f"{seed_dir}/payments_agg_90d.csv", ["user_id"])
-    upsert_csv("support_agg_90d",  f"{seed_dir}/support_agg_90d.csv",  ["user_id"])
-    upsert_csv("labels",           f"{seed_dir}/labels.csv",           ["user_id"])
+    loads = {PARENT_TABLE: upsert_csv.submit(
+        PARENT_TABLE, f"{seed_dir}/{PARENT_TABLE}.csv", ["user_id"], parquet_path=landings.get(PARENT_TABLE)
+    )}
+    for table in DEPENDENT_TABLES:
+        loads[table] = upsert_csv.submit(
+            table, f"{seed_dir}/{table}.csv", ["user_id"], parquet_path=landings.get(table),
+            wait_for=[loads[PARENT_TABLE]],
+        )
 
     # Validation GE (garde-fou avant les snapshots)
-    validate_with_ge("users")
-    validate_with_ge("subscriptions")
-    validate_with_ge("usage_agg_30d")
+    validations = [
+        validate_table.submit(table, wait_for=[load])
+        for table, load in loads.items()
+        if table in VALIDATED_TABLES
+    ]
 
     # Snapshots temporels
-    snapshot_month(as_of)
-
+    upstream = list(landings.values()) + list(loads.values()) + validations
+    snapshot = snapshot_month.submit(as_of, wait_for=upstream)
+    snapshot.wait()
+
+    # Remonte l'erreur d'origine (chargement ou validation) plutôt que "upstream not completed"
+    for future in upstream:
+        future.result()
+    snapshot.result()
+
+    # Matérialisation online : écritures parallèles par view, puis registry en série
+    # (un échec n'invalide pas l'ingestion : snapshots déjà écrits, rattrapés au prochain run)
+    if MATERIALIZE_ONLINE:
+        writes = [materialize_view.submit(view_name, as_of) for view_name in FEATURE_VIEW_SNAPSHOTS]
+        try:
+            record_materializations.submit(writes).result()
+        except Exception as e:
+            print(f"[MATERIALIZE] Warning: online materialization failed for {as_of}: {e}")
+
+    print(f"[INGEST] month {as_of} done in {time.perf_counter() - t0:.2f}s")
+    log_pool_stats("ingest")
     return f"Ingestion + validation + snapshots terminés pour {as_of}"
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+import hashlib
+import tracemalloc
+from contextlib import contextmanager
+
+
+def staging_column_type(dtype) -> str:
+    """
+    Type Postgres d'une colonne de staging à partir du dtype pandas, comme to_sql
+    (float64 -> DOUBLE PRECISION, int64 -> BIGINT, ...). Le merge vers la table cible
+    applique ensuite les mêmes casts d'affectation que l'ancien chemin to_sql.
+    """
+    name = str(dtype)
+    if name.lower().startswith(("int", "uint")):
+        return "BIGINT"
+    if name.lower().startswith("float"):
+        return "DOUBLE PRECISION"
+    if name in ("bool", "boolean"):
+        return "BOOLEAN"
+    if name.startswith("datetime64"):
+        return "TIMESTAMPTZ" if "," in name else "TIMESTAMP"
+    return "TEXT"
+
+
+def staging_ddl(tmp: str, dtypes: dict) -> str:
+    """CREATE TEMP TABLE pour un chargement COPY (supprimée à la fin de la transaction)."""
+    cols = ", ".join(f"{col} {staging_column_type(dtype)}" for col, dtype in dtypes.items())
+    return f"CREATE TEMP TABLE {tmp} ({cols}) ON COMMIT DROP"
+
+
+def chunk_staging_type(target_type: str | None) -> str:
+    """
+    Type de staging pour un chargement par chunks : celui de la colonne cible, sauf les
+    colonnes numériques en DOUBLE PRECISION comme la staging COPY par défaut (pandas lit
+    ces colonnes en float64, et un chunk d'entiers avec des NaN aussi : "3.0"). Les valeurs
+    stockées, donc les hash du mode delta, ne dépendent pas du mode de chargement.
+    """
+    if target_type is None:
+        return "TEXT"
+    if target_type in ("smallint", "integer", "bigint", "real", "double precision") \
+            or target_type.startswith("numeric"):
+        return "DOUBLE PRECISION"
+    return target_type
+
+
+def chunk_staging_ddl(tmp: str, cols: list[str], col_types: dict[str, str]) -> str:
+    """CREATE TEMP TABLE typée d'après la table cible, stable d'un chunk à l'autre."""
+    defs = ", ".join(f"{col} {chunk_staging_type(col_types.get(col))}" for col in cols)
+    return f"CREATE TEMP TABLE {tmp} ({defs}) ON COMMIT DROP"
+
+
+def copy_sql(tmp: str, cols: list[str]) -> str:
+    return f"COPY {tmp} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)"
+
+
+def merge_sql(table: str, tmp: str, cols: list[str], pk_cols: list[str], where: str | None = None) -> str:
+    """INSERT ... SELECT ... [WHERE ...] ON CONFLICT (pk) DO UPDATE SET col = EXCLUDED.col (hors PK)."""
+    collist = ", ".join(cols)
+    pk = ", ".join(pk_cols)
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in cols if col not in pk_cols)
+    action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return (
+        f"INSERT INTO {table} ({collist}) "
+        f"SELECT {collist} FROM {tmp} "
+        + (f"WHERE {where} " if where else "")
+        + f"ON CONFLICT ({pk}) {action}"
+    )
+
+
+# --- Ingestion delta (INGEST_MODE=delta) ---
+
+INGEST_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS ingest_row_hashes (
+  table_name TEXT,
+  pk TEXT,
+  row_hash TEXT,
+  PRIMARY KEY (table_name, pk)
+);
+CREATE TABLE IF NOT EXISTS ingest_manifest (
+  table_name TEXT PRIMARY KEY,
+  file_sha256 TEXT,
+  n_rows BIGINT,
+  ingested_at TIMESTAMPTZ DEFAULT now()
+);
+"""
+
+# Chargement complet (INGEST_MODE=full) : l'état delta de la table ne reflète plus son contenu,
+# le prochain run delta repart de zéro (tout est comparé, rien n'est ignoré)
+CLEAR_INGEST_STATE_SQL = """
+DELETE FROM ingest_manifest WHERE table_name = %(table)s;
+DELETE FROM ingest_row_hashes WHERE table_name = %(table)s;
+"""
+
+# Types des colonnes d'une table cible, pour hasher les valeurs une fois castées
+# (indépendant des dtypes pandas de la staging, qui varient d'un mois à l'autre)
+TARGET_TYPES_SQL = """
+SELECT attname, format_type(atttypid, atttypmod)
+FROM pg_attribute
+WHERE attrelid = %(table)s::regclass AND attnum > 0 AND NOT attisdropped
+"""
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Empreinte sha256 d'un fichier, lue par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pk_text_sql(pk_cols: list[str], alias: str) -> str:
+    """Clé primaire en texte ("a|b" pour une clé composite), comme stockée dans ingest_row_hashes."""
+    if len(pk_cols) == 1:
+        return f"{alias}.{pk_cols[0]}::text"
+    return "concat_ws('|', " + ", ".join(f"{alias}.{col}::text" for col in pk_cols) + ")"
+
+
+def row_hash_sql(cols: list[str], col_types: dict[str, str], alias: str) -> str:
+    """md5 de la ligne, chaque valeur castée vers le type de la colonne cible."""
+    values = ", ".join(f"{alias}.{col}::{col_types.get(col, 'text')}" for col in cols)
+    return f"md5(ROW({values})::text)"
+
+
+def delta_staging_sql(table: str, tmp: str, delta: str, cols: list[str], pk_cols: list[str],
+                      col_types: dict[str, str]) -> str:
+    """
+    Table TEMP <delta> : lignes de la staging + leur clé texte, leur hash et le hash
+    de la dernière ingestion (NULL si la clé est nouvelle).
+    """
+    return (
+        f"CREATE TEMP TABLE {delta} ON COMMIT DROP AS "
+        f"SELECT s.*, {pk_text_sql(pk_cols, 's')} AS _pk, "
+        f"{row_hash_sql(cols, col_types, 's')} AS _row_hash, h.row_hash AS _old_hash "
+        f"FROM {tmp} s "
+        f"LEFT JOIN ingest_row_hashes h "
+        f"ON h.table_name = '{table}' AND h.pk = {pk_text_sql(pk_cols, 's')}"
+    )
+
+
+def delta_merge_sql(table: str, delta: str, cols: list[str], pk_cols: list[str]) -> str:
+    """
+    Merge des seules lignes nouvelles ou modifiées ; retourne (inserted, updated)
+    d'après xmax (0 pour une ligne insérée, non nul pour une ligne mise à jour).
+    """
+    merge = merge_sql(table, delta, cols, pk_cols, where="_old_hash IS DISTINCT FROM _row_hash")
+    return (
+        f"WITH merged AS ({merge} RETURNING (xmax = 0) AS inserted) "
+        f"SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged"
+    )
+
+
+def store_row_hashes_sql(table: str, delta: str) -> str:
+    return (
+        f"INSERT INTO ingest_row_hashes (table_name, pk, row_hash) "
+        f"SELECT '{table}', _pk, _row_hash FROM {delta} "
+        f"WHERE _old_hash IS DISTINCT FROM _row_hash "
+        f"ON CONFLICT (table_name, pk) DO UPDATE SET row_hash = EXCLUDED.row_hash"
+    )
+
+
+# --- Mémoire des chargements (benchmarks) ---
+
+@contextmanager
+def traced_peak_memory():
+    """
+    Mesure le pic d'allocations Python (tracemalloc) pendant le bloc : {"peak_mb": ...}.
+    tracemalloc est global au process (allocations de tous les threads) : à réserver aux
+    mesures séquentielles (benchmarks), pas aux tâches d'un flow exécutées en parallèle.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if was_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    stats = {}
+    try:
+        yield stats
+    finally:
+        stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        if not was_tracing:
+            tracemalloc.stop()
+
+
+# --- Tables de snapshots partitionnées par mois (RANGE sur as_of) ---
+
+def month_partition_bounds(as_of: str) -> tuple[str, str, str]:
+    """
+    Partition mensuelle contenant as_of ("YYYY-MM-DD") : (suffixe, début inclus, fin exclue).
+    Ex. "2024-01-31" -> ("2024_01", "2024-01-01", "2024-02-01").
+    """
+    year, month = int(as_of[:4]), int(as_of[5:7])
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}_{month:02d}", f"{year:04d}-{month:02d}-01", f"{next_year:04d}-{next_month:02d}-01"
+
+
+def month_partition_name(table: str, as_of: str) -> str:
+    return f"{table}_p{month_partition_bounds(as_of)[0]}"
+
+
+def partitioned_table_ddl(table: str, columns: list[tuple[str, str]]) -> str:
+    """Table parente partitionnée par mois sur as_of, PK (user_id, as_of) et index sur as_of."""
+    defs = ",\n  ".join(f"{name} {sql_type}" for name, sql_type in columns)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table} (\n  {defs},\n  PRIMARY KEY (user_id, as_of)\n"
+        f") PARTITION BY RANGE (as_of);\n"
+        f"CREATE INDEX IF NOT EXISTS {table}_as_of_idx ON {table} (as_of);"
+    )
+
+
+def month_partition_ddl(table: str, as_of: str) -> str:
+    _, start, end = month_partition_bounds(as_of)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {month_partition_name(table, as_of)} "
+        f"PARTITION OF {table} FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+
+
+def detach_partition_sql(table: str, as_of: str) -> str:
+    return f"ALTER TABLE {table} DETACH PARTITION {month_partition_name(table, as_of)}"
+
+
+# --- Matérialisation incrémentale Feast (snapshots -> online store) ---
+
+# Feature views online et table de snapshots de leur source (cf. feast_repo/repo/data_sources.py)
+FEATURE_VIEW_SNAPSHOTS = {
+    "subs_profile_fv": "subscriptions_profile_snapshots",
+    "usage_agg_30d_fv": "usage_agg_30d_snapshots",
+    "payments_agg_90d_fv": "payments_agg_90d_snapshots",
+    "support_agg_90d_fv": "support_agg_90d_snapshots",
+}
+
+# Type Feast (nom du PrimitiveFeastType) -> cast SQL : valeurs Python directement
+# convertibles par Feast (NUMERIC serait lu en Decimal)
+FEAST_SQL_CASTS = {
+    "FLOAT32": "double precision",
+    "FLOAT64": "double precision",
+    "INT32": "bigint",
+    "INT64": "bigint",
+    "BOOL": "boolean",
+    "STRING": "text",
+}
+
+
+def materialization_sql(snapshot_table: str, features: dict[str, str]) -> str:
+    """
+    Dernière ligne de chaque user_id parmi les snapshots de la fenêtre
+    [%(start)s, %(end)s[ sur as_of ; features : {colonne: type Feast}.
+    """
+    cols = ", ".join(
+        f"{name}::{FEAST_SQL_CASTS[dtype]} AS {name}" if dtype in FEAST_SQL_CASTS else name
+        for name, dtype in features.items()
+    )
+    return (
+        f"SELECT DISTINCT ON (user_id) user_id, as_of, {cols} "
+        f"FROM {snapshot_table} "
+        f"WHERE as_of >= %(start)s AND as_of < %(end)s "
+        f"ORDER BY user_id, as_of DESC"
+    )
+
+
+def chunk_bounds(n_rows: int, chunk_size: int) -> list[tuple[int, int]]:
+    """[(début, fin), ...] pour écrire n_rows lignes par lots de chunk_size."""
+    return [(start, min(start + chunk_size, n_rows)) for start in range(0, n_rows, chunk_size)]
@@ -0,0 +1,160 @@
+"""
+Landing zone Parquet : chaque dépôt mensuel de CSV est converti une seule fois en
+Parquet typé (schéma de db/init/001_schema.sql), partitionné par mois à la Hive :
+    <landing_dir>/<table>/month=YYYY-MM/part-0.parquet
+Les chargements lisent ensuite les colonnes via Arrow en mémoire mappée, sans
+re-parser ni ré-inférer les types du CSV. Le sha256 du CSV source est stocké dans les
+métadonnées du Parquet : un dépôt corrigé (même mois, contenu différent) est reconverti.
+"""
+import csv
+import io
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from ingest_utils import file_sha256
+
+# Colonnes des tables de base (cf. db/init/001_schema.sql)
+SEED_TABLE_COLUMNS = {
+    "users": [
+        ("user_id", "TEXT"),
+        ("signup_date", "DATE"),
+        ("user_gender", "TEXT"),
+        ("user_is_senior", "BOOLEAN"),
+        ("has_family", "BOOLEAN"),
+        ("has_dependents", "BOOLEAN"),
+    ],
+    "subscriptions": [
+        ("user_id", "TEXT"),
+        ("months_active", "INT"),
+        ("plan_stream_tv", "BOOLEAN"),
+        ("plan_stream_movies", "BOOLEAN"),
+        ("contract_type", "TEXT"),
+        ("paperless_billing", "BOOLEAN"),
+        ("monthly_fee", "NUMERIC"),
+        ("total_paid", "NUMERIC"),
+        ("net_service", "TEXT"),
+        ("add_on_security", "BOOLEAN"),
+        ("add_on_backup", "BOOLEAN"),
+        ("add_on_device_protect", "BOOLEAN"),
+        ("add_on_support", "BOOLEAN"),
+    ],
+    "usage_agg_30d": [
+        ("user_id", "TEXT"),
+        ("watch_hours_30d", "NUMERIC"),
+        ("avg_session_mins_7d", "NUMERIC"),
+        ("unique_devices_30d", "INT"),
+        ("skips_7d", "INT"),
+        ("rebuffer_events_7d", "INT"),
+    ],
+    "payments_agg_90d": [
+        ("user_id", "TEXT"),
+        ("failed_payments_90d", "INT"),
+    ],
+    "support_agg_90d": [
+        ("user_id", "TEXT"),
+        ("support_tickets_90d", "INT"),
+        ("ticket_avg_resolution_hrs_90d", "NUMERIC"),
+    ],
+    "labels": [
+        ("user_id", "TEXT"),
+        ("churn_label", "BOOLEAN"),
+    ],
+}
+
+# Clé des métadonnées Parquet portant le sha256 du CSV converti
+SOURCE_SHA256_KEY = b"source_sha256"
+
+# NUMERIC -> float64 : mêmes valeurs que le chemin pandas (read_csv lit ces colonnes en float64)
+ARROW_TYPES = {
+    "TEXT": pa.string(),
+    "INT": pa.int32(),
+    "BOOLEAN": pa.bool_(),
+    "NUMERIC": pa.float64(),
+    "DATE": pa.date32(),
+}
+
+
+def arrow_schema(table: str) -> pa.Schema:
+    return pa.schema([(name, ARROW_TYPES[sql_type]) for name, sql_type in SEED_TABLE_COLUMNS[table]])
+
+
+def month_of(as_of: str) -> str:
+    """Valeur de partition Hive pour as_of : "2024-01-31" -> "2024-01"."""
+    return as_of[:7]
+
+
+def landing_path(landing_dir: str, table: str, month: str) -> Path:
+    return Path(landing_dir) / table / f"month={month}" / "part-0.parquet"
+
+
+def read_csv_typed(csv_path: str, table: str) -> pa.Table:
+    """
+    Parse le CSV avec les types du schéma (colonnes absentes du CSV, comme les add_on_*
+    "cachées au départ", non ajoutées : l'upsert ne les écrase pas). Champs vides -> NULL.
+    """
+    schema = arrow_schema(table)
+    with open(csv_path, newline="") as f:
+        header = next(csv.reader(f))
+    column_types = {name: schema.field(name).type for name in header if name in schema.names}
+    return pacsv.read_csv(
+        csv_path,
+        convert_options=pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+    )
+
+
+def landed_source_sha256(parquet_path: str) -> str | None:
+    """sha256 du CSV dont est issu le Parquet (None pour un fichier sans cette métadonnée)."""
+    metadata = pq.read_schema(parquet_path).metadata or {}
+    value = metadata.get(SOURCE_SHA256_KEY)
+    return value.decode() if value is not None else None
+
+
+def land_csv(csv_path: str, landing_dir: str, table: str, month: str, overwrite: bool = False) -> str:
+    """
+    Convertit un CSV en Parquet typé dans la partition du mois. Pas de reconversion si le
+    Parquet existant provient du même CSV (même sha256), sauf overwrite.
+    """
+    path = landing_path(landing_dir, table, month)
+    source_sha = file_sha256(csv_path)
+    if path.exists() and not overwrite and landed_source_sha256(str(path)) == source_sha:
+        return str(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    typed = read_csv_typed(csv_path, table)
+    metadata = {**(typed.schema.metadata or {}), SOURCE_SHA256_KEY: source_sha.encode()}
+    pq.write_table(typed.replace_schema_metadata(metadata), tmp_path)
+    # Écriture atomique : un lecteur ne voit jamais de fichier partiel
+    os.replace(tmp_path, path)
+    return str(path)
+
+
+def landing_columns(parquet_path: str) -> list[str]:
+    """Colonnes d'un Parquet de la landing zone (y compris sans aucune ligne)."""
+    return pq.ParquetFile(parquet_path).schema_arrow.names
+
+
+def iter_csv_batches(parquet_path: str, batch_size: int = 65536):
+    """
+    Lit le Parquet en mémoire mappée par record batches et les sérialise en CSV (sans
+    en-tête) pour COPY : booléens true/false, dates ISO, NULL = champ vide.
+    Retourne des tuples (colonnes, buffer CSV, nombre de lignes).
+    """
+    parquet_file = pq.ParquetFile(parquet_path, memory_map=True)
+    cols = parquet_file.schema_arrow.names
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        buf = io.BytesIO()
+        pacsv.write_csv(batch, buf, write_options=pacsv.WriteOptions(include_header=False))
+        buf.seek(0)
+        yield cols, buf, batch.num_rows
+
+
+def read_landing(landing_dir: str, table: str, month: str | None = None, columns: list[str] | None = None) -> pa.Table:
+    """Lecture (mémoire mappée) d'une table de la landing zone, d'un mois ou de tous."""
+    if month is not None:
+        return pq.read_table(landing_path(landing_dir, table, month), columns=columns, memory_map=True,
+                             partitioning=None)
+    return pq.read_table(Path(landing_dir) / table, columns=columns, memory_map=True, partitioning="hive")
@@ -5,7 +5,7 @@ from pprint import pprint
 
 import pandas as pd
 from prefect import flow, task
-from sqlalchemy import create_engine
+from db import get_engine as get_shared_engine, log_pool_stats
 
 from feast import FeatureStore
 
@@ -32,13 +32,8 @@ AS_OF_CUR_DEFAULT = "2024-02-29"
 # DB helpers
 # ----------------------------
 def get_engine():
-    uri = (
-        f"postgresql+psycopg2://{os.getenv('POSTGRES_USER','streamflow')}:"
-        f"{os.getenv('POSTGRES_PASSWORD','streamflow')}@"
-        f"{os.getenv('POSTGRES_HOST','postgres')}:5432/"
-        f"{os.getenv('POSTGRES_DB','streamflow')}"
-    )
-    return create_engine(uri)
+    """Engine partagé du flow de monitoring (pool "monitor", cf. db.py)."""
+    return get_shared_engine("monitor")
 
 
 def fetch_entity_df(engine, as_of: str) -> pd.DataFrame:
@@ -280,6 +275,7 @@ def monitor_month_flow(
         f"[Evidently] report_html={res['html']} report_json={res['json']} "
         f"drift_share={res['drift_share']:.2f} -> {msg}"
     )
+    log_pool_stats("monitor")
 
 
 if __name__ == "__main__":
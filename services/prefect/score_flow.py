@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg
+from psycopg.conninfo import make_conninfo
+
+from feast import FeatureStore
+
+import mlflow
+import mlflow.sklearn
+from mlflow.tracking import MlflowClient
+
+from prefect import flow, task
+
+from train_and_compare_flow import FEATURES, MODEL_NAME, FEAST_REPO, MLFLOW_TRACKING_URI
+
+# Nombre de users par appel get_historical_features (borne la mémoire du flow)
+SCORE_CHUNK_SIZE = int(os.getenv("SCORE_CHUNK_SIZE", "50000"))
+# Nombre de lignes par appel predict_proba dans un process du pool
+PREDICT_CHUNK_SIZE = int(os.getenv("PREDICT_CHUNK_SIZE", "5000"))
+SCORE_WORKERS = int(os.getenv("SCORE_WORKERS", str(os.cpu_count() or 1)))
+
+FEATURE_NAMES = [f.split(":", 1)[1] for f in FEATURES]
+
+SCORES_DDL = """
+CREATE TABLE IF NOT EXISTS churn_scores (
+  user_id TEXT,
+  as_of DATE,
+  model_version TEXT,
+  score DOUBLE PRECISION,
+  scored_at TIMESTAMPTZ DEFAULT now(),
+  PRIMARY KEY (user_id, as_of, model_version)
+);
+CREATE INDEX IF NOT EXISTS churn_scores_version_as_of_idx ON churn_scores (model_version, as_of);
+"""
+
+
+def pg_conninfo() -> str:
+    return make_conninfo(
+        "",
+        user=os.getenv("POSTGRES_USER", "streamflow"),
+        password=os.getenv("POSTGRES_PASSWORD", "streamflow"),
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        dbname=os.getenv("POSTGRES_DB", "streamflow"),
+    )
+
+
+# ----------------------------
+# Inférence dans le pool de process
+# ----------------------------
+# Le modèle est chargé une seule fois dans le process parent ; les workers le
+# reçoivent par fork (copy-on-write), sans nouveau téléchargement ni unpickling.
+_MODEL = None
+
+
+def _predict_chunk(X: pd.DataFrame) -> np.ndarray:
+    return _MODEL.predict_proba(X)[:, 1]
+
+
+def _make_pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+
+
+# ----------------------------
+# Lecture / écriture Postgres
+# ----------------------------
+def iter_user_chunks(conn, as_of: str, chunk_size: int):
+    """user_ids du snapshot as_of par pages (keyset sur user_id) : jamais toute la base en mémoire."""
+    after = ""
+    while True:
+        rows = conn.execute(
+            """
+            SELECT user_id FROM subscriptions_profile_snapshots
+            WHERE as_of = %s AND user_id > %s
+            ORDER BY user_id
+            LIMIT %s
+            """,
+            (as_of, after, chunk_size),
+        ).fetchall()
+        if not rows:
+            return
+        user_ids = [r[0] for r in rows]
+        after = user_ids[-1]
+        yield user_ids
+
+
+def copy_scores(conn, as_of: str, model_version: str, user_ids, scores) -> int:
+    """
+    Bulk-load via COPY dans une table temporaire, puis upsert set-based dans churn_scores
+    (un re-run du même mois avec la même version remplace les scores).
+    """
+    conn.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS tmp_churn_scores "
+        "(user_id TEXT, as_of DATE, model_version TEXT, score DOUBLE PRECISION)"
+    )
+    conn.execute("TRUNCATE tmp_churn_scores")
+    with conn.cursor().copy(
+        "COPY tmp_churn_scores (user_id, as_of, model_version, score) FROM STDIN"
+    ) as copy:
+        for uid, score in zip(user_ids, scores):
+            copy.write_row((uid, as_of, model_version, float(score)))
+    cur = conn.execute(
+        """
+        INSERT INTO churn_scores (user_id, as_of, model_version, score)
+        SELECT user_id, as_of, model_version, score FROM tmp_churn_scores
+        ON CONFLICT (user_id, as_of, model_version)
+        DO UPDATE SET score = EXCLUDED.score, scored_at = now()
+        """
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+# ----------------------------
+# Prefect tasks
+# ----------------------------
+@task
+def load_production_model() -> str:
+    """Charge le modèle Production une fois (dans _MODEL) et retourne sa version figée."""
+    global _MODEL
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    latest_prod = MlflowClient().get_latest_versions(MODEL_NAME, stages=["Production"])
+    if not latest_prod:
+        raise RuntimeError("Aucun modèle en Production : rien à scorer.")
+    version = latest_prod[0].version
+
+    # Version explicite (et non le stage) : une promotion pendant le run ne mélange pas deux modèles
+    _MODEL = mlflow.sklearn.load_model(f"models:/{MODEL_NAME}/{version}")
+    # Le parallélisme vient du pool de process : un seul thread par forêt
+    if hasattr(_MODEL, "named_steps") and "clf" in _MODEL.named_steps:
+        _MODEL.named_steps["clf"].set_params(n_jobs=1)
+    return version
+
+
+@task
+def score_all_users(as_of: str, model_version: str, chunk_size: int, predict_chunk_size: int,
+                    workers: int) -> dict:
+    store = FeatureStore(repo_path=FEAST_REPO)
+    n_scored = n_skipped = 0
+    t0 = time.perf_counter()
+
+    with psycopg.connect(pg_conninfo()) as conn, _make_pool(workers) as pool:
+        conn.execute(SCORES_DDL)
+        conn.commit()
+
+        # Une page de user_ids à la fois (la requête suivante part après le commit du chunk)
+        for user_ids in iter_user_chunks(conn, as_of, chunk_size):
+            # Même point-in-time join que build_training_df, un chunk à la fois
+            entity_df = pd.DataFrame({
+                "user_id": user_ids,
+                "event_timestamp": pd.to_datetime(as_of),
+            })
+            feat_df = store.get_historical_features(entity_df=entity_df, features=FEATURES).to_df()
+
+            # Comme l'API : pas de score pour un user aux features incomplètes
+            complete = feat_df[FEATURE_NAMES].notna().all(axis=1)
+            n_skipped += int((~complete).sum())
+            feat_df = feat_df[complete]
+            if feat_df.empty:
+                continue
+
+            X = feat_df[FEATURE_NAMES]
+            parts = [X.iloc[i:i + predict_chunk_size] for i in range(0, len(X), predict_chunk_size)]
+            scores = np.concatenate(list(pool.map(_predict_chunk, parts)))
+
+            n_scored += copy_scores(conn, as_of, model_version, feat_df["user_id"].tolist(), scores)
+            elapsed = time.perf_counter() - t0
+            print(f"[SCORE] {n_scored} rows scored ({n_scored / elapsed:.0f} rows/s)")
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "as_of": as_of,
+        "model_version": model_version,
+        "n_scored": n_scored,
+        "n_skipped": n_skipped,
+        "seconds": round(elapsed, 2),
+        "rows_per_sec": round(n_scored / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+# ----------------------------
+# Prefect flow
+# ----------------------------
+@flow(name="score_month")
+def score_month_flow(
+    as_of: str = "2024-01-31",
+    chunk_size: int = SCORE_CHUNK_SIZE,
+    predict_chunk_size: int = PREDICT_CHUNK_SIZE,
+    workers: int = SCORE_WORKERS,
+):
+    """
+    Score toute la base au snapshot as_of avec le modèle Production et écrit
+    churn_scores(user_id, as_of, model_version, score). Mémoire bornée par chunk_size.
+    """
+    version = load_production_model()
+    summary = score_all_users(as_of, version, chunk_size, predict_chunk_size, workers)
+    print(
+        f"[SUMMARY] as_of={as_of} model_v={version} scored={summary['n_scored']} "
+        f"skipped={summary['n_skipped']} in {summary['seconds']}s ({summary['rows_per_sec']} rows/s)"
+    )
+    return summary
+
+
+if __name__ == "__main__":
+    score_month_flow()
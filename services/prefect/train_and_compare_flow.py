@@ -4,7 +4,7 @@ from pathlib import Path
 
 import numpy as np
 import pandas as pd
-from sqlalchemy import create_engine
+from db import get_engine, log_pool_stats
 
 from feast import FeatureStore
 
@@ -48,14 +48,16 @@ FEATURES = [
     "support_agg_90d_fv:ticket_avg_resolution_hrs_90d",
 ]
 
+FEATURE_NAMES = [f.split(":", 1)[1] for f in FEATURES]
+
+# Source des features d'entraînement : "views" (4 feature views, 4 jointures point-in-time)
+# ou "wide" (feature service sur le snapshot large, une seule jointure ; cf. feature_services.py)
+TRAINING_FEATURE_SOURCE = os.getenv("TRAINING_FEATURE_SOURCE", "views")
+WIDE_FEATURE_SERVICE = "churn_training_wide"
+
 def get_sql_engine():
-    uri = (
-        f"postgresql+psycopg2://{os.getenv('POSTGRES_USER','streamflow')}:"
-        f"{os.getenv('POSTGRES_PASSWORD','streamflow')}@"
-        f"{os.getenv('POSTGRES_HOST','postgres')}:5432/"
-        f"{os.getenv('POSTGRES_DB','streamflow')}"
-    )
-    return create_engine(uri)
+    """Engine partagé du flow d'entraînement (pool "train", cf. db.py)."""
+    return get_engine("train")
 
 def fetch_entity_df(engine, as_of: str) -> pd.DataFrame:
     q = """
@@ -100,7 +102,13 @@ def build_training_df(as_of: str) -> pd.DataFrame:
     labels_df = fetch_labels(eng, as_of)
 
     store = FeatureStore(repo_path=FEAST_REPO)
-    feat_df = store.get_historical_features(entity_df=entity_df, features=FEATURES).to_df()
+    if TRAINING_FEATURE_SOURCE == "wide":
+        service = store.get_feature_service(WIDE_FEATURE_SERVICE)
+        feat_df = store.get_historical_features(entity_df=entity_df, features=service).to_df()
+        # Même ordre de colonnes que le chemin "views"
+        feat_df = feat_df[list(entity_df.columns) + FEATURE_NAMES]
+    else:
+        feat_df = store.get_historical_features(entity_df=entity_df, features=FEATURES).to_df()
 
     df = feat_df.merge(labels_df, on=["user_id", "event_timestamp"], how="inner")
     if df.empty:
@@ -268,6 +276,7 @@ def train_and_compare_flow(as_of: str, seed: int = 42, delta: float = 0.01):
         f"[SUMMARY] as_of={as_of} cand_v={cand['candidate_version']} "
         f"cand_auc={cand['val_auc']:.4f} prod_v={prod['prod_version']} prod_auc={prod['prod_auc']:.4f} -> {decision}"
     )
+    log_pool_stats("train")
     return decision
 
 if __name__ == "__main__":
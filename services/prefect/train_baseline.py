@@ -5,7 +5,7 @@ warnings.filterwarnings("ignore")
 
 import pandas as pd
 import numpy as np
-from sqlalchemy import create_engine
+from db import get_engine, log_pool_stats
 
 from feast import FeatureStore
 from sklearn.model_selection import train_test_split
@@ -28,12 +28,6 @@ MODEL_NAME = "streamflow_churn"
 
 AS_OF = os.environ.get("TRAIN_AS_OF", "2024-01-31")
 
-PG_USER = os.environ.get("POSTGRES_USER", "streamflow")
-PG_PWD  = os.environ.get("POSTGRES_PASSWORD", "streamflow")
-PG_DB   = os.environ.get("POSTGRES_DB", "streamflow")
-PG_HOST = os.environ.get("POSTGRES_HOST", "postgres")
-PG_PORT = int(os.environ.get("POSTGRES_PORT", "5432"))
-
 MLFLOW_TRACKING_URI = os.environ.get("MLFLOW_TRACKING_URI", "http://mlflow:5000")
 MLFLOW_EXPERIMENT   = os.environ.get("MLFLOW_EXPERIMENT", "streamflow")
 
@@ -41,8 +35,8 @@ MLFLOW_EXPERIMENT   = os.environ.get("MLFLOW_EXPERIMENT", "streamflow")
 # Helpers
 # --------------------
 def get_sql_engine():
-    uri = f"postgresql+psycopg2://{PG_USER}:{PG_PWD}@{PG_HOST}:{PG_PORT}/{PG_DB}"
-    return create_engine(uri)
+    """Engine partagé (pool "train_baseline", cf. db.py, configuré par les mêmes POSTGRES_*)."""
+    return get_engine("train_baseline")
 
 def fetch_entity_df(engine, as_of):
     q = """
@@ -240,5 +234,7 @@ def main():
 
         print(f"[OK] Trained baseline RF. AUC={auc:.4f} F1={f1:.4f} ACC={acc:.4f} (run_id={run.info.run_id})")
 
+    log_pool_stats("train_baseline")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+Expectations de ingest_flow.validate_with_ge compilées en SQL : une requête
+information_schema pour le jeu de colonnes et une requête d'agrégats (un seul scan
+de la table entière) pour les expectations ligne à ligne.
+"""
+
+# Expectations par table, dans l'ordre où elles sont évaluées (cf. validate_with_ge) :
+# (type d'expectation GE, paramètres)
+EXPECTATIONS = {
+    "users": [
+        ("expect_table_columns_to_match_set", {"column_set": [
+            "user_id", "signup_date", "user_gender", "user_is_senior", "has_family", "has_dependents",
+        ]}),
+        ("expect_column_values_to_not_be_null", {"column": "user_id"}),
+    ],
+    "subscriptions": [
+        ("expect_table_columns_to_match_set", {"column_set": [
+            "user_id", "months_active", "plan_stream_tv", "plan_stream_movies",
+            "contract_type", "paperless_billing", "monthly_fee", "total_paid",
+            "net_service", "add_on_security", "add_on_backup",
+            "add_on_device_protect", "add_on_support",
+        ]}),
+        ("expect_column_values_to_not_be_null", {"column": "user_id"}),
+        ("expect_column_values_to_be_between", {"column": "months_active", "min_value": 0}),
+        ("expect_column_values_to_be_between", {"column": "monthly_fee", "min_value": 0}),
+    ],
+    "usage_agg_30d": [
+        ("expect_table_columns_to_match_set", {"column_set": [
+            "user_id", "watch_hours_30d", "avg_session_mins_7d",
+            "unique_devices_30d", "skips_7d", "rebuffer_events_7d",
+        ]}),
+        ("expect_column_values_to_not_be_null", {"column": "user_id"}),
+        ("expect_column_values_to_be_between", {"column": "watch_hours_30d", "min_value": 0}),
+        ("expect_column_values_to_be_between", {"column": "avg_session_mins_7d", "min_value": 0}),
+    ],
+}
+# Table non reconnue : check minimal
+DEFAULT_EXPECTATIONS = [("expect_column_values_to_not_be_null", {"column": "user_id"})]
+
+COLUMNS_SQL = """
+SELECT column_name
+FROM information_schema.columns
+WHERE table_schema = current_schema() AND table_name = %(table)s
+"""
+
+
+def expectations_for(table: str) -> list[tuple[str, dict]]:
+    return EXPECTATIONS.get(table, DEFAULT_EXPECTATIONS)
+
+
+def unexpected_condition(exp_type: str, kwargs: dict) -> str:
+    """
+    Condition SQL des lignes en échec. Comme GE, les NULL ne sont pas comptés
+    en échec par expect_column_values_to_be_between (la comparaison est NULL).
+    """
+    column = kwargs["column"]
+    if exp_type == "expect_column_values_to_not_be_null":
+        return f"{column} IS NULL"
+    if exp_type == "expect_column_values_to_be_between":
+        bounds = []
+        if kwargs.get("min_value") is not None:
+            bounds.append(f"{column} < {kwargs['min_value']!r}")
+        if kwargs.get("max_value") is not None:
+            bounds.append(f"{column} > {kwargs['max_value']!r}")
+        return " OR ".join(bounds) or "FALSE"
+    raise ValueError(f"unsupported expectation for SQL validation: {exp_type}")
+
+
+def aggregate_sql(table: str, expectations: list[tuple[str, dict]]) -> str | None:
+    """
+    SELECT count(*), count(*) FILTER (WHERE <échec 1>), ... FROM table : un seul scan
+    pour toutes les expectations ligne à ligne. None s'il n'y en a aucune.
+    """
+    filters = [
+        f"count(*) FILTER (WHERE {unexpected_condition(exp_type, kwargs)})"
+        for exp_type, kwargs in expectations
+        if exp_type != "expect_table_columns_to_match_set"
+    ]
+    if not filters:
+        return None
+    return f"SELECT count(*), {', '.join(filters)} FROM {table}"
+
+
+def evaluate(expectations: list[tuple[str, dict]], columns: list[str], unexpected_counts: list[int]) -> list[dict]:
+    """
+    Résultats par expectation, dans l'ordre : {"expectation_type", "success", "unexpected_count"}.
+    unexpected_counts : compteurs de aggregate_sql (sans le count(*) total), dans le même ordre.
+    """
+    counts = iter(unexpected_counts)
+    results = []
+    for exp_type, kwargs in expectations:
+        if exp_type == "expect_table_columns_to_match_set":
+            success = set(columns) == set(kwargs["column_set"])
+            results.append({"expectation_type": exp_type, "success": success, "unexpected_count": None})
+        else:
+            n = next(counts)
+            results.append({"expectation_type": exp_type, "success": n == 0, "unexpected_count": n})
+    return results
+
+
+def first_failure(results: list[dict]) -> str | None:
+    """Type de la première expectation en échec (None si tout passe)."""
+    for result in results:
+        if not result["success"]:
+            return result["expectation_type"]
+    return None
@@ -0,0 +1,59 @@
+"""
+Parité lecture directe (pool psycopg) vs FeatureStore.get_online_features.
+Nécessite la stack docker compose (Postgres + online store matérialisé) :
+    FEAST_REPO=/repo PARITY_USER_IDS=7590-VHVEG,5575-GNVDE pytest tests/integration
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+FEAST_REPO = os.getenv("FEAST_REPO")
+USER_IDS = [u for u in os.getenv("PARITY_USER_IDS", "7590-VHVEG,5575-GNVDE,does-not-exist").split(",") if u]
+
+pytestmark = pytest.mark.skipif(not FEAST_REPO, reason="FEAST_REPO non défini (stack Feast/Postgres requise)")
+
+FEATURES = [
+    "subs_profile_fv:months_active",
+    "subs_profile_fv:monthly_fee",
+    "subs_profile_fv:paperless_billing",
+    "subs_profile_fv:plan_stream_tv",
+    "subs_profile_fv:plan_stream_movies",
+    "subs_profile_fv:net_service",
+    "usage_agg_30d_fv:watch_hours_30d",
+    "usage_agg_30d_fv:avg_session_mins_7d",
+    "usage_agg_30d_fv:unique_devices_30d",
+    "usage_agg_30d_fv:skips_7d",
+    "usage_agg_30d_fv:rebuffer_events_7d",
+    "payments_agg_90d_fv:failed_payments_90d",
+    "support_agg_90d_fv:support_tickets_90d",
+    "support_agg_90d_fv:ticket_avg_resolution_hrs_90d",
+]
+
+def test_direct_read_matches_get_online_features():
+    feast = pytest.importorskip("feast")
+    pytest.importorskip("psycopg_pool")
+    from online_reader import AsyncOnlineReader
+
+    store = feast.FeatureStore(repo_path=FEAST_REPO)
+    expected = store.get_online_features(
+        features=FEATURES, entity_rows=[{"user_id": u} for u in USER_IDS]
+    ).to_dict()
+
+    async def read():
+        reader = AsyncOnlineReader.from_store(store, FEATURES)
+        await reader.open()
+        try:
+            return await reader.fetch(USER_IDS)
+        finally:
+            await reader.close()
+
+    got = asyncio.run(read())
+    assert set(got) == set(expected)
+    for col, values in expected.items():
+        assert got[col] == values, col
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "benchmarks"))
+
+from api_load import arrival_offsets, load_user_ids, percentile, summarize
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 100) == 100.0
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 50) is None
+
+
+def test_summarize_counts_errors_and_excludes_them_from_latency():
+    results = [(0.001, 200, False), (0.002, 200, True), (0.004, 200, False), (5.0, 500, False), (10.0, 0, False)]
+    summary = summarize(results, duration_s=2.0, n_planned=6)
+
+    assert summary["requests"] == 5 and summary["planned"] == 6
+    assert summary["throughput_rps"] == 2.5
+    assert summary["errors"] == 2 and summary["error_rate"] == 0.4
+    assert summary["app_errors"] == 1
+    assert summary["status_counts"] == {"200": 3, "500": 1, "network_error": 1}
+    assert summary["latency_ms"]["p50"] == 2.0
+    assert summary["latency_ms"]["max"] == 4.0
+
+
+def test_summarize_empty_run():
+    summary = summarize([], duration_s=1.0)
+    assert summary["requests"] == 0 and summary["error_rate"] is None
+    assert summary["latency_ms"]["p99"] is None
+
+
+def test_arrival_offsets_match_target_rate():
+    uniform = arrival_offsets(100, 2.0)
+    assert len(uniform) == 200 and uniform[1] == 0.01
+
+    poisson = arrival_offsets(100, 10.0, arrival="poisson", seed=1)
+    assert 900 < len(poisson) < 1100
+    assert poisson == sorted(poisson) and poisson[-1] < 10.0
+
+
+def test_user_ids_are_replayed_from_seeds():
+    user_ids = load_user_ids(str(ROOT / "data" / "seeds" / "month_000" / "users.csv"))
+    assert user_ids[0] == "7590-VHVEG"
+    assert len(user_ids) == 7043
@@ -0,0 +1,65 @@
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from caches import LRUTTLCache, RegistryWatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    evicted = []
+    cache = LRUTTLCache(maxsize=2, on_evict=evicted.append)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert evicted == [1]
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 1)
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = LRUTTLCache(maxsize=10, ttl_seconds=60, clock=clock)
+    cache.put(("u1", ("f",)), {"f": 1})
+    clock.now = 59
+    assert cache.get(("u1", ("f",)))[0] is True
+    clock.now = 61
+    assert cache.get(("u1", ("f",)))[0] is False
+    assert cache.evictions == 1
+
+def test_registry_watcher_detects_new_materialization(tmp_path):
+    registry = tmp_path / "registry.db"
+    registry.write_bytes(b"v1")
+    clock = FakeClock()
+    watcher = RegistryWatcher(str(registry), check_interval=5, clock=clock)
+    assert watcher.changed() is False
+
+    st = os.stat(registry)
+    os.utime(registry, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    clock.now = 1
+    assert watcher.changed() is False  # throttlé
+    clock.now = 10
+    assert watcher.changed() is True
+    clock.now = 20
+    assert watcher.changed() is False
+
+def test_feature_vector_hash_is_order_stable_and_type_aware():
+    from caches import feature_vector_hash
+
+    names = ["months_active", "paperless_billing"]
+    a = feature_vector_hash({"months_active": 3, "paperless_billing": True}, names)
+    b = feature_vector_hash({"paperless_billing": True, "months_active": 3}, names)
+    c = feature_vector_hash({"months_active": 3, "paperless_billing": 1}, names)
+    assert a == b
+    assert a != c
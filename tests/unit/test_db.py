@@ -0,0 +1,85 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "services" / "prefect"))
+
+import db
+
+
+def test_pool_settings_priority():
+    env = {"DB_POOL_SIZE": "3", "DB_POOL_SIZE_INGEST": "8", "DB_POOL_TIMEOUT": "2.5"}
+    assert db.pool_settings("ingest", env=env, pool_size=6) == {"pool_size": 8, "max_overflow": 5, "timeout": 2.5}
+    assert db.pool_settings("monitor", env=env, pool_size=6)["pool_size"] == 6
+    assert db.pool_settings("monitor", env=env)["pool_size"] == 3
+    assert db.pool_settings("monitor", env={}) == {
+        "pool_size": db.DEFAULT_POOL_SIZE, "max_overflow": db.DEFAULT_MAX_OVERFLOW, "timeout": db.DEFAULT_POOL_TIMEOUT,
+    }
+
+
+def test_engine_is_shared_and_times_checkout_wait(tmp_path):
+    engine = db.get_engine("test_pool", pool_size=1, max_overflow=0, url=f"sqlite:///{tmp_path}/t.db")
+    try:
+        assert db.get_engine("test_pool") is engine
+        assert isinstance(engine.pool, db.TimedQueuePool)
+
+        held = engine.connect()
+        assert db.pool_stats("test_pool")["in_use"] == 1
+
+        def release():
+            time.sleep(0.2)
+            held.close()
+
+        threading.Thread(target=release).start()
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+
+        stats = db.pool_stats("test_pool")
+        assert stats["checkouts"] == 2
+        assert stats["wait_seconds_max"] >= 0.15
+        assert stats["in_use"] == 0
+    finally:
+        db.dispose_engines()
+
+
+def test_log_pool_stats_prints_one_line_per_open_pool(tmp_path, capsys):
+    db.log_pool_stats("never_opened")
+    assert capsys.readouterr().out == ""
+
+    engine = db.get_engine("test_log", pool_size=2, max_overflow=0, url=f"sqlite:///{tmp_path}/t.db")
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+        db.log_pool_stats("test_log")
+        out = capsys.readouterr().out
+        assert out.startswith("[DB] pool test_log: size=2 in_use=0")
+        assert "checkouts=1" in out
+    finally:
+        db.dispose_engines()
+
+
+def test_pool_metrics_are_served_on_db_metrics_port(tmp_path):
+    pytest.importorskip("prometheus_client")
+    import socket
+    import urllib.request
+
+    assert db.start_metrics_server(env={}) is None
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        port = sock.getsockname()[1]
+    assert db.start_metrics_server(env={"DB_METRICS_PORT": str(port)}) == port
+    engine = db.get_engine("test_metrics", pool_size=1, max_overflow=0, url=f"sqlite:///{tmp_path}/t.db")
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+        body = urllib.request.urlopen(f"http://localhost:{port}/metrics", timeout=5).read().decode()
+        assert 'db_pool_size{pool="test_metrics"} 1.0' in body
+        assert 'db_pool_checkout_wait_seconds_count{pool="test_metrics"}' in body
+    finally:
+        db.dispose_engines()
@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from fast_path import FastPredictor
+
+CAT_COLS = ["plan_stream_tv", "net_service"]
+NUM_COLS = ["months_active", "monthly_fee", "paperless_billing"]
+
+
+def make_df(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "plan_stream_tv": pd.Series(rng.integers(0, 2, n).astype(bool), dtype=object),
+        "net_service": rng.choice(["DSL", "Fiber optic", "No"], n).astype(object),
+        "months_active": rng.integers(0, 72, n),
+        "monthly_fee": rng.uniform(10, 120, n),
+        "paperless_billing": rng.integers(0, 2, n).astype(bool),
+    })
+
+
+def test_fast_path_matches_pipeline():
+    X = make_df(400, seed=0)
+    y = (X["monthly_fee"] > 70).astype(int) ^ (X["net_service"] == "No").astype(int)
+
+    preproc = ColumnTransformer(
+        transformers=[
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), CAT_COLS),
+            ("num", "passthrough", NUM_COLS),
+        ],
+        remainder="drop",
+    )
+    clf = RandomForestClassifier(n_estimators=25, random_state=42, max_features="sqrt")
+    pipe = Pipeline(steps=[("prep", preproc), ("clf", clf)]).fit(X, y)
+
+    fast = FastPredictor(pipe, {"categorical_cols": CAT_COLS, "numeric_cols": NUM_COLS})
+
+    X_test = make_df(50, seed=1)
+    X_test.loc[0, "net_service"] = "Satellite"  # catégorie inconnue
+    expected_pred = pipe.predict(X_test)
+    expected_proba = pipe.predict_proba(X_test)[:, 1]
+    for i, values in enumerate(X_test.to_dict(orient="records")):
+        pred, proba = fast.predict_one(values)
+        assert pred == expected_pred[i]
+        assert proba == pytest.approx(expected_proba[i])
@@ -0,0 +1,160 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "services" / "prefect"))
+
+from ingest_utils import (
+    chunk_bounds,
+    chunk_staging_ddl,
+    copy_sql,
+    delta_merge_sql,
+    delta_staging_sql,
+    detach_partition_sql,
+    file_sha256,
+    materialization_sql,
+    merge_sql,
+    month_partition_bounds,
+    month_partition_ddl,
+    partitioned_table_ddl,
+    pk_text_sql,
+    row_hash_sql,
+    staging_column_type,
+    staging_ddl,
+    store_row_hashes_sql,
+    traced_peak_memory,
+)
+
+
+def test_staging_column_types_follow_pandas_dtypes():
+    assert staging_column_type("int64") == "BIGINT"
+    assert staging_column_type("Int64") == "BIGINT"
+    assert staging_column_type("float64") == "DOUBLE PRECISION"
+    assert staging_column_type("bool") == "BOOLEAN"
+    assert staging_column_type("boolean") == "BOOLEAN"
+    assert staging_column_type("datetime64[ns]") == "TIMESTAMP"
+    assert staging_column_type("datetime64[ns, UTC]") == "TIMESTAMPTZ"
+    assert staging_column_type("object") == "TEXT"
+
+
+def test_staging_ddl_is_temp_and_dropped_on_commit():
+    ddl = staging_ddl("tmp_users", {"user_id": "object", "signup_date": "datetime64[ns]"})
+    assert ddl == "CREATE TEMP TABLE tmp_users (user_id TEXT, signup_date TIMESTAMP) ON COMMIT DROP"
+
+
+def test_copy_sql_lists_columns_in_csv_order():
+    assert copy_sql("tmp_labels", ["user_id", "churn_label"]) == (
+        "COPY tmp_labels (user_id, churn_label) FROM STDIN WITH (FORMAT csv)"
+    )
+
+
+def test_merge_sql_updates_non_pk_columns():
+    sql = merge_sql("labels", "tmp_labels", ["user_id", "churn_label"], ["user_id"])
+    assert "INSERT INTO labels (user_id, churn_label) SELECT user_id, churn_label FROM tmp_labels" in sql
+    assert sql.endswith("ON CONFLICT (user_id) DO UPDATE SET churn_label = EXCLUDED.churn_label")
+
+
+def test_merge_sql_without_non_pk_columns_does_nothing_on_conflict():
+    sql = merge_sql("t", "tmp_t", ["user_id"], ["user_id"])
+    assert sql.endswith("ON CONFLICT (user_id) DO NOTHING")
+
+
+def test_file_sha256_matches_hashlib(tmp_path):
+    import hashlib
+
+    path = tmp_path / "users.csv"
+    path.write_bytes(b"user_id\n7590-VHVEG\n" * 1000)
+    assert file_sha256(str(path), block_size=7) == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_pk_text_for_single_and_composite_keys():
+    assert pk_text_sql(["user_id"], "s") == "s.user_id::text"
+    assert pk_text_sql(["user_id", "as_of"], "s") == "concat_ws('|', s.user_id::text, s.as_of::text)"
+
+
+def test_row_hash_casts_to_target_column_types():
+    sql = row_hash_sql(["user_id", "months_active"], {"user_id": "text", "months_active": "integer"}, "s")
+    assert sql == "md5(ROW(s.user_id::text, s.months_active::integer)::text)"
+
+
+def test_delta_sql_only_merges_changed_rows():
+    staging = delta_staging_sql("labels", "tmp_labels", "tmp_labels_delta", ["user_id", "churn_label"],
+                                ["user_id"], {"user_id": "text", "churn_label": "boolean"})
+    assert "h.table_name = 'labels'" in staging
+    assert "h.row_hash AS _old_hash" in staging
+
+    merge = delta_merge_sql("labels", "tmp_labels_delta", ["user_id", "churn_label"], ["user_id"])
+    assert "FROM tmp_labels_delta WHERE _old_hash IS DISTINCT FROM _row_hash ON CONFLICT (user_id)" in merge
+    assert "RETURNING (xmax = 0) AS inserted" in merge
+
+    store = store_row_hashes_sql("labels", "tmp_labels_delta")
+    assert "WHERE _old_hash IS DISTINCT FROM _row_hash" in store
+    assert store.endswith("ON CONFLICT (table_name, pk) DO UPDATE SET row_hash = EXCLUDED.row_hash")
+
+
+def test_chunk_staging_uses_target_types_with_numbers_as_default_staging():
+    ddl = chunk_staging_ddl(
+        "tmp_subscriptions",
+        ["user_id", "months_active", "paperless_billing", "monthly_fee", "extra"],
+        {"user_id": "text", "months_active": "integer", "paperless_billing": "boolean",
+         "monthly_fee": "numeric(10,2)"},
+    )
+    assert ddl == (
+        "CREATE TEMP TABLE tmp_subscriptions (user_id text, months_active DOUBLE PRECISION, "
+        "paperless_billing boolean, monthly_fee DOUBLE PRECISION, extra TEXT) ON COMMIT DROP"
+    )
+    # Même type que la staging COPY par défaut pour une colonne float64
+    assert staging_column_type("float64") == "DOUBLE PRECISION"
+
+
+def test_traced_peak_memory_reports_allocations_and_nests():
+    import tracemalloc
+
+    with traced_peak_memory() as outer:
+        with traced_peak_memory() as inner:
+            blob = bytearray(8 * 2**20)
+        del blob
+        assert tracemalloc.is_tracing()
+    assert inner["peak_mb"] >= 8
+    assert outer["peak_mb"] >= 8
+    assert not tracemalloc.is_tracing()
+
+
+def test_month_partition_bounds():
+    assert month_partition_bounds("2024-01-31") == ("2024_01", "2024-01-01", "2024-02-01")
+    assert month_partition_bounds("2024-02-01") == ("2024_02", "2024-02-01", "2024-03-01")
+    assert month_partition_bounds("2024-12-31") == ("2024_12", "2024-12-01", "2025-01-01")
+
+
+def test_partition_ddl():
+    ddl = partitioned_table_ddl("payments_agg_90d_snapshots",
+                                [("user_id", "TEXT"), ("as_of", "DATE"), ("failed_payments_90d", "INT")])
+    assert "PRIMARY KEY (user_id, as_of)\n) PARTITION BY RANGE (as_of);" in ddl
+    assert "CREATE INDEX IF NOT EXISTS payments_agg_90d_snapshots_as_of_idx" in ddl
+
+    assert month_partition_ddl("payments_agg_90d_snapshots", "2024-12-31") == (
+        "CREATE TABLE IF NOT EXISTS payments_agg_90d_snapshots_p2024_12 PARTITION OF payments_agg_90d_snapshots "
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    )
+    assert detach_partition_sql("payments_agg_90d_snapshots", "2024-12-15") == (
+        "ALTER TABLE payments_agg_90d_snapshots DETACH PARTITION payments_agg_90d_snapshots_p2024_12"
+    )
+
+
+def test_materialization_sql_takes_latest_snapshot_per_user_in_window():
+    sql = materialization_sql(
+        "support_agg_90d_snapshots",
+        {"support_tickets_90d": "INT64", "ticket_avg_resolution_hrs_90d": "FLOAT32"},
+    )
+    assert sql == (
+        "SELECT DISTINCT ON (user_id) user_id, as_of, support_tickets_90d::bigint AS support_tickets_90d, "
+        "ticket_avg_resolution_hrs_90d::double precision AS ticket_avg_resolution_hrs_90d "
+        "FROM support_agg_90d_snapshots "
+        "WHERE as_of >= %(start)s AND as_of < %(end)s "
+        "ORDER BY user_id, as_of DESC"
+    )
+
+
+def test_chunk_bounds():
+    assert chunk_bounds(0, 10) == []
+    assert chunk_bounds(25, 10) == [(0, 10), (10, 20), (20, 25)]
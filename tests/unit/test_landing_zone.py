@@ -0,0 +1,89 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "services" / "prefect"))
+
+import landing_zone as lz
+
+
+@pytest.fixture
+def subscriptions_csv(tmp_path):
+    path = tmp_path / "subscriptions.csv"
+    path.write_text(
+        "user_id,months_active,plan_stream_tv,plan_stream_movies,contract_type,"
+        "paperless_billing,monthly_fee,total_paid,net_service\n"
+        "7590-VHVEG,1,False,,Month-to-month,True,29.85,29.85,DSL\n"
+        "5575-GNVDE,34,True,False,One year,False,56.95,1889.5,\n"
+    )
+    return path
+
+
+def test_month_partition_layout(tmp_path):
+    assert lz.month_of("2024-01-31") == "2024-01"
+    assert lz.landing_path(str(tmp_path), "users", "2024-01") == tmp_path / "users" / "month=2024-01" / "part-0.parquet"
+
+
+def test_land_csv_writes_typed_parquet_once(tmp_path, subscriptions_csv):
+    landing = tmp_path / "landing"
+    path = lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-01")
+    table = lz.read_landing(str(landing), "subscriptions", "2024-01")
+
+    # Colonnes du CSV seulement (les add_on_* absentes ne sont pas ajoutées), typées comme le schéma SQL
+    assert table.column_names == [
+        "user_id", "months_active", "plan_stream_tv", "plan_stream_movies", "contract_type",
+        "paperless_billing", "monthly_fee", "total_paid", "net_service",
+    ]
+    assert table.schema.field("months_active").type == pa.int32()
+    assert table.schema.field("plan_stream_movies").type == pa.bool_()
+    assert table.schema.field("monthly_fee").type == pa.float64()
+    assert table.column("plan_stream_movies").to_pylist() == [None, False]
+    assert table.column("net_service").to_pylist() == ["DSL", None]
+
+    # Déjà converti : pas de réécriture
+    mtime = Path(path).stat().st_mtime_ns
+    assert lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-01") == path
+    assert Path(path).stat().st_mtime_ns == mtime
+
+
+def test_land_csv_reconverts_corrected_drop(tmp_path, subscriptions_csv):
+    landing = tmp_path / "landing"
+    path = lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-01")
+    first_sha = lz.landed_source_sha256(path)
+
+    # Dépôt corrigé pour le même mois : le Parquet suit le nouveau CSV
+    subscriptions_csv.write_text(subscriptions_csv.read_text().replace("29.85,29.85", "31.5,31.5"))
+    assert lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-01") == path
+    assert lz.landed_source_sha256(path) != first_sha
+    table = lz.read_landing(str(landing), "subscriptions", "2024-01")
+    assert table.column("monthly_fee").to_pylist() == [31.5, 56.95]
+
+
+def test_read_landing_all_months_adds_partition_column(tmp_path, subscriptions_csv):
+    landing = tmp_path / "landing"
+    lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-01")
+    lz.land_csv(str(subscriptions_csv), str(landing), "subscriptions", "2024-02")
+    table = lz.read_landing(str(landing), "subscriptions", columns=["user_id", "month"])
+    assert table.num_rows == 4
+    assert sorted(set(table.column("month").to_pylist())) == ["2024-01", "2024-02"]
+
+
+def test_iter_csv_batches_produces_copy_ready_csv(tmp_path, subscriptions_csv):
+    path = lz.land_csv(str(subscriptions_csv), str(tmp_path), "subscriptions", "2024-01")
+    batches = list(lz.iter_csv_batches(path, batch_size=1))
+    assert [n for _, _, n in batches] == [1, 1]
+    cols, buf, _ = batches[0]
+    assert cols[0] == "user_id"
+    assert buf.read().decode() == '"7590-VHVEG",1,false,,"Month-to-month",true,29.85,29.85,"DSL"\n'
+
+
+def test_header_only_csv_lands_as_empty_parquet_with_columns(tmp_path):
+    csv_path = tmp_path / "payments_agg_90d.csv"
+    csv_path.write_text("user_id,failed_payments_90d\n")
+    path = lz.land_csv(str(csv_path), str(tmp_path / "landing"), "payments_agg_90d", "2024-01")
+    assert list(lz.iter_csv_batches(path)) == []
+    assert lz.landing_columns(path) == ["user_id", "failed_payments_90d"]
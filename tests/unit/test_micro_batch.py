@@ -0,0 +1,74 @@
+import asyncio
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from micro_batch import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_idle_request_is_dispatched_without_waiting():
+    batches = []
+
+    async def process(items):
+        batches.append(list(items))
+        return [i * 2 for i in items]
+
+    async def scenario():
+        batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=500)
+        await batcher.start()
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        result = await batcher.submit(21)
+        elapsed = loop.time() - t0
+        await batcher.stop()
+        return result, elapsed
+
+    result, elapsed = run(scenario())
+    assert result == 42
+    assert elapsed < 0.25  # pas d'attente de la fenêtre de 500 ms
+    assert batches == [[21]]
+
+
+def test_concurrent_requests_are_coalesced_under_load():
+    batches = []
+    sizes = []
+
+    async def process(items):
+        batches.append(list(items))
+        await asyncio.sleep(0.02)  # simule Feast + forêt
+        return [f"u{i}" for i in items]
+
+    async def scenario():
+        batcher = MicroBatcher(process, max_batch_size=16, max_wait_ms=5,
+                               on_batch=lambda size, waits: sizes.append(size))
+        await batcher.start()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(40)))
+        await batcher.stop()
+        return results
+
+    results = run(scenario())
+    assert results == [f"u{i}" for i in range(40)]
+    assert sum(sizes) == 40
+    assert max(sizes) <= 16
+    assert len(batches) < 40
+
+
+def test_errors_are_propagated_to_every_caller():
+    async def process(items):
+        raise RuntimeError("feast down")
+
+    async def scenario():
+        batcher = MicroBatcher(process)
+        await batcher.start()
+        outcomes = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        await batcher.stop()
+        return outcomes
+
+    outcomes = run(scenario())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
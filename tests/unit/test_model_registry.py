@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from model_registry import LoadedModel, ModelWatcher
+
+
+def make_watcher(versions, current="1"):
+    loaded, swapped = [], []
+
+    def load(version):
+        loaded.append(version)
+        return LoadedModel(version, pyfunc=object())
+
+    watcher = ModelWatcher(
+        get_version=lambda: versions.pop(0),
+        load=load,
+        on_swap=swapped.append,
+        current_version=current,
+    )
+    return watcher, loaded, swapped
+
+
+def test_no_reload_when_production_version_unchanged():
+    watcher, loaded, swapped = make_watcher(["1", None])
+    assert watcher.check_once() is False
+    assert watcher.check_once() is False
+    assert loaded == [] and swapped == []
+
+
+def test_reload_and_swap_on_new_production_version():
+    watcher, loaded, swapped = make_watcher(["2", "2"])
+    assert watcher.check_once() is True
+    assert watcher.check_once() is False
+    assert loaded == ["2"]
+    assert [m.version for m in swapped] == ["2"]
+    assert watcher.current_version == "2"
+
+
+def test_failed_load_keeps_current_version():
+    def load(version):
+        raise RuntimeError("artifact store down")
+
+    watcher = ModelWatcher(lambda: "3", load, on_swap=lambda m: None, current_version=2)
+    try:
+        watcher.check_once()
+    except RuntimeError:
+        pass
+    assert watcher.current_version == "2"
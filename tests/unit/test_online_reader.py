@@ -0,0 +1,42 @@
+import struct
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from online_reader import group_features_by_view, serialize_user_key
+
+def test_serialize_user_key_v2_layout():
+    key = serialize_user_key("7590-VHVEG", key_version=2)
+    assert key == (
+        struct.pack("<I", 2) + b"user_id"
+        + struct.pack("<I", 2) + struct.pack("<I", 10) + b"7590-VHVEG"
+    )
+
+def test_group_features_by_view_keeps_order():
+    views = group_features_by_view(["a:x", "b:y", "a:z"])
+    assert views == {"a": ["x", "z"], "b": ["y"]}
+
+@pytest.mark.parametrize("version", [2, 3])
+def test_serialize_user_key_matches_feast(version):
+    pytest.importorskip("feast")
+    from feast.infra.key_encoding_utils import serialize_entity_key
+    from feast.protos.feast.types.EntityKey_pb2 import EntityKey as EntityKeyProto
+    from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+
+    proto = EntityKeyProto(join_keys=["user_id"], entity_values=[ValueProto(string_val="5575-GNVDE")])
+    expected = serialize_entity_key(proto, entity_key_serialization_version=version)
+    assert serialize_user_key("5575-GNVDE", key_version=version) == expected
+
+def test_decode_value_matches_feast():
+    pytest.importorskip("feast")
+    from feast.protos.feast.types.Value_pb2 import Value as ValueProto
+    from online_reader import decode_value
+
+    assert decode_value(ValueProto(int64_val=34).SerializeToString()) == 34
+    assert decode_value(ValueProto(bool_val=True).SerializeToString()) is True
+    assert decode_value(ValueProto(string_val="DSL").SerializeToString()) == "DSL"
+    assert decode_value(ValueProto().SerializeToString()) is None
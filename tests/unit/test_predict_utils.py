@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from predict_utils import dedupe_user_ids, missing_by_row
+
+def test_dedupe_keeps_first_occurrence_order():
+    assert dedupe_user_ids(["b", "a", "b", "c", "a"]) == ["b", "a", "c"]
+
+def test_missing_by_row_reports_per_user():
+    feature_dict = {
+        "user_id": ["u1", "u2", "u3"],
+        "months_active": [3, None, 5],
+        "monthly_fee": [10.0, 20.0, float("nan")],
+    }
+    missing = missing_by_row(feature_dict, ["months_active", "monthly_fee"], 3)
+    assert missing == [[], ["months_active"], ["monthly_fee"]]
+
+def test_missing_by_row_absent_column_is_missing_everywhere():
+    missing = missing_by_row({"user_id": ["u1"]}, ["skips_7d"], 1)
+    assert missing == [["skips_7d"]]
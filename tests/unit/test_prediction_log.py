@@ -0,0 +1,109 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from prediction_log import PostgresLogSink, PredictionLogWriter
+
+
+def test_full_ring_buffer_overwrites_oldest_and_counts_drops():
+    drops = []
+    writer = PredictionLogWriter(lambda batch: None, capacity=3, batch_size=10, on_drop=drops.append)
+    results = [writer.log(i) for i in range(5)]
+    assert results == [True, True, True, False, False]
+    assert sum(drops) == 2
+    assert list(writer._buffer) == [2, 3, 4]
+
+
+def test_flush_writes_in_batches_of_batch_size():
+    written = []
+    flushed = []
+    writer = PredictionLogWriter(written.append, batch_size=2, on_flush=lambda n, s: flushed.append(n))
+    for i in range(5):
+        writer.log(i)
+    writer._flush_backlog()
+    assert written == [[0, 1], [2, 3], [4]]
+    assert flushed == [2, 2, 1]
+    assert len(writer) == 0
+
+
+def test_failed_batch_is_dropped_and_reported():
+    errors = []
+
+    def fail(batch):
+        raise ConnectionError("db down")
+
+    writer = PredictionLogWriter(fail, batch_size=10, on_error=lambda e, n: errors.append((str(e), n)))
+    writer.log("a")
+    writer.log("b")
+    assert writer.flush_once() == 0
+    assert errors == [("db down", 2)]
+    assert len(writer) == 0
+
+
+def test_background_thread_flushes_and_stop_drains_remaining():
+    written = []
+    writer = PredictionLogWriter(written.extend, batch_size=2, flush_interval=10.0)
+    writer.start()
+    writer.log(1)
+    writer.log(2)  # lot plein : réveil immédiat du thread
+    deadline = time.monotonic() + 2
+    while written != [1, 2] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert written == [1, 2]
+    writer.log(3)
+    writer.stop()
+    assert written == [1, 2, 3]
+
+
+class FakeCopy:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def write_row(self, row):
+        self.rows.append(row)
+
+
+class FakeConn:
+    closed = False
+
+    def __init__(self):
+        self.rows, self.statements, self.commits = [], [], 0
+
+    def execute(self, sql):
+        self.statements.append(sql)
+
+    def commit(self):
+        self.commits += 1
+
+    def cursor(self):
+        conn = self
+
+        class Cursor:
+            def copy(self, statement):
+                conn.statements.append(statement)
+                return FakeCopy(conn.rows)
+
+        return Cursor()
+
+
+def test_postgres_sink_copies_features_as_json():
+    conn = FakeConn()
+    sink = PostgresLogSink(lambda: conn)
+    sink([("t0", "predict", "u1", {"months_active": 3}, 1, None, "7", 2.5),
+          ("t1", "predict_batch", "u2", None, 0, 0.2, "7", 9.0)])
+
+    assert any("CREATE TABLE IF NOT EXISTS prediction_log" in s for s in conn.statements)
+    assert conn.statements[-1].startswith("COPY prediction_log (logged_at, endpoint, user_id, features")
+    assert conn.rows[0] == ("t0", "predict", "u1", json.dumps({"months_active": 3}), 1, None, "7", 2.5)
+    assert conn.rows[1][3] is None
+    assert conn.commits == 2  # DDL + lot
@@ -0,0 +1,62 @@
+import sys
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from score_lookup import ScoreTable, load_score_table, score_table_signature
+
+
+def test_hit_returns_precomputed_score():
+    table = ScoreTable("3", "2024-01-31", {"u1": 0.82, "u2": 0.1})
+    assert table.lookup("u1", "3") == ("hit", 0.82)
+    assert len(table) == 2
+
+
+def test_unknown_user_is_a_miss():
+    table = ScoreTable("3", "2024-01-31", {"u1": 0.82})
+    assert table.lookup("u9", "3") == ("miss", None)
+
+
+def test_scores_of_another_model_version_are_not_served():
+    table = ScoreTable(3, "2024-01-31", {"u1": 0.82})
+    assert table.lookup("u1", "4") == ("version_mismatch", None)
+    assert table.lookup("u1", 3) == ("hit", 0.82)
+
+
+def test_zero_score_is_a_hit():
+    table = ScoreTable("3", "2024-01-31", {"u1": 0.0})
+    assert table.lookup("u1", "3") == ("hit", 0.0)
+
+
+class FakeConn:
+    def __init__(self, row):
+        self.row = row
+        self.params = None
+
+    def execute(self, sql, params):
+        self.params = params
+        return self
+
+    def fetchone(self):
+        return self.row
+
+
+def test_signature_targets_current_snapshot():
+    conn = FakeConn((date(2024, 2, 29), 2, "2024-03-01 02:00:00+00"))
+    assert score_table_signature(conn, 3) == "3|2024-02-29|2|2024-03-01 02:00:00+00"
+    assert conn.params == {"version": "3", "as_of": None}
+
+
+def test_snapshot_not_scored_yet_loads_an_empty_table():
+    # Scores du mois précédent seulement : aucun score pour le snapshot courant -> miss, scoring live
+    signature = score_table_signature(FakeConn((date(2024, 2, 29), 0, None)), "3")
+    assert signature == "3|2024-02-29|0|None"
+    table = load_score_table(None, signature)
+    assert table.as_of == "2024-02-29"
+    assert table.lookup("u1", "3") == ("miss", None)
+
+
+def test_no_snapshot_gives_no_signature():
+    assert score_table_signature(FakeConn((None, 0, None)), "3") is None
@@ -0,0 +1,67 @@
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from shadow import ShadowScorer
+
+
+def test_items_are_scored_in_batches_off_the_caller_thread():
+    seen = []
+
+    def score(items):
+        seen.append((threading.current_thread().name, list(items)))
+        return [x * 10 for x in items]
+
+    batches = []
+    scorer = ShadowScorer(score, maxsize=10, max_batch_size=4,
+                          on_batch=lambda items, preds, s: batches.append((items, preds)))
+    for i in range(6):
+        assert scorer.submit(i) is True
+
+    assert scorer.run_once() == 4
+    assert scorer.run_once() == 2
+    assert batches == [([0, 1, 2, 3], [0, 10, 20, 30]), ([4, 5], [40, 50])]
+
+    scorer.start()
+    scorer.submit(7)
+    deadline = time.monotonic() + 2
+    while len(seen) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    scorer.stop()
+    assert seen[-1] == ("shadow-scorer", [7])
+
+
+def test_full_queue_drops_without_blocking():
+    drops = []
+    scorer = ShadowScorer(lambda items: items, maxsize=2, on_drop=lambda: drops.append(1))
+    t0 = time.perf_counter()
+    results = [scorer.submit(i) for i in range(5)]
+    assert time.perf_counter() - t0 < 0.1
+    assert results == [True, True, False, False, False]
+    assert len(drops) == 3
+    assert scorer.qsize() == 2
+
+
+def test_scoring_error_is_reported_and_worker_keeps_going():
+    errors = []
+
+    def score(items):
+        if items == ["bad"]:
+            raise ValueError("boom")
+        return items
+
+    scorer = ShadowScorer(score, max_batch_size=1, on_error=errors.append)
+    scorer.submit("bad")
+    scorer.submit("ok")
+    assert scorer.run_once() == 1
+    assert scorer.run_once() == 1
+    assert [str(e) for e in errors] == ["boom"]
+
+
+def test_empty_queue_returns_zero():
+    scorer = ShadowScorer(lambda items: items)
+    assert scorer.run_once() == 0
@@ -0,0 +1,81 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "api"))
+
+from startup import StartupState
+
+
+def test_parallel_phases_run_concurrently_and_are_timed():
+    recorded = {}
+    state = StartupState(on_phase=recorded.__setitem__)
+
+    def slow(value):
+        def load():
+            time.sleep(0.2)
+            return value
+        return load
+
+    t0 = time.perf_counter()
+    results = asyncio.run(state.run_parallel({"store": slow("s"), "model": slow("m")}))
+    elapsed = time.perf_counter() - t0
+
+    assert results == {"store": "s", "model": "m"}
+    assert elapsed < 0.35  # en parallèle : ~0.2 s et non 0.4 s
+    assert set(recorded) == {"store", "model"}
+    assert all(seconds >= 0.2 for seconds in recorded.values())
+
+
+def test_failed_phase_is_raised_and_not_ready():
+    state = StartupState()
+
+    def boom():
+        raise RuntimeError("no Production version")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(state.run_parallel({"store": lambda: "s", "model": boom}))
+    state.mark_failed(RuntimeError("no Production version"))
+
+    status = state.status()
+    assert state.ready is False
+    assert status["status"] == "failed"
+    assert "no Production version" in status["error"]
+    assert "model" not in status["phases"]
+
+
+def test_successful_phases_are_kept_when_another_fails():
+    state = StartupState()
+    calls = []
+
+    def load_store():
+        calls.append("store")
+        return "s"
+
+    def boom():
+        raise RuntimeError("registry unreachable")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(state.run_parallel({"store": load_store, "model": boom}))
+    assert state.results == {"store": "s"}
+
+    # Nouvel essai : seule la phase en échec est relancée
+    phases = {name: fn for name, fn in {"store": load_store, "model": lambda: "m"}.items()
+              if name not in state.results}
+    assert asyncio.run(state.run_parallel(phases)) == {"model": "m"}
+    assert state.results == {"store": "s", "model": "m"}
+    assert calls == ["store"]
+
+
+def test_mark_ready_records_time_to_ready():
+    state = StartupState()
+    assert state.status()["status"] == "starting"
+    state.mark_failed(ValueError("retry"))
+    state.mark_ready()
+    status = state.status()
+    assert status["status"] == "ready" and status["error"] is None
+    assert "time_to_ready" in status["phases"]
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(ROOT / "services" / "prefect"))
+
+from validation_utils import (
+    DEFAULT_EXPECTATIONS,
+    aggregate_sql,
+    evaluate,
+    expectations_for,
+    first_failure,
+    unexpected_condition,
+)
+
+USAGE_COLUMNS = ["user_id", "watch_hours_30d", "avg_session_mins_7d",
+                 "unique_devices_30d", "skips_7d", "rebuffer_events_7d"]
+
+
+def test_unknown_table_gets_minimal_check():
+    assert expectations_for("labels") == DEFAULT_EXPECTATIONS
+
+
+def test_unexpected_conditions():
+    assert unexpected_condition("expect_column_values_to_not_be_null", {"column": "user_id"}) == "user_id IS NULL"
+    assert unexpected_condition(
+        "expect_column_values_to_be_between", {"column": "monthly_fee", "min_value": 0}
+    ) == "monthly_fee < 0"
+    assert unexpected_condition(
+        "expect_column_values_to_be_between", {"column": "skips_7d", "min_value": 0, "max_value": 1000}
+    ) == "skips_7d < 0 OR skips_7d > 1000"
+    with pytest.raises(ValueError):
+        unexpected_condition("expect_column_values_to_match_regex", {"column": "user_id"})
+
+
+def test_aggregate_sql_is_a_single_scan_without_column_set():
+    sql = aggregate_sql("usage_agg_30d", expectations_for("usage_agg_30d"))
+    assert sql == (
+        "SELECT count(*), count(*) FILTER (WHERE user_id IS NULL), "
+        "count(*) FILTER (WHERE watch_hours_30d < 0), "
+        "count(*) FILTER (WHERE avg_session_mins_7d < 0) FROM usage_agg_30d"
+    )
+
+
+def test_aggregate_sql_none_when_only_column_set():
+    assert aggregate_sql("t", [("expect_table_columns_to_match_set", {"column_set": ["a"]})]) is None
+
+
+def test_evaluate_passes_on_clean_table():
+    results = evaluate(expectations_for("usage_agg_30d"), USAGE_COLUMNS, [0, 0, 0])
+    assert all(r["success"] for r in results)
+    assert first_failure(results) is None
+
+
+def test_first_failure_follows_expectation_order():
+    expectations = expectations_for("usage_agg_30d")
+    results = evaluate(expectations, list(reversed(USAGE_COLUMNS)), [0, 0, 3])
+    assert first_failure(results) == "expect_column_values_to_be_between"
+    assert results[-1]["unexpected_count"] == 3
+
+    results = evaluate(expectations, USAGE_COLUMNS + ["extra"], [2, 0, 0])
+    assert first_failure(results) == "expect_table_columns_to_match_set"